@@ -17,10 +17,15 @@ __copyright__ = 'Copyright (C) 2020-Present CriticalElement'
 __version__ = '1.0.2'
 
 
+import multiprocessing
 import re
 import sys
 import socket
 
+if __name__ == '__main__':
+    # the image worker processes start from the frozen executable, this hands them over to multiprocessing
+    multiprocessing.freeze_support()
+
 # check if app is already running
 if __name__ == '__main__' and '--ignore-singleton' not in sys.argv:
     import psutil
@@ -61,7 +66,6 @@ if sys.version_info.major == 3 and sys.version_info.minor >= 10:
     from _collections_abc import MutableMapping
     collections.MutableMapping = MutableMapping
 
-from pathlib import Path
 from threading import Thread
 from shutil import copyfile
 
@@ -72,7 +76,6 @@ import pyperclip
 from PyQt5 import sip
 from PyQt5 import QtCore, QtGui, QtWidgets
 from platformdirs import user_data_dir
-from PIL import Image, ImageOps
 
 import ui.customwidgets
 import utils.utils
@@ -82,6 +85,13 @@ from ui.mainui import UiMainWindow
 from ui.customwidgets import *
 from utils.uiutils import Runnable, limit_text_smart, DpiFont, adjust_sizing, adj_style, get_ratio, scale_images
 from utils.constants import *
+from utils.kvstore import close_stores
+from utils.pixmaps import get_pixmap_cache
+from utils.albumcache import get_album_index
+from utils.imagestore import album_pack_enabled, get_album_store, set_album_pack
+from utils.avatars import get_avatar_cache
+from utils.events import StopRequested
+from utils.imageworker import ImageWorker, set_image_worker, shutdown_image_worker
 
 
 QtGui.QFont = DpiFont
@@ -97,9 +107,10 @@ if {'-d', '-v', '--debug', '--verbose'} & set(sys.argv):
 formatter = logging.Formatter('%(asctime)s - %(levelname)-8s - %(name)-29s - %(message)s')
 logging.basicConfig(level=level, format='%(asctime)s - %(levelname)-8s - %(name)-29s - %(message)s')
 os.makedirs(data_dir, exist_ok=True)
-filehandler = logging.FileHandler(f'{data_dir}spotalong.log', 'w', 'utf-8')
-filehandler.setFormatter(formatter)
-logging.getLogger().addHandler(filehandler)
+if __name__ != '__mp_main__':  # image worker processes re-import this module, and mustn't truncate the log
+    filehandler = logging.FileHandler(f'{data_dir}spotalong.log', 'w', 'utf-8')
+    filehandler.setFormatter(formatter)
+    logging.getLogger().addHandler(filehandler)
 logging_io = io.StringIO()
 console = logging.StreamHandler(stream=logging_io)
 console.setLevel(level)
@@ -132,9 +143,11 @@ class MainUI(UiMainWindow):
             album_cache_maxsize: An int that represents the maximum size of the album cache before deletion (MB).
             client: The MainClient used for handling the SpotAlong server connection.
             progress_bar: The QProgressBar used in the loading screen.
+            friend_update_window: A float that represents how long (in seconds) a burst of friend updates is coalesced
+                for before the friend's widgets are rebuilt.
     """
     def __init__(self, accent_color: tuple, window_transparency: float, album_cache_maxsize: int,
-                 client: MainClient, progress_bar, *args: tuple, **kwargs: dict):
+                 client: MainClient, progress_bar, *args: tuple, friend_update_window: float = 0.3, **kwargs: dict):
         UiMainWindow.__init__(self, *args, **kwargs)
         global app
         self.PORT = 49475
@@ -146,6 +159,8 @@ class MainUI(UiMainWindow):
         self.accent_color = accent_color
         self.client = client
         self.albumcachelimit = album_cache_maxsize
+        get_pixmap_cache().set_album_cache_limit(album_cache_maxsize)
+        self.friendupdatewindow = friend_update_window
         self.devicelist = None
         self.active_dialog: typing.Optional[Dialog] = None
         self.animation_timer: typing.Optional[QtCore.QTimer] = None
@@ -164,7 +179,7 @@ class MainUI(UiMainWindow):
         self.verticalLayout_38.addWidget(self.listentofriends)
         self.spotifylistener = None
         self.partiallisteningtofriends = PartialListeningToFriends()
-        while not client.initialized:
+        while not client.ready:  # the roster snapshot lets this start before every friend has been initialized
             time.sleep(0.1)
         self.resize(1440, 850)
         self.setObjectName('SpotAlong')
@@ -183,21 +198,7 @@ class MainUI(UiMainWindow):
             self.scaled = 'scaled'
         self.label_6.setText(f'v{VERSION}')
         self.label_5.setText(f'Copyright © 2020-{time.gmtime().tm_year} CriticalElement // Check me out on GitHub!')
-        url = self.client.mainstatus.clientavatar
-        if url is not None:
-            img_data = requests.get(url, timeout=15).content
-            with open(data_dir + f'icon{self.client.mainstatus.client_id}.png', 'wb') as handler:
-                handler.write(img_data)
-        else:
-            image = Image.open(data_dir + 'default_user.png').resize((200, 200))
-            image.save(data_dir + f'icon{self.client.mainstatus.client_id}.png')
-        mask = Image.open(data_dir + 'mask.png').convert('L')
-        mask = mask.resize((200, 200))
-        im = Image.open(data_dir + f'icon{self.client.mainstatus.client_id}.png').convert('RGBA')
-        output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
-        output.putalpha(mask)
-        output.resize((200, 200))
-        output.save(data_dir + f'icon{self.client.mainstatus.client_id}.png')
+        get_avatar_cache().icon(self.client.mainstatus.client_id, self.client.mainstatus.clientavatar)
         self.pushButton.setIcon(QtGui.QIcon(data_dir + f'icons{sep}24x24{sep}cil-menu{self.scaled}.png'))
         self.pushButton.setIconSize(QtCore.QSize(48 * ratio, 48 * ratio))
         self.label_7.setPixmap(QtGui.QPixmap(data_dir + 'logo.ico').scaled
@@ -621,6 +622,7 @@ class MainUI(UiMainWindow):
             except (keyring.errors.PasswordDeleteError, ValueError):
                 pass
             logging.info(f'Logging out as user {client.spotifyclient.clientUsername}')
+            client.clear_roster_snapshot()
             stop_all()
 
             app.setQuitOnLastWindowClosed(True)
@@ -632,11 +634,12 @@ class MainUI(UiMainWindow):
             self.worker.exit(0)
             self.worker.running = False
             self.worker2.exit(0)
-            self.worker2.runnning = False
+            self.worker2.running = False
             self.worker3.exit(0)
             self.worker3.running = False
             self.worker4.exit(0)
             self.worker4.running = False
+            self.client.events.publish(StopRequested())  # the update threads block until an event arrives
             self.worker5.exit(0)
             if '--ignore-singleton' not in sys.argv:
                 with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
@@ -823,7 +826,7 @@ class MainUI(UiMainWindow):
         self.worker.emitter.connect(lambda data: mainstatusdata(data))
         self.worker.start()
 
-        self.worker2 = FriendUpdateThread(client, self.statuswidgets, self)
+        self.worker2 = FriendUpdateThread(client, self.statuswidgets, self, self.friendupdatewindow)
 
         def friendstatusdata(data, data2, data3, data4):
             friendstatus = data.convert_to_widget()
@@ -1042,7 +1045,7 @@ class MainUI(UiMainWindow):
             sort_friend_history()
             gc.collect()
 
-        self.worker4 = FriendHistoryUpdateThread(client, self)
+        self.worker4 = FriendHistoryUpdateThread(client, self, self.friendupdatewindow)
         self.worker4.emitter.connect(friend_history_updater)
         self.worker4.start()
 
@@ -1114,8 +1117,9 @@ class MainUI(UiMainWindow):
         ))
 
         def clear_album_cache():
-            dont_del = ['unknown_album.png', 'albumNone.png', 'partialalbumNone.png']
-            [file.unlink() for file in Path(data_dir).glob("*album*") if file.is_file() and file.name not in dont_del]
+            get_album_store().clear()
+            get_album_index().reset()
+            get_pixmap_cache().clear()
             self.label_26.setText('Cleared!')
             Thread(target=lambda: (time.sleep(1), self.label_26.setText(''))).start()
 
@@ -1321,6 +1325,7 @@ class MainUI(UiMainWindow):
             self.horizontalSlider_2.setFocus()
             self.lastalbumcachetext = value_string
             self.albumcachelimit = value
+            get_pixmap_cache().set_album_cache_limit(value)
 
         def change_album_cache_text():
             text = self.lineEdit_2.text()
@@ -1417,7 +1422,8 @@ class MainUI(UiMainWindow):
     def change_file(self):
         with open(data_dir + 'config.json', 'w') as file:
             data = {'accent_color': list(self.accent_color), 'window_transparency': self.window_transparency,
-                    'album_cache_maxsize': self.albumcachelimit}
+                    'album_cache_maxsize': self.albumcachelimit, 'friend_update_window': self.friendupdatewindow,
+                    'pack_album_images': album_pack_enabled()}
             json.dump(data, file)
         file.close()
 
@@ -1582,6 +1588,13 @@ global app
 
 if __name__ == '__main__':
     QtCore.start_time = time.perf_counter()
+    if '--inline-images' in sys.argv:
+        set_image_worker(ImageWorker(processes=0))  # process images in-thread, for debugging
+    try:
+        with open(data_dir + 'config.json', 'r') as f:
+            set_album_pack(json.load(f).get('pack_album_images', False))
+    except (OSError, ValueError):
+        pass  # not configured yet, the album images are kept as loose files
 
     from ui.loginwidgets import LoggingInUi
     app = QtWidgets.QApplication(sys.argv)
@@ -1618,7 +1631,7 @@ if __name__ == '__main__':
     def main_user(login_data, progress_ui, error_callback=None):
         global starting
         client = MainClient(*login_data, progress_ui.progressBar)
-        while not client.initialized:
+        while not client.ready:
             if client.disconnected:
                 dc = client.disconnected
 
@@ -1752,5 +1765,7 @@ if __name__ == '__main__':
         Thread(target=login_to_api).start()
     else:
         del app
+        close_stores()  # os._exit skips atexit, so the pending cache writes have to be committed here
+        shutdown_image_worker()
         # noinspection PyProtectedMember
         os._exit(exit_code)
@@ -0,0 +1,112 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Throughput benchmark for the payload decoding layer: replays a recorded (or synthetic) stream of encoded song_update,
+# user_update, friend_list and dealer cluster messages through the decoders, with orjson and with the standard library
+# fallback, in lenient and strict mode.
+# Run from the root of the repository: python benchmarks/bench_decoding.py [recording.jsonl]
+# A recording has one json object per line, {"event": "song_update" | "user_update" | "friend_list" | "dealer",
+# "data": <payload>}.
+
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.decoding as decoding  # noqa: E402
+from bench_trackparser import TRACK  # noqa: E402
+
+EVENTS = 20000
+DECODERS = {'song_update': decoding.decode_song_update, 'user_update': decoding.decode_user_update,
+            'friend_list': decoding.decode_friend_list, 'dealer': decoding.decode_dealer_message}
+
+
+def synthetic_stream(count=EVENTS):
+    """
+        Build a stream shaped like a busy session: mostly song updates, some user updates, dealer messages and the
+        occasional friend list.
+    """
+    stream = []
+    for i in range(count):
+        user = {'id': f'user{i % 500}', 'status': 'Listening', 'display_name': f'friend {i % 500}',
+                'images': [{'url': f'https://i.scdn.co/image/avatar{i % 500}'}], 'friend_code': f'{i % 500:08d}',
+                'last_track': None, 'profile_colors': [[12, 34, 56], [0, 4, 26], [255, 255, 255]]}
+        kind = i % 10
+        if kind < 6:
+            song = copy.deepcopy(TRACK)
+            song.update(ex_data=user, album_colors=[[1, 2, 3], [4, 5, 6]],
+                        album_img_url=f'https://spotalong.example/album/{i}')
+            stream.append(('song_update', json.dumps(song)))
+        elif kind < 8:
+            stream.append(('user_update', json.dumps(dict(user, ex_data=user))))
+        elif kind < 9 or i % 1000:
+            cluster = {'active_device_id': 'device', 'server_timestamp_ms': '1650000000000',
+                       'devices': {'device': {'volume': 65535}},
+                       'player_state': {'timestamp': '1650000000000', 'queue_revision': str(i), 'is_paused': False,
+                                        'position_as_of_timestamp': '61234',
+                                        'next_tracks': [{'uri': f'spotify:track:{n:022d}'} for n in range(50)],
+                                        'options': {'shuffling_context': False, 'repeating_track': False,
+                                                    'repeating_context': False}}}
+            stream.append(('dealer', json.dumps({'payloads': [{'update_reason': 'DEVICE_STATE_CHANGED',
+                                                               'cluster': cluster}]})))
+        else:
+            stream.append(('friend_list', json.dumps([user] * 200)))
+    return stream
+
+
+def recorded_stream(path):
+    stream = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                stream.append((record['event'], json.dumps(record['data'])))
+    return stream
+
+
+def replay(stream, strict):
+    start = time.perf_counter()
+    for event, encoded in stream:
+        # socket.io payloads are loaded by the client before the handler runs, dealer messages by the decoder
+        DECODERS[event](encoded if event == 'dealer' else decoding.loads(encoded), strict)
+    return time.perf_counter() - start
+
+
+def main():
+    stream = recorded_stream(sys.argv[1]) if len(sys.argv) > 1 else synthetic_stream()
+    megabytes = sum(len(encoded) for _, encoded in stream) / 1e6
+    print(f'{len(stream)} events, {megabytes:.1f} MB')
+    print(f'{"json backend":<16}{"mode":<10}{"events / s":>14}{"MB / s":>10}')
+    orjson = decoding.orjson
+    for backend in (('orjson', orjson), ('json', None)):
+        if backend[0] == 'orjson' and orjson is None:
+            print(f'{"orjson":<16}(not installed)')
+            continue
+        decoding.orjson = backend[1]
+        for strict in (False, True):
+            seconds = replay(stream, strict)
+            print(f'{backend[0]:<16}{"strict" if strict else "lenient":<10}{len(stream) / seconds:>14.0f}'
+                  f'{megabytes / seconds:>10.1f}')
+    decoding.orjson = orjson
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Benchmark for feather_image: the previous per-pixel loop against the vectorized mask, on random album art of the
+# sizes Spotify serves (and a few smaller than the feathering radius), checking that the output is pixel-identical.
+# Both are timed in memory, feather_image itself also has to decode and encode the png.
+# Run from the root of the repository: python benchmarks/bench_feather.py
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.albumcache  # noqa: E402
+import utils.imagestore  # noqa: E402
+import utils.imageworker  # noqa: E402
+import utils.utils  # noqa: E402
+from utils.kvstore import KeyValueStore  # noqa: E402
+
+SIZES = ((640, 640), (300, 300), (64, 64), (60, 50), (40, 100), (20, 20))
+RADIUS = 35
+
+
+def legacy_feather(im):
+    """
+        The previous implementation of feather_image, kept here as the baseline.
+    """
+    im = im.convert('RGBA')
+    data = im.load()
+    newdata = []
+    for y in range(im.size[1]):
+        for x in range(im.size[0]):
+            if x < RADIUS:
+                newdata = list(data[x, y])
+                newdata[3] = int(255 / RADIUS * x)
+                data[x, y] = tuple(newdata)
+            if im.size[0] - RADIUS < x:
+                newdata = list(data[x, y])
+                newdata[3] = int(255 / RADIUS * (abs(x - (im.size[0] - RADIUS) - RADIUS)))
+                data[x, y] = tuple(newdata)
+            if y < RADIUS:
+                if newdata:
+                    newdata[3] = int(min(255 / RADIUS * y, newdata[3]))
+                    data[x, y] = tuple(newdata)
+                else:
+                    newdata = list(data[x, y])
+                    newdata[3] = int(255 / RADIUS * y)
+                    data[x, y] = tuple(newdata)
+            if im.size[1] - RADIUS < y:
+                if newdata:
+                    newdata[3] = int(min(255 / RADIUS * (abs(y - (im.size[1] - RADIUS) - RADIUS)), newdata[3]))
+                    data[x, y] = tuple(newdata)
+                else:
+                    newdata = list(data[x, y])
+                    newdata[3] = int(255 / RADIUS * (abs(y - (im.size[1] - RADIUS) - RADIUS)))
+                    data[x, y] = tuple(newdata)
+            newdata = []
+    return im
+
+
+def main():
+    rng = np.random.default_rng(0)
+    data_dir = tempfile.mkdtemp()
+    # every store feather_image goes through lives in the temporary directory, the user's data is never touched
+    images = utils.imagestore._album_store = utils.imagestore.LooseImageStore(data_dir + os.path.sep)  # noqa
+    index_store = KeyValueStore(os.path.join(data_dir, 'cache.db'), 'album_index')
+    utils.albumcache._album_index = utils.albumcache.AlbumCacheIndex(index_store, images)  # noqa
+    utils.utils.ui = SimpleNamespace(albumcachelimit=1000)  # in MB, nothing is evicted
+    utils.imageworker.set_image_worker(utils.imageworker.ImageWorker(processes=0))  # feathers in this process
+    print(f'{"size":<12}{"legacy (ms)":>14}{"vectorized (ms)":>18}{"identical":>12}')
+    try:
+        for width, height in SIZES:
+            pixels = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+            source = Image.fromarray(pixels, 'RGBA')
+            url = f'https://i.scdn.co/image/bench{width}x{height}'
+            source.save(os.path.join(data_dir, f'partialalbumbench{width}x{height}.png'))
+            start = time.perf_counter()
+            expected = legacy_feather(source)
+            legacy = time.perf_counter() - start
+            # the first call also builds the mask for this size, every later image of the same size reuses it
+            start = time.perf_counter()
+            feathered = utils.imageworker._feather(source, RADIUS)  # noqa
+            vectorized = time.perf_counter() - start
+            utils.utils.feather_image(url)
+            saved = Image.open(os.path.join(data_dir, f'albumbench{width}x{height}.png'))
+            identical = (np.array_equal(np.array(expected), np.array(feathered))
+                         and np.array_equal(np.array(expected), np.array(saved)))
+            print(f'{f"{width}x{height}":<12}{legacy * 1000:>14.1f}{vectorized * 1000:>18.1f}{str(identical):>12}')
+    finally:
+        index_store.close()
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
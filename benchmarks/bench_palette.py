@@ -0,0 +1,112 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Benchmark for the palette backends used by extract_color: colorthief against the NumPy backend, both exact and
+# downsampled, over a set of album covers. Besides the timings it reports how far each palette is from colorthief's,
+# as the CIE76 color difference (delta E in Lab, ~2.3 is a just noticeable difference) from every entry of colorthief's
+# palette to the closest entry of the other palette (the order of similar boxes can swap), and between dominant colors.
+# Run from the root of the repository: python benchmarks/bench_palette.py [directory of covers]
+# Without a directory, synthetic covers (smooth gradients, flat posters, noise and photos with white borders) are used.
+
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.palette import ColorThiefPalette, NumpyPalette  # noqa: E402
+
+COLOR_COUNT, QUALITY = 8, 5  # the arguments extract_color uses
+BACKENDS = (('colorthief', ColorThiefPalette()), ('numpy', NumpyPalette()),
+            ('numpy (downsampled)', NumpyPalette(max_samples=32768)))
+
+
+def synthetic_covers(directory, count=24):
+    rng = np.random.default_rng(0)
+    paths = []
+    for index in range(count):
+        size = (640, 300, 64)[index % 3]
+        kind = index % 4
+        if kind == 0:
+            cover = Image.fromarray(rng.integers(0, 256, (4, 4, 3), dtype=np.uint8)).resize((size, size),
+                                                                                         Image.BICUBIC)
+        elif kind == 1:
+            cover = Image.fromarray((rng.integers(0, 3, (6, 6, 3)) * 120).astype(np.uint8)).resize((size, size),
+                                                                                                  Image.NEAREST)
+        elif kind == 2:
+            cover = Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+        else:
+            pixels = np.full((size, size, 3), 255, dtype=np.uint8)
+            inner = Image.fromarray(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)).resize((size // 2, size // 2),
+                                                                                            Image.BILINEAR)
+            pixels[size // 4:size // 4 + size // 2, size // 4:size // 4 + size // 2] = np.array(inner)
+            cover = Image.fromarray(pixels)
+        path = os.path.join(directory, f'cover{index}.png')
+        cover.save(path)
+        paths.append(path)
+    return paths
+
+
+def to_lab(colors):
+    rgb = np.asarray(colors, dtype=np.float64) / 255
+    rgb = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    xyz = rgb @ np.array([[0.4124, 0.2126, 0.0193], [0.3576, 0.7152, 0.1192], [0.1805, 0.0722, 0.9505]])
+    xyz /= np.array([0.95047, 1, 1.08883])
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+    return np.stack((116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])), axis=1)
+
+
+def delta_e(reference, palette):
+    distances = np.linalg.norm(to_lab(reference)[:, None] - to_lab(palette)[None], axis=2)
+    return distances.min(axis=1), distances[0, 0]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        if len(sys.argv) > 1:
+            paths = sorted(glob.glob(os.path.join(sys.argv[1], '*.png'))
+                           + glob.glob(os.path.join(sys.argv[1], '*.jp*g')))
+        else:
+            paths = synthetic_covers(directory)
+        results = {name: ([], []) for name, _ in BACKENDS}  # name -> (timings, palettes)
+        for path in paths:
+            for name, backend in BACKENDS:
+                start = time.perf_counter()
+                palette = backend.get_palette(path, COLOR_COUNT, QUALITY)
+                results[name][0].append(time.perf_counter() - start)
+                results[name][1].append([tuple(color) for color in palette])
+    print(f'{len(paths)} covers, get_palette({COLOR_COUNT}, {QUALITY})')
+    print(f'{"backend":<22}{"mean (ms)":>11}{"max (ms)":>10}{"identical":>11}{"mean dE":>9}{"max dE":>8}'
+          f'{"max dominant dE":>17}')
+    references = results['colorthief'][1]
+    for name, (timings, palettes) in results.items():
+        identical = sum(palette == reference for palette, reference in zip(palettes, references))
+        differences = [delta_e(reference, palette) for palette, reference in zip(palettes, references)]
+        entries = np.concatenate([entry for entry, _ in differences])
+        dominant = max(dominant for _, dominant in differences)
+        print(f'{name:<22}{np.mean(timings) * 1000:>11.1f}{max(timings) * 1000:>10.1f}'
+              f'{f"{identical}/{len(paths)}":>11}{entries.mean():>9.2f}{entries.max():>8.2f}{dominant:>17.2f}')
+
+
+if __name__ == '__main__':
+    main()
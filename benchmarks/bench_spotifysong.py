@@ -0,0 +1,131 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Micro-benchmark for SpotifySong: per-object memory and construction time for 1,000 synthetic friends, comparing
+# the slotted, lazily parsed SpotifySong against the previous dict-backed one that parsed last_song eagerly.
+# Run from the root of the repository: python benchmarks/bench_spotifysong.py
+
+import datetime
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotifyclient.spotifysong import SpotifySong  # noqa: E402
+
+FRIENDS = 1000
+
+
+class LegacySpotifySong:
+    """
+        The previous dict-backed SpotifySong, kept here as the baseline.
+    """
+    def __init__(self, songname='', songid=None, songlink=None, contexttype=None, contextdata=None, contexturl=None,
+                 progress=0, duration=100, albumname='', albumlink=None, albumimagelink=None, song_authors_urls=None,
+                 song_authors=None, is_playing=False, playing_type=False, clientusername=None, clientavatar=None,
+                 client_id=None, friend_code=None, playing_status=None, last_song=None):
+        self.songname = songname
+        self.songid = songid
+        self.songlink = songlink
+        self.contexttype = contexttype
+        self.contextdata = contextdata
+        self.contexturl = contexturl
+        self.progress = progress
+        self.duration = duration
+        self.albumname = albumname
+        self.albumnlink = albumlink
+        self.albumimagelink = albumimagelink
+        self.song_authors_urls = song_authors_urls
+        self.song_authors = song_authors if song_authors else []
+        self.is_playing = is_playing
+        self.playing_type = playing_type
+        self.clientusername = clientusername
+        self.clientavatar = clientavatar
+        self.client_id = client_id
+        self.friend_code = friend_code
+        self.playing_status = playing_status
+        self.last_song = None
+        self.last_song_timestamp = None
+        if last_song:
+            if last_song.get('context'):
+                href = last_song['context'].get('href')
+                type_ = last_song['context'].get('type')
+            else:
+                href = None
+                type_ = None
+            self.last_song = LegacySpotifySong(last_song['track']['name'],
+                                               song_authors=[artist['name'] for artist in
+                                                             last_song['track']['artists']],
+                                               albumname=last_song['album']['name'],
+                                               contextdata=href, contexttype=type_,
+                                               songid=last_song['track']['id'],
+                                               friend_code=friend_code, client_id=client_id,
+                                               clientusername=clientusername)
+            if last_song.get('played_at'):
+                self.last_song_timestamp = datetime.datetime.strptime(last_song['played_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
+                self.last_song_timestamp = self.last_song_timestamp.replace(tzinfo=datetime.timezone.utc)
+                self.last_song_timestamp = self.last_song_timestamp.astimezone(datetime.datetime.now().astimezone().
+                                                                               tzinfo)
+
+
+def synthetic_friends(count=FRIENDS):
+    friends = []
+    for i in range(count):
+        last_track = {'track': {'name': f'Last Song {i}', 'id': f'lasttrack{i:06d}',
+                                'artists': [{'name': f'Artist {i}'}, {'name': f'Feature {i}'}]},
+                      'album': {'name': f'Album {i}'},
+                      'context': {'href': f'https://api.spotify.com/v1/playlists/playlist{i}', 'type': 'playlist'},
+                      'played_at': '2022-05-01T12:34:56.789Z'}
+        friends.append(dict(songname=f'Song {i}', songid=f'track{i:06d}',
+                            songlink=f'https://open.spotify.com/track/{i}', contexttype='album',
+                            contextdata=f'https://api.spotify.com/v1/albums/{i}',
+                            contexturl=f'https://open.spotify.com/album/{i}', progress=12.5, duration=180000,
+                            albumname=f'Album {i}', albumlink=f'https://open.spotify.com/album/{i}',
+                            albumimagelink=f'https://i.scdn.co/image/{i:040d}',
+                            song_authors_urls=[f'https://open.spotify.com/artist/{i}'], song_authors=[f'Artist {i}'],
+                            is_playing=True, playing_type='track', clientusername=f'friend{i}',
+                            clientavatar=f'https://i.scdn.co/image/avatar{i}', client_id=f'user{i}',
+                            friend_code=f'{i:08d}', playing_status='Listening', last_song=last_track))
+    return friends
+
+
+def measure(cls, friends):
+    build = lambda: [cls(**friend) for friend in friends]  # noqa: E731
+    seconds = min(timeit.repeat(build, number=1, repeat=5))
+    tracemalloc.start()
+    songs = build()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    access = min(timeit.repeat(lambda: [(song.last_song, song.last_song_timestamp) for song in songs],
+                               number=1, repeat=5))
+    return seconds, memory, access
+
+
+def main():
+    friends = synthetic_friends()
+    print(f'{FRIENDS} synthetic friends')
+    print(f'{"implementation":<20}{"construct (ms)":>16}{"bytes / object":>16}{"memoized read (ms)":>22}')
+    for name, cls in (('dict-backed', LegacySpotifySong), ('slotted + lazy', SpotifySong)):
+        seconds, memory, access = measure(cls, friends)
+        print(f'{name:<20}{seconds * 1000:>16.2f}{memory / FRIENDS:>16.0f}{access * 1000:>22.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Benchmark for the preparation of a status widget's icon: the previous code of PartialStatusWidget, which decoded
+# mask.png and the status background (and resized the mask) for every widget, against the status_icon job with the
+# preloaded asset registry. Both run in-thread on a 300x300 jpeg profile picture, the default files are taken from
+# default_files.zip, and the outputs are checked to be identical.
+# Run from the root of the repository: python benchmarks/bench_status_icon.py
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+from PIL import Image, ImageOps
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils.assets  # noqa: E402
+import utils.imageworker  # noqa: E402
+
+ROUNDS, REPEATS = 100, 5  # the best of REPEATS runs of ROUNDS widgets is reported
+
+
+def legacy_status_icon(data_dir, source, status):
+    """
+        The previous preparation of PartialStatusWidget, kept here as the baseline.
+    """
+    mask = Image.open(data_dir + 'mask.png').convert('L')
+    mask = mask.resize((120, 120))
+    im = Image.open(io.BytesIO(source)).convert('RGBA')
+    if status == 'offline':
+        im = ImageOps.grayscale(im)
+
+    output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
+    output.putalpha(mask)
+
+    back = Image.open(data_dir + f'{status}.png').convert('RGBA')
+    back.paste(output, (15, 15), mask)
+
+    back = back.resize((50, 50))
+
+    padding = Image.new('RGBA', (80, 70), (0, 0, 0, 0))
+    padding.paste(back, (6, 10))
+
+    buffer = io.BytesIO()
+    padding.save(buffer, 'PNG')  # PartialStatusWidget saved it to statusicon{id}.png
+    return buffer.getvalue()
+
+
+def timed(function):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            function()
+        timings.append((time.perf_counter() - start) / ROUNDS)
+    return min(timings)
+
+
+def main():
+    data_dir = tempfile.mkdtemp() + os.path.sep
+    try:
+        with zipfile.ZipFile(os.path.join(ROOT, 'default_files.zip')) as files:
+            for name in files.namelist():
+                if os.path.basename(name) in ('mask.png', 'default_user.png', 'listening.png', 'online.png',
+                                              'offline.png'):
+                    with open(data_dir + os.path.basename(name), 'wb') as f:
+                        f.write(files.read(name))
+        utils.assets.data_dir = data_dir
+        buffer = io.BytesIO()
+        picture = Image.fromarray(np.random.default_rng(0).integers(0, 256, (6, 6, 3), dtype=np.uint8))
+        picture.resize((300, 300), Image.BICUBIC).save(buffer, 'JPEG')  # Spotify serves 300x300 jpegs
+        source = buffer.getvalue()
+        start = time.perf_counter()
+        utils.assets.get_assets().preload()
+        print(f'preloading the assets: {(time.perf_counter() - start) * 1000:.1f} ms (once per process)')
+        print(f'{"status":<12}{"before (ms)":>13}{"after (ms)":>12}{"identical":>11}')
+        for status in ('listening', 'online', 'offline'):
+            expected = legacy_status_icon(data_dir, source, status)
+            icon = utils.imageworker.status_icon(source, status, grayscale=status == 'offline')
+            before = timed(lambda: legacy_status_icon(data_dir, source, status))
+            after = timed(lambda: utils.imageworker.status_icon(source, status, grayscale=status == 'offline'))
+            print(f'{status:<12}{before * 1000:>13.2f}{after * 1000:>12.2f}{str(expected == icon):>11}')
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
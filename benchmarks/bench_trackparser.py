@@ -0,0 +1,75 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# Throughput benchmark for the song_update payload parser, over a corpus of payloads shaped like the ones the server
+# sends (track, track without a context, local file, ad and nothing playing), both cold and memoized.
+# Run from the root of the repository: python benchmarks/bench_trackparser.py
+
+import copy
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spotifyclient.spotifyclient import SpotifyClient  # noqa: E402
+from spotifyclient.trackparser import parse_track, clear_parse_cache  # noqa: E402
+
+ITERATIONS = 20000
+EX_DATA = {'id': 'user', 'status': 'Listening', 'last_track': None}
+TRACK = {
+    'currently_playing_type': 'track', 'is_playing': True, 'progress_ms': 61234, 'ex_data': EX_DATA,
+    'context': {'external_urls': {'spotify': 'https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M'},
+                'type': 'playlist', 'href': 'https://api.spotify.com/v1/playlists/37i9dQZF1DXcBWIGoYBM5M'},
+    'item': {'is_local': False, 'name': 'Song', 'id': '4uLU6hMCjMI75M1A2tKUQC', 'duration_ms': 213573,
+             'external_urls': {'spotify': 'https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC'},
+             'album': {'name': 'Album', 'external_urls': {'spotify': 'https://open.spotify.com/album/6N9PS4QXF1D0'},
+                       'images': [{'url': 'https://i.scdn.co/image/ab67616d0000b273'}]},
+             'artists': [{'name': 'Artist', 'external_urls': {'spotify': 'https://open.spotify.com/artist/0gxyHS'}},
+                         {'name': 'Feature', 'external_urls': {'spotify': 'https://open.spotify.com/artist/1Xyo4u'}}]},
+}
+CORPUS = {
+    'track': TRACK,
+    'track, no context': dict(TRACK, context=None),
+    'local file': {'currently_playing_type': 'track', 'is_playing': True, 'progress_ms': 1000, 'context': None,
+                   'ex_data': EX_DATA, 'item': {'is_local': True, 'name': 'Local Song', 'duration_ms': 180000,
+                                                'artists': [{'name': 'Local Artist'}]}},
+    'ad': {'currently_playing_type': 'ad', 'is_playing': True, 'progress_ms': 0, 'item': None, 'ex_data': EX_DATA},
+    'None': None,
+}
+
+
+def main():
+    client = SpotifyClient('user', '00000000', {'last_track': None, 'display_name': 'user', 'images': [],
+                                                'status': 'Online'})
+    print(f'{"payload":<20}{"cold parse (us)":>18}{"memoized (us)":>16}{"SpotifySong (us)":>19}')
+    for name, payload in CORPUS.items():
+        # a fresh copy for every parse defeats the identity memoization, like a new song_update would
+        copies = [copy.deepcopy(payload) for _ in range(ITERATIONS)]
+        clear_parse_cache()
+        cold = timeit.timeit(lambda it=iter(copies): parse_track(next(it)), number=ITERATIONS)
+        cold -= timeit.timeit(lambda it=iter(copies): next(it), number=ITERATIONS)  # don't count the iteration
+        warm = timeit.timeit(lambda: parse_track(payload), number=ITERATIONS)
+        client.song_data = payload
+        full = timeit.timeit(client.refresh_status, number=ITERATIONS)
+        print(f'{name:<20}{cold / ITERATIONS * 1e6:>18.2f}{warm / ITERATIONS * 1e6:>16.2f}'
+              f'{full / ITERATIONS * 1e6:>19.2f}')
+
+
+if __name__ == '__main__':
+    main()
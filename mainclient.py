@@ -19,28 +19,41 @@ Copyright (C) 2020-Present CriticalElement
 import json
 import logging
 import os
-import random
 import typing
 import requests
 import time
 import gc
+import threading
+from collections import Counter, OrderedDict
 from io import StringIO
 from inspect import signature
 
 import keyring
 import numpy as np
 import socketio.exceptions
-from colorthief import ColorThief
 from socketio import Client
 from platformdirs import user_data_dir
 from PyQt5 import QtWidgets, QtCore
-from PIL import Image, ImageOps
 
 from spotifyclient.spotifyclient import SpotifyClient
 from spotifyclient.spotifyplayer import SpotifyPlayer
 from spotifyclient.spotifysong import SpotifySong
 from utils.constants import *
+from utils.decoding import *
+from utils.events import EventBus, MainStatusChanged, EVENT_TYPES
+from utils.colorstore import get_color_store
+from utils.kvstore import flush_stores
 from utils.login import *
+from utils.albumcache import get_album_index
+from utils.avatars import get_avatar_cache
+from utils.httpclient import close_http_client, get_http_client
+from utils.fetcher import get_image_fetcher, shutdown_image_fetcher
+from utils.imagestore import get_album_store, write_atomic
+from utils.pixmaps import get_pixmap_cache
+from utils.playlists import get_playlist_cache
+from utils.prefetch import QueuePrefetcher
+from utils.imageworker import get_image_worker, shutdown_image_worker
+from utils.snapshot import read_snapshot, remove_snapshot, write_snapshot
 from utils.utils import clean_album_image_cache
 
 logger = logging.getLogger(__name__)
@@ -69,14 +82,20 @@ class MainClient:
         """
         self.initialized = False
         self.initialized_friends = 0
+        self.warm_started = False  # the friends were restored from the roster snapshot of the last session
+        self.song_broadcast: typing.Optional[int] = None  # set by the settings event, the UI needs it to start
         self.disconnected = False
         self.id = ''
         self.friends = {}
         self.friend_requests = {}
         self.outbound_friend_requests = {}
-        self.friendstatus = {}
+        self._friendstatus = {}  # replaced (never mutated) on every update, so readers can hold onto a snapshot
+        self._sequence = 0
+        self._versions = {'friends': OrderedDict(), 'requests': OrderedDict(), 'outbound_requests': OrderedDict()}
+        self._version_lock = threading.Lock()
+        self._status_lock = threading.Lock()  # serializes writers of _friendstatus and status_counts
+        self.events = EventBus()
         self.spotifyclient: typing.Optional[SpotifyClient] = None
-        self.mainstatus = None
         self.friendListener = False
         self._access_token = access_token
         self._refresh_token = refresh_token
@@ -84,14 +103,16 @@ class MainClient:
         self.ui = None
         self.listening_friends = []
         self.listening_friends_time = {}
+        self.status_counts = Counter()  # playing_status -> number of friends, kept up to date by update_friend_status
+        self.listen_along_text = ''
         self._next_in_queue = ''
+        self.prefetcher: typing.Optional[QueuePrefetcher] = None
         self._last_time_of_state = time.time()
         self._is_refreshing = False  # don't try to refresh the token twice simultaneously
-        with open(data_dir + 'color_cache.json', 'r') as fp:
-            self.album_cache = json.load(fp)
-        with open(data_dir + 'profile_cache.json', 'r') as fp:
-            self.profile_cache = json.load(fp)
-        self.client = Client(reconnection=False)
+        self.colors = get_color_store()
+        self._roster_snapshot = read_snapshot(data_dir + 'roster_snapshot.bin')
+        self.strict_payloads = False  # raise on malformed payloads instead of logging and discarding them
+        self.client = Client(reconnection=False, json=socketio_json)
 
         def connected():
             self.disconnected = False
@@ -99,14 +120,14 @@ class MainClient:
 
         def authorized(data=None):
             logger.info('Authorization successful')
-            data['ex_data'] = {'status': data['status']}
-            data.update({'ex_data': data})
-            self.friend_code = data['friend_code']
-            self.id = data['id']
-            self.spotifyclient = SpotifyClient(self.id, self.friend_code, data)
-            self.spotifyclient.last_song = data['ex_data']['last_track']
-            self.spotifyclient.user_data = data['ex_data']
-            self.spotifyclient.user_data.update({'status': data['ex_data']['status']})
+            user = decode_user(data, self.strict_payloads)
+            if user is None:
+                return
+            self.friend_code = user.friend_code
+            self.id = user.id
+            self.spotifyclient = SpotifyClient(self.id, self.friend_code, user.user_data)
+            self.events.publish(MainStatusChanged())
+            self.apply_roster_snapshot()
             progress_bar.setValue(40)
 
         def disconnected():
@@ -152,6 +173,7 @@ class MainClient:
             self.client.disconnect()
             self.listening_friends = []
             self.listening_friends_time = {}
+            self.update_listen_along_text()
             QtCore.QTimer.singleShot(0, self.ui.worker2.update_friend_statuses)
             if self.ui.active_dialog:
                 if self.ui.active_dialog.error and "playback controller" in self.ui.active_dialog.label_2.text():
@@ -164,7 +186,7 @@ class MainClient:
                     try:
                         self.client.disconnect()
                         QtCore.QTimer.singleShot(0, self.ui.disconnect_overlay.show)
-                        self.client = Client(False, logger=True)
+                        self.client = Client(False, logger=True, json=socketio_json)
                         add_event_listeners()
                         self.client.connect(REGULAR_BASE, headers={'authorization': self._access_token,
                                                                    'version': VERSION},
@@ -183,155 +205,156 @@ class MainClient:
 
         def get_friends(data=None):
             if data:
-                for friend in data:
-                    friend.update({'ex_data': friend})
-                    self.friends.update({friend['id']: SpotifyClient(friend['id'], friend['friend_code'], friend)})
+                friends = {}
+                for friend in decode_friend_list(data, self.strict_payloads):
+                    client = self.friends.get(friend.id)
+                    if client is None:
+                        friends[friend.id] = SpotifyClient(friend.id, friend.friend_code, friend.user_data)
+                        continue
+                    # reconcile the friend restored from the snapshot, which the UI may already be showing
+                    client.friendCode = friend.friend_code
+                    client.user_data = friend.user_data
+                    client.last_song = friend.last_track
+                    if friend.status != 'Listening':
+                        client.song_data = {}  # the restored song would still say they are listening
+                    # otherwise keep showing the song from the snapshot until this friend's song_update arrives
+                    client.user_update()
+                    friends[friend.id] = client
+                changed = set(self.friends) | set(friends)  # includes restored friends that are no longer friends
+                self.friends = friends
+                with self._status_lock:
+                    self._friendstatus = {id_: friend.status for id_, friend in self.friends.items()}
+                    self.status_counts = Counter(status.playing_status for status in self._friendstatus.values())
+                self.stamp('friends', *changed)
             progress_bar.setValue(45)
 
         def friend_requests(data=None):
             for request_id in data:
                 self.friend_requests.update({request_id: data[request_id]})
+            self.stamp('requests', *data)
             progress_bar.setValue(50)
 
         def outbound_friend_requests(data=None):
             for request_id in data:
                 self.outbound_friend_requests.update({request_id: data[request_id]})
+            self.stamp('outbound_requests', *data)
 
         def song_update(data=None):
 
-            def cache_album(data_):
-                if data_.get('album_colors', None):
-                    url = data_['item']['album']['images'][0]['url']
-                    id_ = url.split('/image/')[1]
-                    if id_ not in self.album_cache:
-                        self.album_cache.update({id_: data_['album_colors']})
-                        with open(data_dir + 'color_cache.json', 'r') as cachef:
-                            cache = json.load(cachef)
-                            cache.update({id_: data_['album_colors']})
-                        with open(data_dir + 'color_cache.json', 'w') as cachef:
-                            json.dump(cache, cachef, indent=4)
-                        if not os.path.exists(data_dir + f'album{id_}.png'):
+            def cache_album(song):
+                if song.album_colors and song.album_image_id:
+                    url = song.parsed.albumimagelink
+                    id_ = song.album_image_id
+                    cached = self.colors.get_album(id_)
+                    if cached is None:
+                        self.colors.put_album(id_, song.album_colors)
+                        if f'album{id_}.png' not in get_album_store() and song.album_img_url:
                             try:
-                                img = requests.get(data_['album_img_url'], timeout=5)
-                            except requests.exceptions.ConnectionError:
+                                get_image_fetcher().fetch(
+                                    song.album_img_url,
+                                    save=lambda data: get_album_store().write(f'album{id_}.png', data)).result()
+                            except requests.RequestException:
                                 logger.warning(f'Downloading of feathered image '
-                                               f'{data_["album_img_url"].split("/album/")[1]} failed, '
+                                               f'{song.album_img_url.split("/album/")[1]} failed, '
                                                f'feathering locally')
                                 return
-                            if img.status_code == 200:
-                                with open(data_dir + f'album{id_}.png', 'wb') as f:
-                                    f.write(img.content)
-                                    logger.info(f'Downloaded feathered image {id_}')
-                                    clean_album_image_cache(url)
-                    elif id_ in self.album_cache and data_['album_colors'] != self.album_cache[id_]:
-                        self.album_cache.pop(id_)
-                        with open(data_dir + 'color_cache.json', 'w') as cachef:
-                            json.dump(self.album_cache, cachef, indent=4)
+                            logger.info(f'Downloaded feathered image {id_}')
+                            get_album_index().touch(id_)
+                            clean_album_image_cache(url)
+                    elif cached != tuple(tuple(color) for color in song.album_colors):
+                        self.colors.discard_album(id_)
 
             while not self.spotifyclient:
                 time.sleep(0.1)
-            if data:
-                if data['ex_data']['id'] == self.id:
-                    actual_data = None if data.get('none') else data
-                    cache_album(data)
-                    self.spotifyclient.song_data = actual_data
-                    self.spotifyclient.last_song = data['ex_data']['last_track']
-                    self.spotifyclient.user_data = data['ex_data']
-                    self.spotifyclient.user_data.update({'status': data['ex_data']['status']})
+            song = decode_song_update(data, self.strict_payloads) if data else None
+            if song:
+                if song.user_id == self.id:
+                    client = self.spotifyclient
+                elif song.user_id in self.friends:
+                    client = self.friends[song.user_id]
+                else:
+                    return
+                client.song_data = song.track
+                cache_album(song)
+                client.last_song = song.last_track
+                client.user_data = song.user_data
+                client.refresh_status()
+                if client is self.spotifyclient:
+                    self.events.publish(MainStatusChanged())
                 else:
-                    actual_data = None if data.get('none') else data
-                    self.friends[data['ex_data']['id']].song_data = actual_data
-                    cache_album(data)
-                    self.friends[data['ex_data']['id']].last_song = data['ex_data']['last_track']
-                    self.friends[data['ex_data']['id']].user_data = data['ex_data']
-                    self.friends[data['ex_data']['id']].user_data.update({'status': data['ex_data']['status']})
-
-        def cache_profile(data_):
-            if data_.get('profile_colors', None):
-                id_ = data_['id']
-                if self.profile_cache.get(id_, None) != data_['profile_colors']:
-                    self.profile_cache.update({id_: data_['profile_colors']})
-                    with open(data_dir + 'profile_cache.json', 'r') as cachef:
-                        cache = json.load(cachef)
-                        cache.update({id_: data_['profile_colors']})
-                    with open(data_dir + 'profile_cache.json', 'w') as cachef:
-                        json.dump(cache, cachef, indent=4)
-                    if not os.path.exists(data_dir + f'icon{id_}.png'):
-                        img = requests.get(data_['profile_img_url'], timeout=5)
-                        if img.status_code == 200:
-                            with open(data_dir + f'icon{id_}.png', 'wb') as f:
-                                f.write(img.content)
+                    self.update_friend_status(song.user_id)
+
+        def cache_profile(user):
+            if user.profile_colors:
+                id_ = user.id
+                if self.colors.get_profile(id_) != tuple(tuple(color) for color in user.profile_colors):
+                    self.colors.put_profile(id_, user.profile_colors)
+                    if not os.path.exists(data_dir + f'icon{id_}.png') and user.profile_img_url:
+                        try:
+                            get_image_fetcher().fetch(
+                                user.profile_img_url,
+                                save=lambda data: write_atomic(data_dir + f'icon{id_}.png', data)).result()
+                        except requests.RequestException as exc:
+                            logger.warning(f'Downloading of profile picture {id_} failed: ', exc_info=exc)
                     return
                 return
             try:
-                id_ = data_['id']
-                rand = random.randint(0, 10000)
-                if data_.get('images', None):
-                    url = data_['images'][-1]['url']
-                    img_data = requests.get(url, timeout=5).content
-                    with open(data_dir + f'tempicon{rand}{id_}.png', 'wb') as handler:
-                        handler.write(img_data)
-                else:
-                    image = Image.open(data_dir + 'default_user.png').resize((200, 200))
-                    image.save(data_dir + f'tempicon{rand}{id_}.png')
-                mask = Image.open(data_dir + 'mask.png').convert('L')
-                mask = mask.resize((200, 200))
-                im = Image.open(data_dir + f'tempicon{rand}{id_}.png').convert('RGBA')
-                output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
-                output.putalpha(mask)
-                output.resize((200, 200))
-                try:
-                    os.remove(data_dir + f'tempicon{rand}{id_}.png')
-                except (FileNotFoundError, OSError, PermissionError):
-                    pass
-                output.save(data_dir + f'icon{id_}.png')
-                with open(data_dir + 'profile_cache.json') as imagefile:
-                    self.profile_cache = json.load(imagefile)
-                image = ColorThief(data_dir + f'icon{id_}.png')
-                dominant_color = image.get_color(quality=1)
+                id_ = user.id
+                icon = get_avatar_cache().icon(id_, user.avatar_url)
+                dominant_color = get_image_worker().run('dominant_color', icon)
                 dark_color = [color - 30 if not (color - 30) < 0 else 0 for color in dominant_color]
                 if np.average(dominant_color) > 200:
                     text_color = [0, 0, 0]
                 else:
                     text_color = [255, 255, 255]
-                with open(data_dir + 'profile_cache.json', 'w') as imagefile:
-                    self.profile_cache.update({id_: [list(dominant_color), dark_color, text_color]})
-                    json.dump(self.profile_cache, imagefile, indent=4)
+                self.colors.put_profile(id_, (dominant_color, dark_color, text_color))
             except (FileNotFoundError, OSError, PermissionError):
                 pass
 
         def user_update(data=None):
-            if data:
-                if data['ex_data']['id'] == self.id:
-                    cache_profile(data['ex_data'])
-                    self.spotifyclient.user_data = data
-                    self.spotifyclient.user_data['status'] = data['ex_data']['status']
+            user = decode_user_update(data, self.strict_payloads) if data else None
+            if user:
+                if user.id == self.id:
+                    cache_profile(user)
+                    self.spotifyclient.user_data = user.user_data
                     self.spotifyclient.user_update()
-                else:
-                    cache_profile(data['ex_data'])
-                    self.friends[data['ex_data']['id']].user_data = data
-                    self.friends[data['ex_data']['id']].user_update()
+                    self.events.publish(MainStatusChanged())
+                elif user.id in self.friends:
+                    cache_profile(user)
+                    self.friends[user.id].user_data = user.user_data
+                    self.friends[user.id].user_update()
+                    self.update_friend_status(user.id)
                     self.initialized_friends += 1
                 if self.initialized_friends == len(self.friends):
                     self.initialized = True
 
         def new_request(data):
             self.friend_requests.update(data)
+            self.stamp('requests', *data)
 
         def remove_request(data):
             self.friend_requests.pop(data, None)
             self.outbound_friend_requests.pop(data, None)
+            self.stamp('requests', data)
+            self.stamp('outbound_requests', data)
 
         def new_outbound_request(data):
             self.outbound_friend_requests.update(data)
+            self.stamp('outbound_requests', *data)
 
         def new_friend(data):
             self.friends.update({data['id']: SpotifyClient(data['id'], data['friend_code'], data)})
+            self.update_friend_status(data['id'])
             text = f'{data["display_name"]} is now your friend.'
             self.ui.show_snack_bar_threadsafe(text, fallback_title='New Friend', fallback_text=text)
 
         def remove_friend(data):
             self.friends.pop(data['id'], None)
+            if data['id'] in self.listening_friends:
+                self.listening_friends.remove(data['id'])
+                self.listening_friends_time.pop(data['id'], None)
+                self.update_listen_along_text()  # update_friend_status only does it for friends still listening
+            self.update_friend_status(data['id'])
 
         def settings(data):
             self.song_broadcast = int(not data['privacy'])
@@ -342,6 +365,7 @@ class MainClient:
                 if len(self.listening_friends) == 1:
                     QtCore.QTimer.singleShot(0, self.ui.timer.start)
                 self.listening_friends_time[data] = time.time()
+                self.update_listen_along_text()
                 QtCore.QTimer.singleShot(0, self.ui.worker2.update_friend_statuses)
                 text = f'{self.friendstatus[data].clientusername} started listening along to you.'
                 self.ui.show_snack_bar_threadsafe(text, fallback_title='Listening Along', fallback_text=text)
@@ -351,6 +375,7 @@ class MainClient:
             try:
                 self.listening_friends.pop(self.listening_friends.index(data))
                 self.listening_friends_time.pop(data)
+                self.update_listen_along_text()
                 if data in self.friendstatus:
                     text = f'{self.friendstatus[data].clientusername} stopped listening along to you.'
                     self.ui.show_snack_bar_threadsafe(text, fallback_title='Listening Along', fallback_text=text)
@@ -444,6 +469,8 @@ class MainClient:
             self.spotifyplayer = SpotifyPlayer(cookie_str=cookie)
             self.spotifyplayer.add_event_reciever(self.send_next_for_listening)
             self.spotifyplayer.add_event_reciever(self.send_state_for_listening)
+            self.prefetcher = QueuePrefetcher(self.spotifyplayer)
+            self.spotifyplayer.add_event_reciever(self.prefetcher.schedule)
         except Exception as e:
             logger.error('SpotifyPlayer failed to create: ', exc_info=e)
             self.spotifyplayer = None
@@ -474,12 +501,11 @@ class MainClient:
                     else:
                         logger.critical('An error occured while trying to refresh the authorization token, exiting.')
                         self.quit(401)
-                request_type = request_type.lower()
-                resp = getattr(requests, request_type)(url, data=data, headers={'authorization': self._access_token},
-                                                       timeout=timeout)
+                resp = get_http_client().request(request_type, url, data=data,
+                                                 headers={'authorization': self._access_token}, timeout=timeout)
                 if resp.status_code == 401 and resp.json()['reason'] == 'Unauthorized':
-                    resp = requests.get(BASE_URL + '/login/eligible', headers={'authorization': self._access_token},
-                                        timeout=timeout)
+                    resp = get_http_client().get(BASE_URL + '/login/eligible',
+                                                 headers={'authorization': self._access_token}, timeout=timeout)
                     if resp.status_code == 401 and resp.json()['reason'] == 'Timed out.':
                         while self._is_refreshing:
                             time.sleep(0.1)
@@ -495,9 +521,8 @@ class MainClient:
                     else:
                         logger.critical(f'A critical error occured with authorization, exiting: {resp.json()}')
                         self.quit(401)
-                    resp = getattr(requests, request_type)(url, data=data,
-                                                           headers={'authorization': self._access_token},
-                                                           timeout=timeout)
+                    resp = get_http_client().request(request_type, url, data=data,
+                                                     headers={'authorization': self._access_token}, timeout=timeout)
                     func = signature(callback)
                     if len(func.parameters) > 0:
                         callback(resp)
@@ -518,7 +543,73 @@ class MainClient:
             logger.error(f'An error occured while invoking request to {url}: ', exc_info=req_exc)
             failed()
 
+    @property
+    def ready(self) -> bool:
+        """
+            Whether there is enough data to build the UI, either because every friend has been initialized or because
+            the roster was restored from the last session's snapshot (and will be reconciled as live data arrives),
+            and the settings have been received.
+        """
+        return (self.initialized or self.warm_started) and self.song_broadcast is not None
+
+    def apply_roster_snapshot(self):
+        """
+            Restore the friends, their last known statuses and their colors from the snapshot of the last session, if
+            it belongs to the user that just authorized.
+        """
+        snapshot, self._roster_snapshot = self._roster_snapshot, None
+        if not snapshot or snapshot.get('id') != self.id or self.friends:
+            return
+        for id_, friend in snapshot.get('friends', {}).items():
+            try:
+                client = SpotifyClient(id_, friend['friend_code'], dict(friend['user_data'],
+                                                                        last_track=friend['last_track']))
+                client.song_data = friend['song_data']
+                client.refresh_status()
+            except (KeyError, TypeError, IndexError) as exc:
+                logger.warning(f'Skipping friend {id_} in the roster snapshot: ', exc_info=exc)
+                continue
+            self.friends[id_] = client
+        for colors, cache in ((snapshot.get('profile_colors', {}), self.colors.profiles),
+                              (snapshot.get('album_colors', {}), self.colors.albums)):
+            cache.update({id_: color for id_, color in colors.items() if id_ not in cache})
+        with self._status_lock:
+            self._friendstatus = {id_: friend.status for id_, friend in self.friends.items()}
+            self.status_counts = Counter(status.playing_status for status in self._friendstatus.values())
+        self.stamp('friends', *self.friends)
+        self.warm_started = True
+        logger.info(f'Restored {len(self.friends)} friends from the roster snapshot')
+
+    def save_roster_snapshot(self):
+        """
+            Persist the friends, their last known statuses and their colors, so the next launch can show them before
+            the server has sent everything.
+        """
+        if not self.id or not self.ready:
+            return
+        friends = {}
+        album_colors = {}
+        for id_, friend in self.friends.copy().items():
+            user_data = {key: value for key, value in friend.user_data.items() if key != 'ex_data'}
+            friends[id_] = {'friend_code': friend.friendCode, 'user_data': user_data, 'song_data': friend.song_data,
+                            'last_track': friend.last_song}
+            url = friend.status.albumimagelink if friend.status else None
+            if url and '/image/' in url and url.split('/image/')[1] in self.colors.albums:
+                album_colors[url.split('/image/')[1]] = self.colors.albums[url.split('/image/')[1]]
+        profile_colors = {id_: self.colors.profiles[id_] for id_ in friends if id_ in self.colors.profiles}
+        try:
+            write_snapshot(data_dir + 'roster_snapshot.bin', {'id': self.id, 'friends': friends,
+                                                              'profile_colors': profile_colors,
+                                                              'album_colors': album_colors})
+        except (OSError, PermissionError, TypeError, ValueError) as exc:
+            logger.warning('Failed to save the roster snapshot: ', exc_info=exc)
+
+    @staticmethod
+    def clear_roster_snapshot():
+        remove_snapshot(data_dir + 'roster_snapshot.bin')
+
     def quit(self, code):
+        self.save_roster_snapshot()
         try:
             if self.ui:
                 if code == 0:
@@ -529,8 +620,22 @@ class MainClient:
             logger.error('An error occured while trying to quit: ', exc_info=exc)
         if self.spotifyplayer:
             self.spotifyplayer.disconnect()
+        if self.prefetcher:
+            self.prefetcher.stop()
+            logger.info(f'Prefetched the albums of {self.prefetcher.prefetched} upcoming tracks')
+            logger.info(f'Saved track cache usage: {self.spotifyplayer.saved_tracks.summary()}')
         self.disconnected = True
         self.client.disconnect()
+        logger.info(f'Color cache usage: {self.colors.summary()}')
+        logger.info(f'Avatar cache usage: {get_avatar_cache().summary()}')
+        logger.info(f'Decoded image cache usage: {get_pixmap_cache().summary()}')
+        logger.info(f'HTTP connection usage: {get_http_client().summary()}')
+        logger.info(f'Playlist cache usage: {get_playlist_cache().summary()}')
+        logger.info(f'Image downloads: {get_image_fetcher().summary()}')
+        shutdown_image_fetcher()
+        close_http_client()
+        flush_stores()
+        shutdown_image_worker()
         QtWidgets.QApplication.setQuitOnLastWindowClosed(True)
         QtWidgets.QApplication.exit(code)
         gc.collect()
@@ -591,12 +696,69 @@ class MainClient:
                 self.client.disconnect()
                 return
 
-    def __getattribute__(self, item):
-        if item == 'mainstatus':
-            song = self.spotifyclient.spotifysong()
-            return song if song else SpotifySong()
-        elif item == 'friendstatus':
-            songs = {id_: val.spotifysong() for id_, val in self.friends.items()}
-            return {id_: val if val else SpotifySong() for id_, val in songs.items()}
-        else:
-            return super().__getattribute__(item)
+    def update_friend_status(self, friend_id):
+        """
+            Publish the cached status of a friend (or drop it if they are no longer a friend) by swapping in a new
+            snapshot dict, so that threads iterating over the old one are never affected. Readers don't need a lock.
+        """
+        with self._status_lock:  # writers are serialized so concurrent updates can't drop each other's copies
+            statuses = dict(self._friendstatus)
+            friend = self.friends.get(friend_id)
+            old_status = statuses.pop(friend_id, None)
+            if old_status:
+                self.status_counts[old_status.playing_status] -= 1
+            if friend:
+                statuses[friend_id] = friend.status if friend.status else SpotifySong()
+                self.status_counts[statuses[friend_id].playing_status] += 1
+            self._friendstatus = statuses
+        if friend_id in self.listening_friends:
+            self.update_listen_along_text()  # the friend's username may have changed
+        self.stamp('friends', friend_id)
+
+    def update_listen_along_text(self):
+        """
+            Rebuild the text with the names of the friends listening along, this should be called whenever
+            listening_friends changes.
+        """
+        names = [self.friends[id_].clientUsername for id_ in self.listening_friends if id_ in self.friends]
+        self.listen_along_text = ', '.join(names) + ' listening along'
+
+    def stamp(self, kind, *ids):
+        """
+            Mark ids of the given kind ('friends', 'requests' or 'outbound_requests') as changed, with a new
+            sequence number, and publish the change to the update threads.
+        """
+        if not ids:
+            return
+        with self._version_lock:
+            versions = self._versions[kind]
+            for id_ in ids:
+                self._sequence += 1
+                versions[id_] = self._sequence
+                versions.move_to_end(id_)
+            sequence = self._sequence
+        self.events.publish(EVENT_TYPES[kind](ids, sequence))
+
+    def changes_since(self, sequence, kind='friends') -> typing.Tuple[int, typing.List[str]]:
+        """
+            Returns the current sequence number and the ids of the given kind that have changed after sequence.
+            Removals are reported too, so the caller should check whether the id still exists.
+        """
+        changed = []
+        with self._version_lock:
+            versions = self._versions[kind]
+            for id_ in reversed(versions):  # most recently changed ids are at the end
+                if versions[id_] <= sequence:
+                    break
+                changed.append(id_)
+            return self._sequence, changed
+
+    @property
+    def mainstatus(self) -> SpotifySong:
+        if self.spotifyclient and self.spotifyclient.status:
+            return self.spotifyclient.status
+        return SpotifySong()
+
+    @property
+    def friendstatus(self) -> typing.Dict[str, SpotifySong]:
+        return self._friendstatus
@@ -0,0 +1,151 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import threading
+import time
+import typing
+from collections import OrderedDict
+from concurrent.futures import Future
+
+__all__ = ('SavedTrackCache', )
+
+logger = logging.getLogger(__name__)
+
+MAX_IDS_PER_REQUEST = 50  # the limit of the Web API's /me/tracks/contains
+MAX_ENTRIES = 1024
+
+
+class SavedTrackCache:
+    """
+        A class that represents whether tracks are in the user's liked songs, looked up in batches of up to 50 ids per
+        request and cached until the dealer reports a change to the library (or ttl runs out, for changes that were
+        missed while disconnected). Concurrent lookups of the same track share one request.
+
+        Parameters:
+            request (Callable): The function to make Web API requests with, SpotifyPlayer.create_api_request.
+            ttl (float) (optional): How long a lookup is trusted for, in seconds.
+    """
+
+    def __init__(self, request: typing.Callable, ttl: float = 1800):
+        self.request = request
+        self.ttl = ttl
+        self._entries: typing.OrderedDict[str, typing.Tuple[float, bool]] = OrderedDict()
+        self._in_flight: typing.Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _set(self, track_id: str, saved: bool):
+        self._entries[track_id] = (time.time() + self.ttl, saved)
+        self._entries.move_to_end(track_id)
+        while len(self._entries) > MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def _fetch(self, track_ids: typing.List[str], futures: typing.Dict[str, Future]):
+        """
+            Helper function that looks the tracks up, MAX_IDS_PER_REQUEST at a time, and resolves their futures.
+        """
+        for start in range(0, len(track_ids), MAX_IDS_PER_REQUEST):
+            batch = track_ids[start:start + MAX_IDS_PER_REQUEST]
+            try:
+                resp = self.request(f'/me/tracks/contains?ids={",".join(batch)}')
+                saved = resp.json()
+                if not isinstance(saved, list) or len(saved) != len(batch):
+                    raise ValueError(f'Unexpected response to a saved tracks lookup: {saved}')
+            except Exception as exc:
+                logger.warning('Could not look up whether tracks are saved: ', exc_info=exc)
+                saved = None  # not cached, and reported as not saved
+            with self._lock:
+                for index, track_id in enumerate(batch):
+                    if saved is not None:
+                        self._set(track_id, bool(saved[index]))
+                    self._in_flight.pop(track_id, None)
+            for index, track_id in enumerate(batch):
+                futures[track_id].set_result(bool(saved[index]) if saved is not None else False)
+
+    def _lookup(self, track_ids: typing.Iterable[str]) -> typing.Dict[str, Future]:
+        """
+            Helper function that returns a future of whether each track is saved, fetching the unknown ones in as
+            few requests as possible.
+        """
+        futures: typing.Dict[str, Future] = {}
+        missing: typing.List[str] = []
+        now = time.time()
+        with self._lock:
+            for track_id in dict.fromkeys(track_ids):
+                entry = self._entries.get(track_id)
+                future = futures[track_id] = Future()
+                if entry and entry[0] > now:
+                    self.hits += 1
+                    future.set_result(entry[1])
+                elif track_id in self._in_flight:
+                    self.hits += 1
+                    futures[track_id] = self._in_flight[track_id]
+                else:
+                    self.misses += 1
+                    self._in_flight[track_id] = future
+                    missing.append(track_id)
+        if missing:
+            self._fetch(missing, futures)
+        return futures
+
+    def is_saved(self, track_id: str) -> bool:
+        """
+            Returns whether a track is in the user's liked songs.
+        """
+        return self._lookup((track_id, ))[track_id].result()
+
+    def prefetch(self, track_ids: typing.Iterable[str]):
+        """
+            Looks up the tracks that aren't cached yet (like the upcoming ones in the queue), this blocks until done.
+        """
+        self._lookup(track_ids)
+
+    def set(self, track_id: str, saved: bool):
+        """
+            Records that a track was saved or removed from this client.
+        """
+        with self._lock:
+            self._set(track_id, saved)
+
+    def apply_dealer_items(self, payload: dict):
+        """
+            Updates the cache with a dealer library change, which lists the changed tracks and whether they were
+            removed. Anything unexpected invalidates the whole cache instead.
+        """
+        try:
+            items = [(item['identifier'], not item.get('removed', False)) for payload_ in payload['payloads']
+                     for item in payload_['items'] if item.get('type', 'track') == 'track']
+        except (KeyError, TypeError) as exc:
+            logger.debug('Unexpected library change, invalidating every saved track: ', exc_info=exc)
+            self.invalidate()
+            return
+        with self._lock:
+            for track_id, saved in items:
+                self._set(track_id, saved)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self) -> str:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        rate = hits / (hits + misses) if hits + misses else 0
+        return f'{hits} hits, {misses} misses ({rate:.0%})'
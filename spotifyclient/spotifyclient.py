@@ -19,6 +19,7 @@ Copyright (C) 2020-Present CriticalElement
 import typing
 
 from .spotifysong import SpotifySong  # noqa
+from .trackparser import parse_track
 
 
 class SpotifyClient(object):
@@ -34,86 +35,19 @@ class SpotifyClient(object):
         self.last_song = user_data['last_track']
         self.clientUsername = None
         self.clientAvatar = None
+        self.status: typing.Optional[SpotifySong] = None
         self.user_update()
         self.isInitialized = True
 
-    def spotifySongParse(self, track) -> SpotifySong:
+    def spotifySongParse(self, track) -> typing.Optional[SpotifySong]:
         """
             Parse the Spotify track dict into a SpotifySong.
         """
-        track_info = None
-        if track:
-            if track['currently_playing_type'] != 'ad' and track['item'] and not track['item']['is_local']:
-                is_playing = track['is_playing']
-                song_name = track['item']['name']
-                song_id = track['item']['id']
-                song_link = track['item']['external_urls']['spotify']
-                try:
-                    context_link = track['context']['external_urls']['spotify']
-                    context_type = track['context']['type']
-                    context_data = track['context']['href']
-                except (TypeError, KeyError):
-                    context_link = None
-                    context_type = None
-                    context_data = None
-                progress = track['progress_ms'] / 1000
-                duration = track['item']['duration_ms']
-                album_name = track['item']['album']['name']
-                album_link = track['item']['album']['external_urls']['spotify']
-                album_image = track['item']['album']['images'][0]['url']
-                song_authors_urls = []
-                song_authors = []
-                for info in track['item']['artists']:
-                    song_authors_urls.append(info['external_urls']['spotify'])
-                    song_authors.append(info['name'])
-                playing_status = track['ex_data']['status']
-                track_info = SpotifySong(song_name, song_id, song_link, context_type, context_data, context_link,
-                                         progress, duration,
-                                         album_name, album_link, album_image, song_authors_urls, song_authors,
-                                         is_playing, 'track', self.clientUsername, self.clientAvatar, self.user_id,
-                                         self.friendCode, playing_status, self.last_song)
-            playing_status = track['ex_data']['status']
-            if track['currently_playing_type'] == 'ad':
-                track_info = SpotifySong(playing_type='ad',
-                                         clientusername=self.clientUsername, clientavatar=self.clientAvatar,
-                                         client_id=self.user_id, friend_code=self.friendCode,
-                                         playing_status=playing_status, last_song=self.last_song)
-            if track['item'] and track['item']['is_local']:
-                is_playing = track['is_playing']
-                song_name = track['item']['name']
-                progress = track['progress_ms'] / 1000
-                duration = track['item']['duration_ms']
-                if track['item']['artists'][0]['name']:
-                    song_authors = [track['item']['artists'][0]['name']]
-                else:
-                    song_authors = None
-                playing_status = track['ex_data']['status']
-                try:
-                    context_link = track['context']['external_urls']['spotify']
-                    context_type = track['context']['type']
-                    context_data = track['context']['href']
-                except (TypeError, KeyError):
-                    context_link = None
-                    context_type = None
-                    context_data = None
-                track_info = SpotifySong(songname=song_name, contexttype=context_type, contextdata=context_data,
-                                         contexturl=context_link, song_authors=song_authors, progress=progress,
-                                         is_playing=is_playing, playing_type='local file',
-                                         clientusername=self.clientUsername,
-                                         clientavatar=self.clientAvatar, client_id=self.user_id,
-                                         friend_code=self.friendCode, playing_status=playing_status,
-                                         last_song=self.last_song, duration=duration)
-        else:
-            if self.user_data.get('ex_data', None):
-                playing_status = self.user_data['ex_data']['status']
-            else:
-                playing_status = self.user_data['status']
-            track_info = SpotifySong(playing_type='None',
-                                     clientusername=self.clientUsername, clientavatar=self.clientAvatar,
-                                     client_id=self.user_id, friend_code=self.friendCode, playing_status=playing_status,
-                                     last_song=self.last_song)
-
-        return track_info
+        parsed = parse_track(track)
+        if parsed is None:
+            return None
+        return SpotifySong(**parsed._asdict(), clientusername=self.clientUsername, clientavatar=self.clientAvatar,
+                           client_id=self.user_id, friend_code=self.friendCode, last_song=self.last_song)
 
     def spotifysong(self) -> typing.Optional[SpotifySong]:
         track_info = self.spotifySongParse(self.song_data)
@@ -134,3 +68,11 @@ class SpotifyClient(object):
             self.clientAvatar = self.user_data['images'][-1]['url']
         else:
             self.clientAvatar = None
+        self.refresh_status()
+
+    def refresh_status(self) -> SpotifySong:
+        """
+            Rebuild the cached SpotifySong snapshot, this should be called whenever song_data or user_data changes.
+        """
+        self.status = self.spotifysong()
+        return self.status
@@ -28,9 +28,12 @@ import random
 import time
 import typing
 
-from threading import Thread
+from threading import Lock, Thread
 from requests.exceptions import RequestException
 
+from spotifyclient.savedtracks import SavedTrackCache
+from utils.decoding import decode_dealer_message
+
 
 logger = logging.getLogger(__name__)
 
@@ -209,6 +212,8 @@ class SpotifyPlayer:
                                                '(KHTML, like Gecko) Chrome/87.0.4280.66 Safari/537.36'}
 
         self._session = requests.Session()
+        self._token_lock = Lock()
+        self.saved_tracks = SavedTrackCache(self.create_api_request)
         self.event_reciever = event_reciever
         self.shuffling = False
         self.looping = False
@@ -259,76 +264,50 @@ class SpotifyPlayer:
                 while True:
                     try:
                         recv = await ws.recv()
-                        load = json.loads(recv)
-                        if load.get('headers'):
-                            if load['headers'].get('Spotify-Connection-Id'):
-                                self.connection_id = load['headers']['Spotify-Connection-Id']
-                        if load.get('payloads'):
-                            try:
-                                if 'items' in load['payloads'][0]:  # liked song change (I think)
-                                    for ev in self.event_reciever:
-                                        try:
-                                            func = signature(ev)
-                                            if len(func.parameters) > 0:
-                                                ev(load)
-                                            else:
-                                                ev()
-                                        except Exception as e:
-                                            logger.error('An exception occured while executing an event listener: ',
-                                                         exc_info=e)
-                                if load['payloads'][0].get('cluster'):
-                                    try:
-                                        self.queue = load['payloads'][0]['cluster']['player_state']['next_tracks']
-                                    except KeyError:
-                                        pass
-                                    try:
-                                        update_reason = load['payloads'][0]['update_reason']
-                                        if 'DEVICE' in update_reason:
-                                            self.devices = load['payloads'][0]['cluster']['devices']
-                                    except KeyError:
-                                        pass
-                                    self.queue_revision = (load['payloads'][0]['cluster']['player_state']
-                                                           ['queue_revision'])
-                                    self.player_state = load['payloads'][0]['cluster']['player_state']
-                                    options = load['payloads'][0]['cluster']['player_state']['options']
-                                    try:
-                                        active_device = load['payloads'][0]['cluster']['active_device_id']
-                                        if 'volume' in load['payloads'][0]['cluster']['devices'][active_device]:
-                                            self.current_volume = (load['payloads'][0]['cluster']['devices']
-                                                                   [active_device]['volume'])
-                                        else:
-                                            self.current_volume = 0
-                                        self.active_device_id = active_device
-                                    except KeyError:
-                                        self.active_device_id = ''
-                                    self.playing = not load['payloads'][0]['cluster']['player_state']['is_paused']
-                                    self.shuffling = options['shuffling_context']
-                                    try:
-                                        self._last_timestamp = int(load['payloads'][0]['cluster']['player_state']
-                                                                   ['timestamp'])
-                                        timediff = int(load['payloads'][0]['cluster']['server_timestamp_ms'])
-                                        self._timestamp_diff = time.time() - timediff / 1000
-                                    except KeyError:
-                                        self._last_timestamp = 0
-                                        self._timestamp_diff = 0
-                                    position_ms = int(load['payloads'][0]['cluster']['player_state']
-                                                      ['position_as_of_timestamp'])
-                                    if position_ms != self._last_position:
-                                        self._last_position = position_ms
-                                    if options['repeating_track']:
-                                        self.looping = 'track'
-                                    elif options['repeating_context']:
-                                        self.looping = 'context'
+                        message = decode_dealer_message(recv)
+                        if message is None:
+                            continue
+                        if message.connection_id:
+                            self.connection_id = message.connection_id
+                        if message.items_changed:  # liked song change (I think)
+                            self.saved_tracks.apply_dealer_items(message.raw)
+                            for ev in self.event_reciever:
+                                try:
+                                    func = signature(ev)
+                                    if len(func.parameters) > 0:
+                                        ev(message.raw)
                                     else:
-                                        self.looping = 'off'
-                                    for ev in self.event_reciever:
-                                        try:
-                                            ev()
-                                        except Exception as e:
-                                            logger.error('An exception occured while executing an event listener: ',
-                                                         exc_info=e)
-                            except AttributeError:
-                                pass
+                                        ev()
+                                except Exception as e:
+                                    logger.error('An exception occured while executing an event listener: ',
+                                                 exc_info=e)
+                        cluster = message.cluster
+                        if cluster:
+                            if cluster.next_tracks is not None:
+                                self.queue = cluster.next_tracks
+                            if cluster.devices is not None:
+                                self.devices = cluster.devices
+                            self.queue_revision = cluster.queue_revision
+                            self.player_state = cluster.player_state
+                            if cluster.volume is not None:
+                                self.current_volume = cluster.volume
+                            self.active_device_id = cluster.active_device_id
+                            self.playing = not cluster.is_paused
+                            self.shuffling = cluster.shuffling
+                            self._last_timestamp = cluster.timestamp
+                            if cluster.server_timestamp_ms is not None:
+                                self._timestamp_diff = time.time() - cluster.server_timestamp_ms / 1000
+                            else:
+                                self._timestamp_diff = 0
+                            if cluster.position_ms != self._last_position:
+                                self._last_position = cluster.position_ms
+                            self.looping = cluster.looping
+                            for ev in self.event_reciever:
+                                try:
+                                    ev()
+                                except Exception as e:
+                                    logger.error('An exception occured while executing an event listener: ',
+                                                 exc_info=e)
                     except websockets.ConnectionClosed:
                         self._cancel_tasks()
                         return
@@ -541,24 +520,44 @@ class SpotifyPlayer:
         else:
             raise TypeError('The specified event reciever was not in the list of event recievers.')
 
+    def _api_request(self, path, request_type):
+        return getattr(self._session, request_type.lower())('https://api.spotify.com/v1' + path,
+                                                            headers={'Authorization': f'Bearer {self.access_token}'})
+
+    def _renew_access_token(self, stale_token):
+        """
+            Fetches a new access token if stale_token is still the current one, without reconnecting to the dealer or
+            registering the device again, and returns whether the token is usable.
+        """
+        with self._token_lock:
+            if self.access_token != stale_token:
+                return True  # already renewed by another request
+            try:
+                access_token_response = self.get_access_token()
+                self.access_token = access_token_response['accessToken']
+                self.access_token_expire = access_token_response['accessTokenExpirationTimestampMs'] / 1000
+            except (RequestException, ValueError, KeyError) as exc:
+                logger.warning('Could not renew the access token: ', exc_info=exc)
+                return False
+            return True
+
     def create_api_request(self, path, request_type='GET'):
         if request_type.upper() in ['GET', 'PUT', 'DELETE', 'POST', 'PATCH', 'HEAD']:
             try:
-                req = getattr(self._session, request_type.lower())('https://api.spotify.com/v1' + path,
-                                                                   headers={'Authorization': f'Bearer'
-                                                                                             f' {self.access_token}'})
-                if req.status_code == 401:
+                token = self.access_token
+                if self.access_token_expire < time.time():
+                    self._renew_access_token(token)
+                req = self._api_request(path, request_type)
+                if req.status_code == 401 and self._renew_access_token(token):
+                    req = self._api_request(path, request_type)
+                if req.status_code == 401:  # a new token didn't help, the whole session has to be renewed
                     self._cancel_tasks()
                     while not self.isinitialized:
                         time.sleep(0.1)
-                    req = getattr(self._session, request_type.lower())('https://api.spotify.com/v1' + path,
-                                                                       headers={'Authorization': f'Bearer'
-                                                                                f' {self.access_token}'})
+                    req = self._api_request(path, request_type)
                 return req
             except RequestException:
-                return getattr(self._session, request_type.lower())('https://api.spotify.com/v1' + path,
-                                                                    headers={'Authorization': f'Bearer'
-                                                                                              f' {self.access_token}'})
+                return self._api_request(path, request_type)
 
     def _cancel_tasks(self):
         if self.websocket_task_event_loop and self.ws:
@@ -20,7 +20,15 @@ import typing
 import datetime
 
 
+_UNSET = object()  # sentinel for the lazily computed last_song attributes
+
+
 class SpotifySong:
+    __slots__ = ('songname', 'songid', 'songlink', 'contexttype', 'contextdata', 'contexturl', 'progress', 'duration',
+                 'albumname', 'albumnlink', 'albumimagelink', 'song_authors_urls', 'song_authors', 'is_playing',
+                 'playing_type', 'clientusername', 'clientavatar', 'client_id', 'friend_code', 'playing_status',
+                 '_last_song_data', '_last_song', '_last_song_timestamp')
+
     def __init__(self,
                  songname: typing.Optional[str] = '',
                  songid: typing.Optional[str] = None,
@@ -67,7 +75,8 @@ class SpotifySong:
                 client_id (str) (optional): The user's user id.
                 friend_code (str) (optional): The user's friend code.
                 playing_status (str) (optional): The user's playing status.
-                last_song (dict) (optional): The last track that the user played.
+                last_song (dict) (optional): The last track that the user played, this is only parsed into
+                                             last_song / last_song_timestamp when they are first accessed.
         """
         self.songname = songname
         self.songid = songid
@@ -89,32 +98,46 @@ class SpotifySong:
         self.client_id = client_id
         self.friend_code = friend_code
         self.playing_status = playing_status
-        self.last_song = None
-        self.last_song_timestamp = None
+        self._last_song_data = last_song
+        self._last_song = _UNSET
+        self._last_song_timestamp = _UNSET
 
         if type(self.song_authors) == str:
             self.song_authors = [self.song_authors]
 
-        if last_song:
-            if last_song.get('context'):
-                href = last_song['context'].get('href')
-                type_ = last_song['context'].get('type')
+    @property
+    def last_song(self) -> typing.Optional['SpotifySong']:
+        if self._last_song is _UNSET:
+            last_song = self._last_song_data
+            if last_song:
+                if last_song.get('context'):
+                    href = last_song['context'].get('href')
+                    type_ = last_song['context'].get('type')
+                else:
+                    href = None
+                    type_ = None
+                self._last_song = SpotifySong(last_song['track']['name'],
+                                              song_authors=[artist['name'] for artist in last_song['track']['artists']],
+                                              albumname=last_song['album']['name'],
+                                              contextdata=href, contexttype=type_,
+                                              songid=last_song['track']['id'],
+                                              friend_code=self.friend_code, client_id=self.client_id,
+                                              clientusername=self.clientusername)
             else:
-                href = None
-                type_ = None
-            self.last_song = SpotifySong(last_song['track']['name'],
-                                         song_authors=[artist['name'] for artist in last_song['track']['artists']],
-                                         albumname=last_song['album']['name'],
-                                         contextdata=href, contexttype=type_,
-                                         songid=last_song['track']['id'],
-                                         friend_code=friend_code, client_id=client_id, clientusername=clientusername)
-            if last_song.get('played_at'):
-                self.last_song_timestamp = datetime.datetime.strptime(last_song['played_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
-                self.last_song_timestamp = self.last_song_timestamp.replace(tzinfo=datetime.timezone.utc)
-                self.last_song_timestamp = self.last_song_timestamp.astimezone(datetime.datetime.now().astimezone().
-                                                                               tzinfo)
+                self._last_song = None
+        return self._last_song
+
+    @property
+    def last_song_timestamp(self) -> typing.Optional[datetime.datetime]:
+        if self._last_song_timestamp is _UNSET:
+            if self._last_song_data and self._last_song_data.get('played_at'):
+                timestamp = datetime.datetime.strptime(self._last_song_data['played_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
+                timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+                self._last_song_timestamp = timestamp.astimezone(datetime.datetime.now().astimezone().tzinfo)
             else:
-                self.last_song_timestamp = None
+                self._last_song_timestamp = None
+        return self._last_song_timestamp
 
     def __repr__(self):
-        return '<' + ', '.join([f'{attr}={self.__dict__[attr]}' for attr in list(self.__dict__.keys())]) + '>'
+        attrs = [attr for attr in self.__slots__ if not attr.startswith('_')] + ['last_song', 'last_song_timestamp']
+        return '<' + ', '.join([f'{attr}={getattr(self, attr)}' for attr in attrs]) + '>'
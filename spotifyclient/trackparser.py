@@ -0,0 +1,144 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import threading
+import typing
+from collections import OrderedDict
+
+__all__ = ('ParsedTrack', 'parse_track', 'clear_parse_cache')
+
+
+class ParsedTrack(typing.NamedTuple):
+    """
+        A typed record of the track related fields of a SpotifySong, parsed out of a song_update payload.
+    """
+    playing_type: str
+    playing_status: typing.Optional[str]
+    songname: typing.Optional[str] = ''
+    songid: typing.Optional[str] = None
+    songlink: typing.Optional[str] = None
+    contexttype: typing.Optional[str] = None
+    contextdata: typing.Optional[str] = None
+    contexturl: typing.Optional[str] = None
+    progress: typing.Optional[float] = 0
+    duration: typing.Optional[int] = 100
+    albumname: typing.Optional[str] = ''
+    albumlink: typing.Optional[str] = None
+    albumimagelink: typing.Optional[str] = None
+    song_authors_urls: typing.Optional[list] = None
+    song_authors: typing.Optional[list] = None
+    is_playing: typing.Optional[bool] = False
+
+
+_CONTEXT_FIELDS = (
+    ('contexturl', ('context', 'external_urls', 'spotify')),
+    ('contexttype', ('context', 'type')),
+    ('contextdata', ('context', 'href')),
+)
+
+# playing type -> (field name, path of keys into the payload, or a callable for fields that aren't a simple path)
+_FIELDS = {
+    'track': (
+        ('is_playing', ('is_playing',)),
+        ('songname', ('item', 'name')),
+        ('songid', ('item', 'id')),
+        ('songlink', ('item', 'external_urls', 'spotify')),
+        ('progress', lambda track: track['progress_ms'] / 1000),
+        ('duration', ('item', 'duration_ms')),
+        ('albumname', ('item', 'album', 'name')),
+        ('albumlink', ('item', 'album', 'external_urls', 'spotify')),
+        ('albumimagelink', lambda track: track['item']['album']['images'][0]['url']),
+        ('song_authors_urls', lambda track: [info['external_urls']['spotify'] for info in track['item']['artists']]),
+        ('song_authors', lambda track: [info['name'] for info in track['item']['artists']]),
+    ),
+    'local file': (
+        ('is_playing', ('is_playing',)),
+        ('songname', ('item', 'name')),
+        ('progress', lambda track: track['progress_ms'] / 1000),
+        ('duration', ('item', 'duration_ms')),
+        ('song_authors', lambda track: [track['item']['artists'][0]['name']]
+                                       if track['item']['artists'][0]['name'] else None),
+    ),
+    'ad': (),
+}
+
+_CACHE_SIZE = 256
+_cache: typing.Dict[int, typing.Tuple[dict, ParsedTrack]] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _playing_type(track) -> typing.Optional[str]:
+    """
+        Helper function that returns which row of the field table a payload should be parsed with.
+    """
+    item = track['item']
+    if item and item['is_local']:
+        return 'local file'
+    if track['currently_playing_type'] == 'ad':
+        return 'ad'
+    if item:
+        return 'track'
+    return None
+
+
+def _dig(payload, path):
+    for key in path:
+        payload = payload[key]
+    return payload
+
+
+def _parse(track) -> typing.Optional[ParsedTrack]:
+    playing_type = _playing_type(track)
+    if playing_type is None:
+        return None
+    fields = {'playing_type': playing_type, 'playing_status': track['ex_data']['status']}
+    for name, getter in _FIELDS[playing_type]:
+        fields[name] = getter(track) if callable(getter) else _dig(track, getter)
+    if playing_type != 'ad':
+        try:
+            fields.update({name: _dig(track, path) for name, path in _CONTEXT_FIELDS})
+        except (TypeError, KeyError):
+            pass  # no context (or a partial one), leave all three context fields empty
+    return ParsedTrack(**fields)
+
+
+def parse_track(track) -> typing.Optional[ParsedTrack]:
+    """
+        Parse a song_update payload into a ParsedTrack, or None if nothing (or nothing parseable) is playing.
+        Results are memoized on the identity of the payload, so parsing the same payload again is free.
+    """
+    if not track:
+        return None
+    key = id(track)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] is track:
+            _cache.move_to_end(key)
+            return cached[1]
+    parsed = _parse(track)
+    with _cache_lock:
+        _cache[key] = (track, parsed)  # keeping a reference to the payload stops its id from being reused
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return parsed
+
+
+def clear_parse_cache():
+    with _cache_lock:
+        _cache.clear()
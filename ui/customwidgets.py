@@ -19,13 +19,11 @@ Copyright (C) 2020-Present CriticalElement
 from __future__ import annotations
 
 import logging
-import random
 import re
 import socket
 import typing
 import time
 import datetime
-import json
 import os
 from io import StringIO
 from threading import Thread
@@ -33,17 +31,21 @@ from threading import Thread
 import PIL
 import requests
 import numpy as np
-from PIL import Image, ImageOps
-from PIL.PyAccess import PyAccess
 from PyQt5 import QtCore, QtWidgets, QtGui, sip
 from platformdirs import *
-from colorthief import ColorThief
 
 from spotifyclient.spotifyplayer import SpotifyPlayer
 from spotifyclient.spotifysong import SpotifySong
 from spotifyclient.spotifylistener import SpotifyListener
 from utils.uiutils import *
 from utils.constants import *
+from utils.events import *
+from utils.icons import *
+from utils.colorstore import get_color_store
+from utils.avatars import get_avatar_cache
+from utils.imageworker import get_image_worker
+from utils.pixmaps import get_pixmap_cache
+from utils.playlists import get_playlist_cache
 from utils.utils import *
 
 
@@ -93,32 +95,7 @@ class PartialStatusWidget:
         self.spotifysong = spotifysong
         self.index = index
         self.accent_color = accent_color
-        url = icon_url
-        if url:
-            img_data = requests.get(url, timeout=15).content
-            with open(data_dir + f'statusicon{client_id}.png', 'wb') as handler:
-                handler.write(img_data)
-        else:
-            image = Image.open(data_dir + 'default_user.png').resize((120, 120))
-            image.save(data_dir + f'statusicon{client_id}.png')
-        mask = Image.open(data_dir + 'mask.png').convert('L')
-        mask = mask.resize((120, 120))
-        im = Image.open(data_dir + f'statusicon{client_id}.png').convert('RGBA')
-        if status == 'offline' and icon_url:
-            im = ImageOps.grayscale(im)
-
-        output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
-        output.putalpha(mask)
-
-        back = Image.open(data_dir + f'{status}.png').convert('RGBA')
-        back.paste(output, (15, 15), mask)
-
-        back = back.resize((50, 50))
-
-        padding = Image.new('RGBA', (80, 70), (0, 0, 0, 0))
-        padding.paste(back, (6, 10))
-
-        padding.save(data_dir + f'statusicon{client_id}.png')
+        get_avatar_cache().status_icon(client_id, icon_url, status)
 
     def convert_to_widget(self):
         return StatusWidget(self.status, self.icon_url, self.client_id, self.client_name, self.spotifysong,
@@ -471,54 +448,32 @@ class PartialBasicUserStatusWidget:
         self.status = status
         self.icon_url = icon_url
         self.mainstatus = mainstatus
-        if not os.path.exists(data_dir + f'icon{mainstatus.client_id}.png'):
-            url = icon_url
-            rand = random.randint(0, 10000)
-            if url is not None:
-                img_data = requests.get(url, timeout=15).content
-                with open(data_dir + f'partialicon{rand}{mainstatus.client_id}.png', 'wb') as handler:
-                    handler.write(img_data)
-            else:
-                image = Image.open(data_dir + 'default_user.png').resize((200, 200))
-                image.save(data_dir + f'partialicon{rand}{mainstatus.client_id}.png')
-            mask = Image.open(data_dir + 'mask.png').convert('L')
-            mask = mask.resize((200, 200))
-            im = Image.open(data_dir + f'partialicon{rand}{mainstatus.client_id}.png').convert('RGBA')
-            output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
-            output.putalpha(mask)
-            output.resize((200, 200))
-            output.save(data_dir + f'icon{mainstatus.client_id}.png')
-            try:
-                os.remove(data_dir + f'partialicon{rand}{mainstatus.client_id}.png')
-            except (FileNotFoundError, OSError, PermissionError):
-                pass
+        get_pixmap_cache().preload(get_avatar_cache().icon(mainstatus.client_id, icon_url))
         shadow_color = None
         if mainstatus.songname:
             download_album(mainstatus.albumimagelink)
             self.dominant_color, self.dark_color, self.text_color = extract_color(mainstatus.albumimagelink)
             feather_image(mainstatus.albumimagelink)
-            with open(data_dir + 'profile_cache.json') as imagefile:
-                profile_images = json.load(imagefile)
-            if mainstatus.client_id in profile_images:
-                avg = np.average(profile_images[mainstatus.client_id][0])
+            if mainstatus.playing_type in ('track', 'local file') and mainstatus.albumimagelink:
+                get_pixmap_cache().preload(data_dir + f'album{mainstatus.albumimagelink.split("/image/")[1]}.png')
+            profile_colors = get_color_store().get_profile(mainstatus.client_id)
+            if profile_colors:
+                avg = np.average(profile_colors[0])
                 if avg > 200:
                     shadow_color = [255, 255, 255, 200]
                 else:
                     shadow_color = [0, 0, 0, 200]
         else:
-            with open(data_dir + 'profile_cache.json') as imagefile:
-                profile_images = json.load(imagefile)
-            if mainstatus.client_id in profile_images:
-                self.dominant_color = tuple(profile_images[mainstatus.client_id][0])
-                self.dark_color = tuple(profile_images[mainstatus.client_id][1])
-                self.text_color = tuple(profile_images[mainstatus.client_id][2])
+            profile_colors = get_color_store().get_profile(mainstatus.client_id)
+            if profile_colors:
+                self.dominant_color, self.dark_color, self.text_color = profile_colors
                 if np.average(self.dominant_color) > 200:
                     shadow_color = [255, 255, 255, 200]
                 else:
                     shadow_color = [0, 0, 0, 200]
             else:
-                image = ColorThief(data_dir + f'icon{mainstatus.client_id}.png')
-                dominant_color = image.get_color(quality=1)
+                dominant_color = get_image_worker().run('dominant_color',
+                                                        data_dir + f'icon{mainstatus.client_id}.png')
                 dark_color = [color - 30 if not (color - 30) < 0 else 0 for color in dominant_color]
                 if np.average(dominant_color) > 200:
                     text_color = [0, 0, 0]
@@ -526,10 +481,7 @@ class PartialBasicUserStatusWidget:
                 else:
                     text_color = [255, 255, 255]
                     shadow_color = [0, 0, 0, 200]
-                with open(data_dir + 'profile_cache.json', 'w') as imagefile:
-                    profile_images.update({mainstatus.client_id:
-                                           [list(dominant_color), list(dark_color), text_color]})
-                    json.dump(profile_images, imagefile, indent=4)
+                get_color_store().put_profile(mainstatus.client_id, (dominant_color, dark_color, text_color))
                 self.dominant_color = dominant_color
                 self.dark_color = dark_color
                 self.text_color = text_color
@@ -620,12 +572,11 @@ class BasicUserStatusWidget(QtWidgets.QWidget):
         self.label.setMinimumSize(QtCore.QSize(182, 182))
         self.label.setMaximumSize(QtCore.QSize(182, 182))
         self.label.setStyleSheet(
-            f"border-image: url({forward_data_dir}icon{mainstatus.client_id}.png)"
-            f" 0 0 0 0 strech strech;\n"
             "background-repeat: no-repeat;\n"
             "background-color: transparent;\n"
-            f"border-radius: 91px;")
-        self.label.setText("")
+            "border-radius: 91px;")
+        self.label.setPixmap(get_pixmap_cache().pixmap(data_dir + f'icon{mainstatus.client_id}.png'))
+        self.label.setScaledContents(True)
         self.label.setAlignment(QtCore.Qt.AlignHCenter)
         self.label.setObjectName("label")
         self.shadow = QtWidgets.QGraphicsDropShadowEffect(self)
@@ -697,9 +648,11 @@ class BasicUserStatusWidget(QtWidgets.QWidget):
         if mainstatus.playing_type in ('track', 'local file'):
             self.label_4 = QtWidgets.QLabel(self.horizontalFrame)
             self.label_4.setStyleSheet('''QLabel {
-                border-image: url(%s) 0 0 0 0 strech strech;
                 border-radius: 0px;
-            }''' % f"{forward_data_dir}album{self.image_url.split('/image/')[1]}.png")
+            }''')
+            album = data_dir + f"album{self.image_url.split('/image/')[1]}.png"
+            self.label_4.setPixmap(get_pixmap_cache().pixmap(album))
+            self.label_4.setScaledContents(True)
             self.label_4.setFixedSize(200, 200)
             self.horizontalLayout.addWidget(self.label_4)
 
@@ -734,18 +687,10 @@ class PartialPlaybackController:
         self.loop_state = ''
         self.volume = 65535
         self.song_length = 0
+        self.icon_dir = None
         if mainstatus.playing_type in ('track', 'local file'):
             if mainstatus.songid:
-                saved_songs = spotifyplayer.create_api_request(f'/me/tracks/contains?ids={mainstatus.songid}').json()
-                if isinstance(saved_songs, dict) and saved_songs.get('status', 401) != 200:
-                    # noinspection PyProtectedMember
-                    spotifyplayer._authorize()
-                    saved_songs = spotifyplayer.create_api_request(f'/me/tracks/contains?ids={mainstatus.songid}')
-                    saved_songs = saved_songs.json()
-                if not saved_songs:
-                    self.is_saved = False
-                else:
-                    self.is_saved = saved_songs[0]
+                self.is_saved = spotifyplayer.saved_tracks.is_saved(mainstatus.songid)
             else:
                 self.is_saved = False
             self.shuffle_state = spotifyplayer.shuffling
@@ -759,27 +704,13 @@ class PartialPlaybackController:
             self.dark_color = dark_color
             self.text_color = text_color
             feather_image(url)
-            icons = [f'24x24{sep}cil-media-play.png', f'24x24{sep}cil-media-pause.png', f'20x20{sep}cil-media-step-forward.png',
-                     f'20x20{sep}cil-media-step-backward.png', f'16x16{sep}cil-shuffle.png', f'16x16{sep}cil-shuffle-on.png',
-                     f'16x16{sep}cil-loop.png', f'16x16{sep}cil-loop-on.png', f'16x16{sep}cil-loop-1.png', f'20x20{sep}cil-heart.png',
-                     f'20x20{sep}cil-heart-filled.png', f'16x16{sep}cil-screen-smartphone.png', f'16x16{sep}cil-volume-high.png',
-                     f'16x16{sep}cil-volume-low.png', f'16x16{sep}cil-volume-off.png']
-            icons = [data_dir + f'icons{sep}' + icon for icon in icons]
-            for icon in icons:
-                img = Image.open(icon)
-                img = img.convert('RGBA')
-                pixdata: typing.Optional[PyAccess] = img.load()
-                for y in range(img.size[1]):
-                    for x in range(img.size[0]):
-                        if pixdata[x, y][3] > 0:
-                            new_color = list(text_color)
-                            new_color.append(pixdata[x, y][3])
-                            pixdata[x, y] = tuple(new_color)
-                img.save(icon)
+            if url:
+                get_pixmap_cache().preload(data_dir + f'album{url.split("/image/")[1]}.png')
+            self.icon_dir = tinted_icon_dir(PLAYBACK_ICONS, text_color, get_ratio())
 
     def convert_to_widget(self):
         return PlaybackController(self.mainstatus, self.spotifyplayer, self.client, self.dominant_color,
-                                  self.dark_color, self.text_color, self.is_saved)
+                                  self.dark_color, self.text_color, self.is_saved, self.icon_dir)
 
 
 @safe_color
@@ -787,12 +718,13 @@ class PartialPlaybackController:
 class PlaybackController(QtWidgets.QWidget):
     def __init__(self, spotifysong: SpotifySong, spotifyplayer: SpotifyPlayer, client,
                  dominant_color: tuple = None, dark_color: tuple = None, text_color: tuple = None,
-                 is_saved: bool = False, *args, **kwargs):
+                 is_saved: bool = False, icon_dir: str = None, *args, **kwargs):
         """
             This is a class that represents the playback controller.
             Parameters:
                 spotifysong (SpotifySong): This is a representation of the user's playback.
                 spotifyplayer (SpotifyPlayer): This is a class that handles the changing of the user's playback state.
+                icon_dir (str) (optional): The directory of the icons tinted with text_color, see tinted_icon_dir.
         """
         super().__init__(*args, **kwargs)
         self.spotifysong = spotifysong
@@ -813,14 +745,11 @@ class PlaybackController(QtWidgets.QWidget):
         self.scaled = ''
         ratio = get_ratio()
         self.ratio = ratio
+        self.icon_dir = icon_dir or f'{forward_data_dir}icons/'
         if ratio != 1:
             self.ratio = ratio
-            icons = [f'24x24{sep}cil-media-play', f'24x24{sep}cil-media-pause', f'20x20{sep}cil-media-step-forward',
-                     f'20x20{sep}cil-media-step-backward', f'16x16{sep}cil-shuffle', f'16x16{sep}cil-shuffle-on',
-                     f'16x16{sep}cil-loop', f'16x16{sep}cil-loop-on', f'16x16{sep}cil-loop-1', f'20x20{sep}cil-heart',
-                     f'20x20{sep}cil-heart-filled', f'16x16{sep}cil-screen-smartphone', f'16x16{sep}cil-volume-high',
-                     f'16x16{sep}cil-volume-low', f'16x16{sep}cil-volume-off']
-            scale_images(icons, ratio)
+            if not icon_dir:
+                scale_images(PLAYBACK_ICONS, ratio)
             self.scaled = 'scaled'
         if not dominant_color:
             self.text = QtWidgets.QLabel()
@@ -860,10 +789,9 @@ class PlaybackController(QtWidgets.QWidget):
         self.label = QtWidgets.QLabel(self.horizontalFrame1)
         self.label.setMinimumSize(QtCore.QSize(100, 0))
         self.label.setMaximumSize(QtCore.QSize(100, 16777215))
-        self.label.setStyleSheet(
-            f"border-image: url({forward_data_dir}album{albumimagelink}."
-            f"png) 0 0 0 0 strech strech;\nbackground-color: rgba(0, 0, 0, 0);")
-        self.label.setText("")
+        self.label.setStyleSheet("background-color: rgba(0, 0, 0, 0);")
+        self.label.setPixmap(get_pixmap_cache().pixmap(data_dir + f'album{albumimagelink}.png'))
+        self.label.setScaledContents(True)
         self.label.setObjectName("label")
         self.horizontalLayout.addWidget(self.label)
         self.horizontalFrame_2 = QtWidgets.QFrame(self.horizontalFrame1)
@@ -989,7 +917,7 @@ class PlaybackController(QtWidgets.QWidget):
         sizePolicy.setHeightForWidth(self.pushButton_4.sizePolicy().hasHeightForWidth())
         self.pushButton_4.setSizePolicy(sizePolicy)
         self.pushButton_4.setStyleSheet(
-            f"background-image: url({forward_data_dir}icons/20x20/cil-media-step-backward{self.scaled}.png);\n"
+            f"background-image: url({self.icon_dir}20x20/cil-media-step-backward{self.scaled}.png);\n"
             "background-repeat: none;\n"
             "background-position: center;")
 
@@ -1014,7 +942,7 @@ class PlaybackController(QtWidgets.QWidget):
         sizePolicy.setHeightForWidth(self.pushButton_2.sizePolicy().hasHeightForWidth())
         self.pushButton_2.setSizePolicy(sizePolicy)
         self.pushButton_2.setStyleSheet(
-            f"background-image: url({forward_data_dir}icons/20x20/cil-media-step-forward{self.scaled}.png);\n"
+            f"background-image: url({self.icon_dir}20x20/cil-media-step-forward{self.scaled}.png);\n"
             "background-repeat: none;\n"
             "background-position: center;")
 
@@ -1282,7 +1210,7 @@ class PlaybackController(QtWidgets.QWidget):
         self.pushButton_7.setMinimumSize(QtCore.QSize(25, 25))
         self.pushButton_7.setMaximumSize(QtCore.QSize(25, 25))
         self.pushButton_7.setStyleSheet(
-            f"background-image: url({forward_data_dir}icons/16x16/cil-screen-smartphone{self.scaled}.png);\n"
+            f"background-image: url({self.icon_dir}16x16/cil-screen-smartphone{self.scaled}.png);\n"
             "background-repeat: none;\n"
             "background-position: center;")
         self.pushButton_7.setText("")
@@ -1322,7 +1250,7 @@ class PlaybackController(QtWidgets.QWidget):
         volume = 'cil-volume-off' if self.spotifyplayer.current_volume < 7208 else 'cil-volume-low' if \
             self.spotifyplayer.current_volume < 32767 else 'cil-volume-high'
         self.pushButton_8.setStyleSheet(
-            f"background-image: url({forward_data_dir}icons/16x16/{volume}{self.scaled}.png);\n"
+            f"background-image: url({self.icon_dir}16x16/{volume}{self.scaled}.png);\n"
             "background-repeat: none;\n"
             "background-position: center;")
         self.set_volume_slider()
@@ -1462,8 +1390,7 @@ class PlaybackController(QtWidgets.QWidget):
             pass
 
         def saved_check():
-            saved_songs = self.spotifyplayer.create_api_request(f'/me/tracks/contains?ids={self.spotifysong.songid}')
-            self.is_saved = saved_songs.json()[0]
+            self.is_saved = self.spotifyplayer.saved_tracks.is_saved(self.spotifysong.songid)
 
         @self.handle_regeneration_error
         def heart_function():
@@ -1473,7 +1400,7 @@ class PlaybackController(QtWidgets.QWidget):
                                                       request_type='DELETE')
 
                 self.pushButton_6.setStyleSheet(
-                    f"background-image: url({forward_data_dir}icons/20x20/cil-heart{self.scaled}.png);\n"
+                    f"background-image: url({self.icon_dir}20x20/cil-heart{self.scaled}.png);\n"
                     "background-repeat: none;\n"
                     "background-position: center;\n"
                     "border: none;\n"
@@ -1482,12 +1409,13 @@ class PlaybackController(QtWidgets.QWidget):
                 self.spotifyplayer.create_api_request(f'/me/tracks?ids={self.spotifysong.songid}',
                                                       request_type='PUT')
                 self.pushButton_6.setStyleSheet(
-                    f"background-image: url({forward_data_dir}icons/20x20/cil-heart-filled{self.scaled}.png);\n"
+                    f"background-image: url({self.icon_dir}20x20/cil-heart-filled{self.scaled}.png);\n"
                     "background-repeat: none;\n"
                     "background-position: center;\n"
                     "border: none;\n"
                     "background-color: rgba(0, 0, 0, 0);")
             self.is_saved = not self.is_saved
+            self.spotifyplayer.saved_tracks.set(self.spotifysong.songid, self.is_saved)
 
         if self.spotifysong.songid:
             self.pushButton_6.clicked.connect(lambda: Thread(target=heart_function).start())
@@ -1497,7 +1425,7 @@ class PlaybackController(QtWidgets.QWidget):
         def set_heart():
             heart = 'cil-heart-filled' if self.is_saved else 'cil-heart'
             self.pushButton_6.setStyleSheet(
-                f"background-image: url({forward_data_dir}icons/20x20/{heart}{self.scaled}.png);\n"
+                f"background-image: url({self.icon_dir}20x20/{heart}{self.scaled}.png);\n"
                 "background-repeat: none;\n"
                 "background-position: center;\n"
                 "border: none;\n"
@@ -1520,7 +1448,7 @@ class PlaybackController(QtWidgets.QWidget):
 
         self.pushButton_5.clicked.connect(lambda: Thread(target=shuffle_function).start())
         self.pushButton_5.setStyleSheet(
-            f"background-image: url({forward_data_dir}icons/16x16/{shuffle}{self.scaled}.png);\n"
+            f"background-image: url({self.icon_dir}16x16/{shuffle}{self.scaled}.png);\n"
             "background-repeat: none;\n"
             "background-position: center;")
         play = 'cil-media-pause' if self.spotifyplayer.playing else 'cil-media-play'
@@ -1535,7 +1463,7 @@ class PlaybackController(QtWidgets.QWidget):
 
         self.pushButton_3.clicked.connect(lambda: Thread(target=play_function).start())
         self.pushButton_3.setStyleSheet(
-            f"background-image: url({forward_data_dir}icons/24x24/{play}{self.scaled}.png);\n"
+            f"background-image: url({self.icon_dir}24x24/{play}{self.scaled}.png);\n"
             "background-repeat: none;\n"
             "background-position: center;")
         loop = 'cil-loop-on' if self.spotifyplayer.looping == 'context' else 'cil-loop-1' if self.spotifyplayer.looping\
@@ -1553,7 +1481,7 @@ class PlaybackController(QtWidgets.QWidget):
 
         self.pushButton.clicked.connect(lambda: Thread(target=loop_function).start())
         self.pushButton.setStyleSheet(
-            f"background-image: url({forward_data_dir}icons/16x16/{loop}{self.scaled}.png);\n"
+            f"background-image: url({self.icon_dir}16x16/{loop}{self.scaled}.png);\n"
             "background-repeat: none;\n"
             "background-position: center;")
         if not self.horizontalSlider_2_clicked and time.time() - self.last_volume_change > 0.5:
@@ -1561,7 +1489,7 @@ class PlaybackController(QtWidgets.QWidget):
         volume = 'cil-volume-off' if self.horizontalSlider_2.value() == 0 else 'cil-volume-low' if \
             self.horizontalSlider_2.value() < 50 else 'cil-volume-high'
         self.pushButton_8.setStyleSheet(
-            f"background-image: url({forward_data_dir}icons/16x16/{volume}{self.scaled}.png);\n"
+            f"background-image: url({self.icon_dir}16x16/{volume}{self.scaled}.png);\n"
             "background-repeat: none;\n"
             "background-position: center;")
 
@@ -1648,22 +1576,8 @@ class PartialInboundFriendRequest:
         self.ui = ui
         self.sender = request['sender']
         self.sender_id = self.sender['id']
-        if not os.path.exists(data_dir + f'icon{self.sender_id}.png'):
-            if self.sender['images']:
-                url = self.sender['images'][-1]['url']
-                img_data = requests.get(url, timeout=15).content
-                with open(data_dir + f'icon{self.sender_id}.png', 'wb') as handler:
-                    handler.write(img_data)
-            else:
-                image = Image.open(data_dir + 'default_user.png').resize((200, 200))
-                image.save(data_dir + f'icon{self.sender_id}.png')
-            mask = Image.open(data_dir + 'mask.png').convert('L')
-            mask = mask.resize((200, 200))
-            im = Image.open(data_dir + f'icon{self.sender_id}.png').convert('RGBA')
-            output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
-            output.putalpha(mask)
-            output.resize((200, 200))
-            output.save(data_dir + f'icon{self.sender_id}.png')
+        url = self.sender['images'][-1]['url'] if self.sender['images'] else None
+        get_avatar_cache().icon(self.sender_id, url)
 
     def convert_to_widget(self):
         return InboundFriendRequest(self.request, self.request_id, self.client, self.ui)
@@ -1837,21 +1751,8 @@ class PartialOutboundFriendRequest:
         self.ui = ui
         self.reciever = request['target']
         self.reciever_id = self.reciever['id']
-        if self.reciever['images']:
-            url = self.reciever['images'][0]['url']
-            img_data = requests.get(url, timeout=15).content
-            with open(data_dir + f'icon{self.reciever_id}.png', 'wb') as handler:
-                handler.write(img_data)
-        else:
-            image = Image.open(data_dir + 'default_user.png').resize((200, 200))
-            image.save(data_dir + f'icon{self.reciever_id}.png')
-        mask = Image.open(data_dir + 'mask.png').convert('L')
-        mask = mask.resize((200, 200))
-        im = Image.open(data_dir + f'icon{self.reciever_id}.png').convert('RGBA')
-        output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
-        output.putalpha(mask)
-        output.resize((200, 200))
-        output.save(data_dir + f'icon{self.reciever_id}.png')
+        url = self.reciever['images'][0]['url'] if self.reciever['images'] else None
+        get_avatar_cache().icon(self.reciever_id, url)
 
     def convert_to_widget(self):
         return OutboundFriendRequest(self.request, self.request_id, self.client, self.ui)
@@ -1989,36 +1890,13 @@ class PartialPastFriendStatus:
         self.id = friendstatus.client_id
         if not self.friendstatus.songid and not self.friendstatus.last_song:
             return
-        if not os.path.exists(data_dir + f'icon{self.friendstatus.client_id}.png'):
-            rand = random.randint(0, 10000)
-            if self.friendstatus.clientavatar:
-                url = self.friendstatus.clientavatar
-                img_data = requests.get(url, timeout=15).content
-                with open(data_dir + f'tempicon{rand}{self.friendstatus.client_id}.png', 'wb') as handler:
-                    handler.write(img_data)
-            else:
-                image = Image.open(data_dir + 'default_user.png').resize((200, 200))
-                image.save(data_dir + f'tempicon{rand}{self.friendstatus.client_id}.png')
-            mask = Image.open(data_dir + 'mask.png').convert('L')
-            mask = mask.resize((200, 200))
-            im = Image.open(data_dir + f'tempicon{rand}{self.friendstatus.client_id}.png').convert('RGBA')
-            output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
-            output.putalpha(mask)
-            output.resize((200, 200))
-            output.save(data_dir + f'icon{self.friendstatus.client_id}.png')
-            try:
-                os.remove(data_dir + f'tempicon{rand}{self.friendstatus.client_id}.png')
-            except (FileNotFoundError, OSError, PermissionError):
-                pass
+        get_pixmap_cache().preload(get_avatar_cache().icon(self.friendstatus.client_id,
+                                                           self.friendstatus.clientavatar))
         if self.friendstatus.contexttype == 'playlist':
             if self.friendstatus.songname:
                 try:
                     id_ = self.friendstatus.contextdata.split('/')[-1]
-                    resp = mainui.client.spotifyplayer.create_api_request(f'/playlists/{id_}').json()
-                    if 'error' in resp:
-                        self.playlist_name = None
-                        return
-                    self.playlist_name = resp['name'] if resp['public'] else None
+                    self.playlist_name = get_playlist_cache().public_name(mainui.client.spotifyplayer, id_)
                     """what kind of feature is this? if you have the link to a spotify playlist and it's private you can
                     still view it????? that makes no sense, so we have to check that the playlist is public and show it,
                     otherwise we will hide it
@@ -2034,11 +1912,7 @@ class PartialPastFriendStatus:
             if self.friendstatus.last_song.songname:
                 try:
                     id_ = self.friendstatus.last_song.contextdata.split('/')[-1]
-                    resp = mainui.client.spotifyplayer.create_api_request(f'/playlists/{id_}').json()
-                    if 'error' in resp:
-                        self.playlist_name = None
-                        return
-                    self.playlist_name = resp['name'] if resp['public'] else None
+                    self.playlist_name = get_playlist_cache().public_name(mainui.client.spotifyplayer, id_)
                 except Exception as e:
                     logger.error('An unexpected error has occured: ', exc_info=e)
                     self.playlist_name = None
@@ -2093,12 +1967,12 @@ class PastFriendStatus(QtWidgets.QWidget):
         font.setFamily("Segoe UI")
         font.setPointSize(8)
         self.label.setFont(font)
-        self.label.setText("")
         self.label.setObjectName("label")
         self.label.setStyleSheet('''QLabel { 
-            border-image: url(%sicon%s.png);
             border: 2px solid white;
-        }''' % (forward_data_dir, friendstatus.client_id))
+        }''')
+        self.label.setPixmap(get_pixmap_cache().pixmap(data_dir + f'icon{friendstatus.client_id}.png'))
+        self.label.setScaledContents(True)
         self.label.setFixedSize(50, 50)
         self.verticalLayout_2.addWidget(self.label)
         self.horizontalLayout.addWidget(self.verticalFrame)
@@ -2817,54 +2691,32 @@ class PartialAdvancedUserStatus:
         self.status = status
         self.dominant_color = None
         self.user_id = spotifysong.client_id
-        if not os.path.exists(data_dir + f'icon{spotifysong.client_id}.png'):
-            rand = random.randint(0, 10000)
-            if spotifysong.clientavatar:
-                url = spotifysong.clientavatar
-                img_data = requests.get(url, timeout=15).content
-                with open(data_dir + f'tempicon{rand}{spotifysong.client_id}.png', 'wb') as handler:
-                    handler.write(img_data)
-            else:
-                image = Image.open(data_dir + 'default_user.png').resize((200, 200))
-                image.save(data_dir + f'tempicon{rand}{spotifysong.client_id}.png')
-            mask = Image.open(data_dir + 'mask.png').convert('L')
-            mask = mask.resize((200, 200))
-            im = Image.open(data_dir + f'tempicon{rand}{spotifysong.client_id}.png').convert('RGBA')
-            output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
-            output.putalpha(mask)
-            output.resize((200, 200))
-            try:
-                os.remove(data_dir + f'tempicon{rand}{spotifysong.client_id}.png')
-            except (FileNotFoundError, OSError, PermissionError):
-                pass
-            output.save(data_dir + f'icon{spotifysong.client_id}.png')
+        get_pixmap_cache().preload(get_avatar_cache().icon(spotifysong.client_id, spotifysong.clientavatar))
         shadow_color = None
         if spotifysong.playing_type in ('track', 'local file'):
             download_album(spotifysong.albumimagelink)
             self.dominant_color, self.dark_color, self.text_color = extract_color(spotifysong.albumimagelink)
             feather_image(spotifysong.albumimagelink)
-            with open(data_dir + 'profile_cache.json') as imagefile:
-                profile_images = json.load(imagefile)
-            if spotifysong.client_id in profile_images:
-                avg = np.average(profile_images[spotifysong.client_id][0])
+            if spotifysong.albumimagelink:
+                get_pixmap_cache().preload(data_dir + f'album{spotifysong.albumimagelink.split("/image/")[1]}.png')
+            profile_colors = get_color_store().get_profile(spotifysong.client_id)
+            if profile_colors:
+                avg = np.average(profile_colors[0])
                 if avg > 200:
                     shadow_color = [255, 255, 255, 200]
                 else:
                     shadow_color = [0, 0, 0, 200]
         else:
-            with open(data_dir + 'profile_cache.json') as imagefile:
-                profile_images = json.load(imagefile)
-            if spotifysong.client_id in profile_images:
-                self.dominant_color = tuple(profile_images[spotifysong.client_id][0])
-                self.dark_color = tuple(profile_images[spotifysong.client_id][1])
-                self.text_color = tuple(profile_images[spotifysong.client_id][2])
+            profile_colors = get_color_store().get_profile(spotifysong.client_id)
+            if profile_colors:
+                self.dominant_color, self.dark_color, self.text_color = profile_colors
                 if np.average(self.dominant_color) > 200:
                     shadow_color = [255, 255, 255, 200]
                 else:
                     shadow_color = [0, 0, 0, 200]
             else:
-                image = ColorThief(data_dir + f'icon{spotifysong.client_id}.png')
-                dominant_color = image.get_color(quality=1)
+                dominant_color = get_image_worker().run('dominant_color',
+                                                        data_dir + f'icon{spotifysong.client_id}.png')
                 dark_color = [color - 30 if not (color - 30) < 0 else 0 for color in dominant_color]
                 if np.average(dominant_color) > 200:
                     text_color = [0, 0, 0]
@@ -2872,10 +2724,7 @@ class PartialAdvancedUserStatus:
                 else:
                     text_color = [255, 255, 255]
                     shadow_color = [0, 0, 0, 200]
-                with open(data_dir + 'profile_cache.json', 'w') as imagefile:
-                    profile_images.update({spotifysong.client_id:
-                                           [list(dominant_color), list(dark_color), text_color]})
-                    json.dump(profile_images, imagefile, indent=4)
+                get_color_store().put_profile(spotifysong.client_id, (dominant_color, dark_color, text_color))
                 self.dominant_color = dominant_color
                 self.dark_color = dark_color
                 self.text_color = text_color
@@ -2884,11 +2733,7 @@ class PartialAdvancedUserStatus:
             if self.spotifysong.songname:
                 try:
                     id_ = self.spotifysong.contextdata.split('/')[-1]
-                    resp = mainui.client.spotifyplayer.create_api_request(f'/playlists/{id_}').json()
-                    if 'error' in resp:
-                        self.playlist_name = None
-                    else:
-                        self.playlist_name = resp['name'] if resp['public'] else None
+                    self.playlist_name = get_playlist_cache().public_name(mainui.client.spotifyplayer, id_)
                 except Exception as e:
                     logger.error('An unexpected error has occured: ', exc_info=e)
                     self.playlist_name = None
@@ -2966,9 +2811,8 @@ class AdvancedUserStatus(QtWidgets.QWidget):
         self.label_3 = QtWidgets.QLabel(self.verticalFrame_3)
         self.label_3.setMinimumSize(QtCore.QSize(200, 200))
         self.label_3.setMaximumSize(QtCore.QSize(200, 200))
-        self.label_3.setStyleSheet(
-            f"border-image: url({forward_data_dir + 'icon' + self.user_id}.png);")
-        self.label_3.setText("")
+        self.label_3.setPixmap(get_pixmap_cache().pixmap(data_dir + f'icon{self.user_id}.png'))
+        self.label_3.setScaledContents(True)
         self.label_3.setObjectName("label_3")
         shadow = QtWidgets.QGraphicsDropShadowEffect()
         shadow.setXOffset(0)
@@ -3034,9 +2878,8 @@ class AdvancedUserStatus(QtWidgets.QWidget):
             albumlink = spotifysong.albumimagelink.split('/image/')[1]
         else:
             albumlink = 'None'
-        self.label_4.setStyleSheet(
-            f"border-image: url({forward_data_dir}album{albumlink}.png) 0 0 0 0;")
-        self.label_4.setText("")
+        self.label_4.setPixmap(get_pixmap_cache().pixmap(data_dir + f'album{albumlink}.png'))
+        self.label_4.setScaledContents(True)
         self.label_4.setObjectName("label_4")
         self.horizontalLayout_3.addWidget(self.label_4)
         self.verticalLayout_3.addWidget(self.horizontalFrame1)
@@ -3325,27 +3168,7 @@ class PartialListedFriendStatus:
         self.spotifysong = spotifysong
         self.status = status
         self.user_id = spotifysong.client_id
-        if os.path.exists(data_dir + f'icon{spotifysong.client_id}.png'):
-            rand = random.randint(0, 10000)
-            if spotifysong.clientavatar:
-                url = spotifysong.clientavatar
-                img_data = requests.get(url, timeout=15).content
-                with open(data_dir + f'tempicon{rand}{spotifysong.client_id}.png', 'wb') as handler:
-                    handler.write(img_data)
-            else:
-                image = Image.open(data_dir + 'default_user.png').resize((200, 200))
-                image.save(data_dir + f'tempicon{rand}{spotifysong.client_id}.png')
-            mask = Image.open(data_dir + 'mask.png').convert('L')
-            mask = mask.resize((200, 200))
-            im = Image.open(data_dir + f'tempicon{rand}{spotifysong.client_id}.png').convert('RGBA')
-            output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
-            output.putalpha(mask)
-            output.resize((200, 200))
-            try:
-                os.remove(data_dir + f'tempicon{rand}{spotifysong.client_id}.png')
-            except (FileNotFoundError, OSError, PermissionError):
-                pass
-            output.save(data_dir + f'icon{spotifysong.client_id}.png')
+        get_pixmap_cache().preload(get_avatar_cache().icon(spotifysong.client_id, spotifysong.clientavatar))
 
     def convert_to_widget(self):
         return ListedFriendStatus(self.spotifysong, self.status)
@@ -3403,9 +3226,9 @@ class ListedFriendStatus(QtWidgets.QWidget):
         self.label.setMinimumSize(QtCore.QSize(45, 45))
         self.label.setMaximumSize(QtCore.QSize(45, 45))
         self.label.setStyleSheet("border-radius: 22px;\n"
-                                 f"border-image: url({forward_data_dir}icon{self.user_id}.png);\n"
                                  "background-color: transparent;")
-        self.label.setText("")
+        self.label.setPixmap(get_pixmap_cache().pixmap(data_dir + f'icon{self.user_id}.png'))
+        self.label.setScaledContents(True)
         self.label.setObjectName("label")
         self.horizontalLayout.addWidget(self.label)
         self.label_2 = QtWidgets.QLabel(self.horizontalFrame)
@@ -3828,25 +3651,13 @@ class PartialListeningToFriends:
         if friend_id and new:
             mainui.spotifylistener = SpotifyListener(mainui.client.spotifyplayer, mainui.client, friend_id)
             self.spotifylistener = mainui.spotifylistener
+        self.icon_dir = None
         if self.dominant_color:
-            icons = [f'20x20{sep}cil-media-play.png', f'20x20{sep}cil-loop-circular.png', f'20x20{sep}cil-media-stop.png',
-                     f'20x20{sep}cil-media-pause.png']
-            icons = [data_dir + f'icons{sep}' + icon for icon in icons]
-            for icon in icons:
-                img = Image.open(icon)
-                img = img.convert('RGBA')
-                pixdata: typing.Optional[PyAccess] = img.load()
-                for y in range(img.size[1]):
-                    for x in range(img.size[0]):
-                        if pixdata[x, y][3] > 0:
-                            new_color = list(dominant_color)
-                            new_color.append(pixdata[x, y][3])
-                            pixdata[x, y] = tuple(new_color)
-                img.save(icon)
+            self.icon_dir = tinted_icon_dir(LISTENING_ICONS, self.dominant_color, get_ratio())
 
     def convert_to_widget(self):
         return ListeningToFriends(self.spotifylistener, self.spotifysong, self.dominant_color, self.text_color,
-                                  self.dark_color)
+                                  self.dark_color, self.icon_dir)
 
 
 @adjust_sizing()
@@ -3856,7 +3667,7 @@ class ListeningToFriends(QtWidgets.QWidget):
     """
     def __init__(self, spotifylistener: SpotifyListener = None, spotifysong: SpotifySong = None,
                  dominant_color: tuple = (44, 49, 60), text_color: tuple = (255, 255, 255),
-                 dark_color: tuple = (14, 19, 20),  *args, **kwargs):
+                 dark_color: tuple = (14, 19, 20), icon_dir: str = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.spotifylistener = spotifylistener
         self.spotifysong = spotifysong
@@ -3907,10 +3718,10 @@ class ListeningToFriends(QtWidgets.QWidget):
         ratio = get_ratio()
         scaled = ''
         if ratio != 1:
-            icons = [f'20x20{sep}cil-loop-circular', f'20x20{sep}cil-media-play', f'20x20{sep}cil-media-stop',
-                     f'20x20{sep}cil-media-pause']
-            scale_images(icons, ratio)
+            if not icon_dir:
+                scale_images(LISTENING_ICONS, ratio)
             scaled = 'scaled'
+        icon_dir = icon_dir or f'{forward_data_dir}icons/'
         self.verticalFrame.setObjectName("verticalFrame")
         self.verticalLayout = QtWidgets.QVBoxLayout(self.verticalFrame)
         self.verticalLayout.setContentsMargins(0, 0, 0, 0)
@@ -4053,15 +3864,16 @@ class ListeningToFriends(QtWidgets.QWidget):
         self.label_4.setMinimumSize(QtCore.QSize(200, 200))
         self.label_4.setMaximumSize(QtCore.QSize(200, 200))
         try:
-            self.label_4.setStyleSheet(f"border-image: url({forward_data_dir}album"
-                                       f"{spotifysong.albumimagelink.split('/image/')[1]});")
+            self.label_4.setPixmap(get_pixmap_cache().pixmap(
+                data_dir + f"album{spotifysong.albumimagelink.split('/image/')[1]}.png"))
         except AttributeError:
             try:
                 albumimagelink = mainui.client.friendstatus[spotifylistener.friend_id].albumimagelink
-                self.label_4.setStyleSheet(f'border-image: url({forward_data_dir}album'
-                                           f'{albumimagelink.split("/image/")[1]};')
+                self.label_4.setPixmap(get_pixmap_cache().pixmap(
+                    data_dir + f'album{albumimagelink.split("/image/")[1]}.png'))
             except AttributeError:
                 pass  # at this point anything is better than just crashing
+        self.label_4.setScaledContents(True)
         self.label_4.setText("")
         self.label_4.setObjectName("label_4")
         self.horizontalLayout_3.addWidget(self.label_4)
@@ -4101,7 +3913,7 @@ class ListeningToFriends(QtWidgets.QWidget):
                                       "    text-align: right;\n"
                                       "    padding-left: 15px;\n"
                                       "    padding-right: 15px;\n"
-                                      f"  background-image: url({forward_data_dir}icons/20x20/cil-loop-circular"
+                                      f"  background-image: url({icon_dir}20x20/cil-loop-circular"
                                       f"{scaled}.png);\n"
                                       "    background-repeat: no-repeat;\n"
                                       "    background-position: left;\n"
@@ -4120,7 +3932,7 @@ class ListeningToFriends(QtWidgets.QWidget):
         self.pushButton_2.setMaximumSize(QtCore.QSize(30, 30))
         self.pushButton_2.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
         self.pushButton_2.setStyleSheet("background: transparent;\n"
-                                        f"background-image: url({forward_data_dir}icons/20x20/cil-media-play"
+                                        f"background-image: url({icon_dir}20x20/cil-media-play"
                                         f"{scaled}.png);\n"
                                         f"background-repeat: no-repeat;\n"
                                         f"background-position: center;")
@@ -4137,7 +3949,7 @@ class ListeningToFriends(QtWidgets.QWidget):
                                         "    text-align: right;\n"
                                         "    padding-left: 15px;\n"
                                         "    padding-right: 15px;\n"
-                                        f"   background-image: url({forward_data_dir}icons/20x20/cil-media-stop"
+                                        f"   background-image: url({icon_dir}20x20/cil-media-stop"
                                         f"{scaled}.png);\n"
                                         "    background-repeat: no-repeat;\n"
                                         "    background-position: left;\n"
@@ -4694,6 +4506,7 @@ class MainUpdateThread(QtCore.QThread):
         self.oldname = ''
         self.oldsongid = ''
         self.running = False
+        self.events = client.events.subscribe(MainStatusChanged, StopRequested)
 
     def run(self):
         self.running = True
@@ -4744,7 +4557,7 @@ class MainUpdateThread(QtCore.QThread):
                         self.client.send_next_for_listening(force=True)
             except (requests.RequestException, Exception) as e:
                 logger.error('An unexpected error has occured: ', exc_info=e)
-            time.sleep(0.25)
+            wait_for_events(self.events)
 
 
 class FriendUpdateThread(QtCore.QThread):
@@ -4753,12 +4566,21 @@ class FriendUpdateThread(QtCore.QThread):
     """
     emitter = QtCore.pyqtSignal(object)
 
-    def __init__(self, client, statuswidgets, ui, *args, **kwargs):
+    def __init__(self, client, statuswidgets, ui, coalesce_window: float = 0.3, *args, **kwargs):
         super(FriendUpdateThread, self).__init__(*args, **kwargs)
         self.client = client
         self.statuswidgets = statuswidgets
         self.ui = ui
         self.running = False
+        self.sequence = 0
+        self.pending = ChangeCoalescer(coalesce_window)  # only the last state of a burst of song_updates is built
+        self.events = client.events.subscribe(FriendChanged, StopRequested)
+
+    def superseded(self, id_, friend):
+        """
+            Helper function that checks whether a newer status of this friend has arrived during preparation.
+        """
+        return self.client.friendstatus.get(id_) is not friend
 
     def run(self):
         self.running = True
@@ -4766,73 +4588,82 @@ class FriendUpdateThread(QtCore.QThread):
             time.sleep(0.1)
         while self.running:
             try:
-                for id_, friend in self.client.friendstatus.items():
-                    if id_ not in self.statuswidgets.copy():
-                        status = friend.playing_status.lower()
-                        statuswidget = PartialStatusWidget(status, friend.clientavatar, friend.client_id,
-                                                           friend.clientusername, friend, id_, self.ui.accent_color)
-                        listedstatuswidget = PartialListedFriendStatus(friend, status)
-                        advancedstatuswidget = PartialAdvancedUserStatus(friend, status)
-                        self.emitter.emit((statuswidget, statuswidget, listedstatuswidget, advancedstatuswidget))
-                        self.update_friend_statuses()
-                    elif friend.songid != self.statuswidgets[id_].spotifysong.songid or \
-                            friend.clientavatar != self.statuswidgets[id_].spotifysong.clientavatar or \
-                            friend.playing_status != self.statuswidgets[id_].spotifysong.playing_status or \
-                            friend.clientusername != self.statuswidgets[id_].spotifysong.clientusername or \
-                            friend.songname != self.statuswidgets[id_].spotifysong.songname:
-                        if friend.playing_type not in ('None', 'ad', 'episode'):
-                            status = friend.playing_status.lower()
-                        else:
-                            status = 'online' if friend.playing_status == 'Online' else 'offline'
-                        statuswidget = PartialStatusWidget(status, friend.clientavatar, friend.client_id,
-                                                           friend.clientusername, friend, id_, self.ui.accent_color)
-                        listedstatuswidget = PartialListedFriendStatus(friend, status)
-                        try:
-                            advancedstatuswidget = PartialAdvancedUserStatus(friend, status)
-                        except PIL.UnidentifiedImageError:
-                            advancedstatuswidget = PartialAdvancedUserStatus(friend, status)
-                        self.emitter.emit((statuswidget, statuswidget, listedstatuswidget, advancedstatuswidget))
-                        QtCore.QTimer.singleShot(0, self.update_friend_statuses)
-                for id_ in self.statuswidgets.copy():
-                    if id_ not in self.client.friendstatus:
-                        self.emitter.emit(DeleteWidget(id_))
-                        QtCore.QTimer.singleShot(0, self.update_friend_statuses)
+                self.sequence, changed = self.client.changes_since(self.sequence)
+                self.pending.add(changed)
             except (requests.RequestException, Exception) as _exc:
                 logger.error('An unexpected error occured: ', exc_info=_exc)
-            time.sleep(0.25)
+            for id_ in self.pending.due():
+                try:
+                    self.update_friend(id_)
+                    self.pending.done(id_)
+                except (requests.RequestException, Exception) as _exc:
+                    logger.error('An unexpected error occured: ', exc_info=_exc)
+                    self.pending.retry(id_)
+            # block until something changes, or until the next friend is done coalescing
+            wait_for_events(self.events, self.pending.timeout())
+
+    def update_friend(self, id_):
+        friend = self.client.friendstatus.get(id_)
+        if not friend:
+            if id_ in self.statuswidgets:
+                self.emitter.emit(DeleteWidget(id_))
+                QtCore.QTimer.singleShot(0, self.update_friend_statuses)
+        elif id_ not in self.statuswidgets.copy():
+            status = friend.playing_status.lower()
+            statuswidget = PartialStatusWidget(status, friend.clientavatar, friend.client_id,
+                                               friend.clientusername, friend, id_, self.ui.accent_color)
+            listedstatuswidget = PartialListedFriendStatus(friend, status)
+            advancedstatuswidget = PartialAdvancedUserStatus(friend, status)
+            self.emitter.emit((statuswidget, statuswidget, listedstatuswidget, advancedstatuswidget))
+            self.update_friend_statuses()
+        elif friend.songid != self.statuswidgets[id_].spotifysong.songid or \
+                friend.clientavatar != self.statuswidgets[id_].spotifysong.clientavatar or \
+                friend.playing_status != self.statuswidgets[id_].spotifysong.playing_status or \
+                friend.clientusername != self.statuswidgets[id_].spotifysong.clientusername or \
+                friend.songname != self.statuswidgets[id_].spotifysong.songname:
+            if friend.playing_type not in ('None', 'ad', 'episode'):
+                status = friend.playing_status.lower()
+            else:
+                status = 'online' if friend.playing_status == 'Online' else 'offline'
+            # a newer state makes the rest of the preparation pointless, it gets picked up on the next pass instead
+            statuswidget = PartialStatusWidget(status, friend.clientavatar, friend.client_id,
+                                               friend.clientusername, friend, id_, self.ui.accent_color)
+            if self.superseded(id_, friend):
+                return
+            listedstatuswidget = PartialListedFriendStatus(friend, status)
+            if self.superseded(id_, friend):
+                return
+            try:
+                advancedstatuswidget = PartialAdvancedUserStatus(friend, status)
+            except PIL.UnidentifiedImageError:
+                advancedstatuswidget = PartialAdvancedUserStatus(friend, status)
+            if self.superseded(id_, friend):
+                return
+            self.emitter.emit((statuswidget, statuswidget, listedstatuswidget, advancedstatuswidget))
+            QtCore.QTimer.singleShot(0, self.update_friend_statuses)
 
     def update_friend_statuses(self):
-        listening_friends = len([status for status in self.client.friendstatus.values()
-                                 if status.playing_status == 'Listening'])
-        online_friends = len([status for status in self.client.friendstatus.values()
-                              if status.playing_status == 'Online'])
-        offline_friends = len([status for status in self.client.friendstatus.values()
-                               if status.playing_status == 'Offline'])
+        status_counts = self.client.status_counts
+        listening_friends = status_counts['Listening']
+        online_friends = status_counts['Online']
+        offline_friends = status_counts['Offline']
         self.ui.label_27.setText(f'Listening - {listening_friends}')
         self.ui.label_28.setText(f'Online - {online_friends}')
         self.ui.label_29.setText(f'Offline - {offline_friends}')
         listening_friends = f'{listening_friends} friend' if listening_friends == 1 else f'{listening_friends} friends'
         online_friends = f'{online_friends} friend' if online_friends == 1 else f'{online_friends} friends'
         offline_friends = f'{offline_friends} friend' if offline_friends == 1 else f'{offline_friends} friends'
-        for friend_id in mainui.client.listening_friends:
-            if friend_id not in mainui.client.friends:
-                try:
-                    mainui.client.listening_friends.pop(mainui.client.listening_friends.index(friend_id))
-                    mainui.client.listening_friends_time.pop(friend_id)
-                except ValueError:
-                    pass
 
-        listen_along_friends = []
         listen_along_time_text = []
-        for id_ in mainui.client.listening_friends:
-            listen_along_friends.append(mainui.client.friends[id_].clientUsername)
+        for id_ in mainui.client.listening_friends.copy():
 
             def _to_str(delta):
                 return f'{int(delta // 60)}m {int(delta % 60)}s'
 
-            listen_along_time_text.append(_to_str(time.time() - mainui.client.listening_friends_time[id_]))
+            if id_ in mainui.client.listening_friends_time:
+                listen_along_time_text.append(_to_str(time.time() - mainui.client.listening_friends_time[id_]))
 
-        listen_along_text = ', '.join(listen_along_friends) + ' listening along'
+        listen_along_text = mainui.client.listen_along_text
         listen_along_time_text = '(' + ', '.join(listen_along_time_text) + ')'
         if mainui.client.listening_friends:
             parsed_text = f'<br><span style="color: rgb(252, 161, 40)">‎  {listen_along_text}  </span>' \
@@ -4857,6 +4688,11 @@ class RequestUpdateThread(QtCore.QThread):
         self.running = False
         self.last_requests = self.client.friend_requests.copy()
         self.outbound_last_requests = self.client.outbound_friend_requests.copy()
+        self.sequence = 0
+        self.outbound_sequence = 0
+        self.pending = set()
+        self.outbound_pending = set()
+        self.events = client.events.subscribe(RequestChanged, OutboundRequestChanged, StopRequested)
         super(RequestUpdateThread, self).__init__(*args, **kwargs)
 
     def run(self):
@@ -4865,27 +4701,36 @@ class RequestUpdateThread(QtCore.QThread):
             time.sleep(0.1)
         while self.running:
             try:
-                for request, data in self.client.friend_requests.items():
-                    if request not in self.last_requests:
+                self.sequence, changed = self.client.changes_since(self.sequence, 'requests')
+                self.pending.update(changed)
+                for request in self.pending.copy():
+                    data = self.client.friend_requests.get(request)
+                    if data and request not in self.last_requests:
                         friend_request = PartialInboundFriendRequest(data, request, self.ui, self.client)
                         logger.info('A new friend request has been recieved')
                         self.emitter.emit(friend_request)
-                for request in self.last_requests:
-                    if request not in self.client.friend_requests:
+                        self.last_requests[request] = data
+                    elif not data and request in self.last_requests:
                         logger.info('A friend request has been removed')
                         self.emitter.emit(DeleteWidget(request))
-                self.last_requests = self.client.friend_requests.copy()
-                for request, data in self.client.outbound_friend_requests.items():
-                    if request not in self.outbound_last_requests:
+                        del self.last_requests[request]
+                    self.pending.discard(request)
+                self.outbound_sequence, changed = self.client.changes_since(self.outbound_sequence,
+                                                                            'outbound_requests')
+                self.outbound_pending.update(changed)
+                for request in self.outbound_pending.copy():
+                    data = self.client.outbound_friend_requests.get(request)
+                    if data and request not in self.outbound_last_requests:
                         friend_request = PartialOutboundFriendRequest(data, request, self.ui, self.client)
                         self.emitter.emit(friend_request)
-                for request in self.outbound_last_requests:
-                    if request not in self.client.outbound_friend_requests.copy():
+                        self.outbound_last_requests[request] = data
+                    elif not data and request in self.outbound_last_requests:
                         self.emitter.emit(DeleteWidget(request))
-                self.outbound_last_requests = self.client.outbound_friend_requests.copy()
+                        del self.outbound_last_requests[request]
+                    self.outbound_pending.discard(request)
             except (requests.RequestException, Exception) as _exc:
                 logger.error('An unexpected error occured: ', exc_info=_exc)
-            time.sleep(0.25)
+            wait_for_events(self.events, 0.25 if self.pending or self.outbound_pending else None)
 
 
 class FriendHistoryUpdateThread(QtCore.QThread):
@@ -4894,12 +4739,15 @@ class FriendHistoryUpdateThread(QtCore.QThread):
     """
     emitter = QtCore.pyqtSignal(object)
 
-    def __init__(self, client, ui, *args, **kwargs):
+    def __init__(self, client, ui, coalesce_window: float = 0.3, *args, **kwargs):
         super(FriendHistoryUpdateThread, self).__init__(*args, **kwargs)
         self.client = client
         self.ui = ui
         self.running = False
         self.last_friends = client.friendstatus.copy()
+        self.sequence = 0
+        self.pending = ChangeCoalescer(coalesce_window)
+        self.events = client.events.subscribe(FriendChanged, StopRequested)
 
     def run(self):
         self.running = True
@@ -4907,25 +4755,40 @@ class FriendHistoryUpdateThread(QtCore.QThread):
             time.sleep(0.1)
         while self.running:
             try:
-                for id_, friend in self.client.friendstatus.items():
-                    if id_ not in self.last_friends:
-                        widget = PartialPastFriendStatus(friend)
-                        self.emitter.emit(widget)
-                    else:
-                        if friend.songid != self.last_friends[id_].songid or \
-                                friend.songname != self.last_friends[id_].songname:
-                            try:
-                                widget = PartialPastFriendStatus(friend)
-                            except (requests.RequestException, Exception):
-                                widget = PartialPastFriendStatus(friend)
-                            self.emitter.emit(widget)
-                for id_ in self.last_friends:
-                    if id_ not in self.client.friendstatus.copy():
-                        self.emitter.emit(DeleteWidget(id_))
-                self.last_friends = self.client.friendstatus.copy()
+                self.sequence, changed = self.client.changes_since(self.sequence)
+                self.pending.add(changed)
             except (requests.RequestException, Exception) as _exc:
                 logger.error('An unexpected error occured: ', exc_info=_exc)
-            time.sleep(0.25)
+            for id_ in self.pending.due():
+                try:
+                    self.update_friend(id_)
+                    self.pending.done(id_)
+                except (requests.RequestException, Exception) as _exc:
+                    logger.error('An unexpected error occured: ', exc_info=_exc)
+                    self.pending.retry(id_)
+            wait_for_events(self.events, self.pending.timeout())
+
+    def update_friend(self, id_):
+        friend = self.client.friendstatus.get(id_)
+        if not friend:
+            if id_ in self.last_friends:
+                self.emitter.emit(DeleteWidget(id_))
+                del self.last_friends[id_]
+            return
+        if id_ not in self.last_friends:
+            widget = PartialPastFriendStatus(friend)
+        elif friend.songid != self.last_friends[id_].songid or friend.songname != self.last_friends[id_].songname:
+            try:
+                widget = PartialPastFriendStatus(friend)
+            except (requests.RequestException, Exception):
+                widget = PartialPastFriendStatus(friend)
+        else:
+            widget = None
+        if self.client.friendstatus.get(id_) is not friend:
+            return  # a newer status arrived while preparing, it gets picked up on the next pass instead
+        if widget:
+            self.emitter.emit(widget)
+        self.last_friends[id_] = friend
 
 
 class SocketListener(QtCore.QThread):
@@ -326,6 +326,7 @@ class LoadingScreenUi(QtWidgets.QMainWindow):
                 ui_accent_color = tuple(load['accent_color'])
                 ui_window_transparency = load['window_transparency']
                 ui_cache_maxsize = load['album_cache_maxsize']
+                ui_friend_update_window = load.get('friend_update_window', 0.3)
             f.close()
         except Exception as exc:
             if self.starting.get('previous_exit_code') == 3:
@@ -348,7 +349,8 @@ class LoadingScreenUi(QtWidgets.QMainWindow):
             return
         try:
             self.main_window = MainUI(ui_accent_color, ui_window_transparency, ui_cache_maxsize,
-                                      self.starting['third'], self.progressBar)
+                                      self.starting['third'], self.progressBar,
+                                      friend_update_window=ui_friend_update_window)
             self.main_window.failure_combo_box_changed = time.time()
             self.main_window.comboBox.setCurrentIndex(self.starting['third'].song_broadcast)
             self.hide()
@@ -0,0 +1,162 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+from .imagestore import ALBUM_PREFIXES, PINNED, LooseImageStore, PackImageStore, album_image_id, get_album_store
+from .kvstore import KeyValueStore, get_store
+
+__all__ = ('AlbumCacheIndex', 'get_album_index')
+
+logger = logging.getLogger(__name__)
+
+
+class AlbumCacheIndex:
+    """
+        A class that represents the index of the album images in the data directory, in least recently used order.
+        Every album id tracks the total size of its images and when it was last used, so the size of the cache is
+        known without touching the disk and the least recently used albums can be evicted one at a time. The index
+        is persisted, and only rebuilt from the album images when it is missing.
+
+        Parameters:
+            store (KeyValueStore): The store of album id -> [size in bytes, last used timestamp].
+            images (LooseImageStore or PackImageStore) (optional): The album images, by default the album store.
+    """
+
+    def __init__(self, store: KeyValueStore, images: typing.Union[LooseImageStore, PackImageStore, None] = None):
+        self.store = store
+        self.images = images or get_album_store()
+        self._lock = threading.Lock()
+        self._entries: typing.OrderedDict[str, typing.List[float]] = OrderedDict()
+        self._total = 0
+        if not len(store):
+            self._rebuild()
+        for album_id, (size, last_used) in sorted(store.items(), key=lambda item: item[1][1]):
+            self._entries[album_id] = [size, last_used]
+            self._total += size
+        logger.info(f'Album image cache: {len(self._entries)} albums, {self._total / 1000000:.1f} MB')
+
+    @staticmethod
+    def _names(album_id: str) -> typing.List[str]:
+        return [f'{prefix}{album_id}.png' for prefix in ALBUM_PREFIXES]
+
+    def _rebuild(self):
+        """
+            Helper function that indexes the album images that already exist, by their modification time (packed
+            images don't have one, they are indexed as used now).
+        """
+        found: typing.Dict[str, typing.List[float]] = {}
+        now = time.time()
+        for name in self.images.names():
+            entry = found.setdefault(album_image_id(name), [0, 0])
+            entry[0] += self.images.size(name)
+            entry[1] = max(entry[1], self.images.modified(name) or now)
+        self.store.update(found)
+        logger.info(f'Rebuilt the album image cache index from {len(found)} albums on disk')
+
+    @property
+    def total_size(self) -> int:
+        """
+            The size of every indexed album image, in bytes.
+        """
+        return self._total
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, album_id):
+        return album_id in self._entries
+
+    def touch(self, album_id: str):
+        """
+            Marks an album as the most recently used one, and updates its size after its images were (re)written.
+        """
+        if album_id in PINNED:
+            return
+        size = sum(self.images.size(name) for name in self._names(album_id))
+        with self._lock:
+            previous = self._entries.pop(album_id, None)
+            if previous:
+                self._total -= previous[0]
+            if not size:
+                self.store.pop(album_id, None)
+                return
+            self._entries[album_id] = [size, time.time()]
+            self._total += size
+            self.store[album_id] = self._entries[album_id]
+
+    def evict(self, limit: int, keep: typing.Iterable[str] = ()) -> typing.List[str]:
+        """
+            Deletes the images of the least recently used albums until the cache is no bigger than limit, and returns
+            the ids of the evicted albums.
+
+            Parameters:
+                limit (int): The maximum size of the cache, in bytes.
+                keep (Iterable[str]) (optional): Album ids that mustn't be evicted, like the one being shown.
+        """
+        keep = set(keep)
+        kept = []
+        evicted = []
+        with self._lock:
+            while self._total > limit and self._entries:
+                album_id, (size, last_used) = self._entries.popitem(last=False)
+                if album_id in keep:
+                    kept.append((album_id, [size, last_used]))
+                    continue
+                self._total -= size
+                for name in self._names(album_id):
+                    try:
+                        self.images.remove(name)
+                    except OSError as exc:  # most likely still open on windows, it is picked up again by touch
+                        logger.warning(f'Could not delete {name}: ', exc_info=exc)
+                self.store.pop(album_id, None)
+                evicted.append(album_id)
+            for album_id, entry in reversed(kept):  # back where they were, at the least recently used end
+                self._entries[album_id] = entry
+                self._entries.move_to_end(album_id, last=False)
+        for album_id in evicted:
+            logger.info(f'Album image {album_id} has been deleted')
+        return evicted
+
+    def reset(self):
+        """
+            Forgets every album, after the images were deleted.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+        self.store.clear()
+
+
+_album_index: typing.Optional[AlbumCacheIndex] = None
+_album_index_lock = threading.Lock()
+
+
+def get_album_index() -> AlbumCacheIndex:
+    """
+        Helper function that returns the process-wide AlbumCacheIndex, loading it the first time it is requested.
+    """
+    global _album_index
+    with _album_index_lock:
+        if _album_index is None:
+            _album_index = AlbumCacheIndex(get_store('album_index'))
+        return _album_index
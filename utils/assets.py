@@ -0,0 +1,113 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import os
+import threading
+import typing
+
+from PIL import Image
+from platformdirs import user_data_dir
+
+__all__ = ('ASSETS', 'AssetRegistry', 'get_assets')
+
+data_dir = user_data_dir('SpotAlong', 'CriticalElement') + os.path.sep
+logger = logging.getLogger(__name__)
+
+# name -> (file, mode, the sizes it is used at, None being the size of the file)
+ASSETS: typing.Dict[str, typing.Tuple[str, str, typing.Tuple[typing.Optional[int], ...]]] = {
+    'mask': ('mask.png', 'L', (200, 120)),
+    'default_user': ('default_user.png', 'RGBA', (None,)),
+    'listening': ('listening.png', 'RGBA', (None,)),
+    'online': ('online.png', 'RGBA', (None,)),
+    'offline': ('offline.png', 'RGBA', (None,)),
+}
+
+
+class AssetRegistry:
+    """
+        A class that represents the decoded default images that every avatar is composited with, loaded once per
+        process at each size they are used at. The decoded images are never handed out, only copies of them, so
+        they can't be changed by a caller.
+
+        Parameters:
+            directory (str) (optional): The directory the assets are in, by default the data directory.
+    """
+
+    def __init__(self, directory: typing.Optional[str] = None):
+        self.directory = directory
+        self._images: typing.Dict[typing.Tuple[str, typing.Optional[int]], Image.Image] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, name: str, size: typing.Optional[int]) -> Image.Image:
+        filename, mode, _ = ASSETS[name]
+        with Image.open((self.directory or data_dir) + filename) as image:
+            image = image.convert(mode)
+        if size is not None:
+            image = image.resize((size, size))
+        return image
+
+    def preload(self):
+        """
+            Decodes every asset at every size it is used at, skipping the ones that aren't extracted yet.
+        """
+        missing = []
+        for name, (filename, _, sizes) in ASSETS.items():
+            if not os.path.exists((self.directory or data_dir) + filename):
+                missing.append(name)  # decoded by get once it is there
+                continue
+            for size in sizes:
+                try:
+                    self.get(name, size)
+                except OSError as exc:
+                    logger.warning(f'Could not preload the {name} asset: ', exc_info=exc)
+        if missing:
+            logger.debug(f'Skipped preloading the assets that aren\'t extracted yet: {", ".join(missing)}')
+
+    def get(self, name: str, size: typing.Optional[int] = None) -> Image.Image:
+        """
+            Returns a copy of an asset, decoding it the first time it is requested.
+
+            Parameters:
+                name (str): The name of the asset, see ASSETS.
+                size (int) (optional): The size of the square to resize the asset to, None for its original size.
+        """
+        key = (name, size)
+        with self._lock:
+            image = self._images.get(key)
+            if image is None:
+                image = self._images[key] = self._load(name, size)
+        return image.copy()
+
+    def path(self, name: str) -> str:
+        return (self.directory or data_dir) + ASSETS[name][0]
+
+
+_assets: typing.Optional[AssetRegistry] = None
+_assets_lock = threading.Lock()
+
+
+def get_assets() -> AssetRegistry:
+    """
+        Helper function that returns the AssetRegistry of this process, creating it the first time it is requested.
+    """
+    global _assets
+    with _assets_lock:
+        if _assets is None:
+            _assets = AssetRegistry()
+        return _assets
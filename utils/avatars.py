@@ -0,0 +1,222 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import typing
+from collections import OrderedDict
+
+from platformdirs import user_data_dir
+
+from .fetcher import get_image_fetcher
+from .imagestore import write_atomic
+from .imageworker import STATUSES, ImageWorker, get_image_worker
+from .kvstore import KeyValueStore, get_store
+
+__all__ = ('AvatarCache', 'get_avatar_cache')
+
+sep = os.path.sep
+data_dir = user_data_dir('SpotAlong', 'CriticalElement') + sep
+logger = logging.getLogger(__name__)
+
+MAX_VARIANT_SETS = 128  # profile pictures whose variants are kept in memory, a set is ~60 kB
+MAX_DOWNLOADS = 512  # profile pictures whose download is kept in avatars/, most are 10 - 50 kB
+
+
+class AvatarCache:
+    """
+        A class that represents the cache of profile pictures, keyed by avatar url. Each url is downloaded once (the
+        download is kept on disk in avatars/, until the user's url changes or it is one of the least recently used
+        beyond MAX_DOWNLOADS), and every variant of it (the round icon and the badge of each status) is produced by
+        the image worker in a single job. The per-user files the widgets load (icon{id}.png and
+        statusicon{id}.png) are only rewritten when the url of the user, or their status, changes.
+
+        Parameters:
+            urls (KeyValueStore): The store of user id -> the avatar url their icon was made from.
+            worker (ImageWorker) (optional): The worker to produce the variants with, by default the process-wide one.
+    """
+
+    def __init__(self, urls: KeyValueStore, worker: typing.Optional[ImageWorker] = None):
+        self.urls = urls
+        self.worker = worker
+        self._variants: typing.OrderedDict[str, typing.Dict[str, bytes]] = OrderedDict()
+        self._statuses: typing.Dict[str, tuple] = {}  # user id -> the (url, status) of their statusicon
+        self._lock = threading.Lock()
+        self._url_locks: typing.Dict[str, threading.Lock] = {}
+        self._counters = {'download': [0, 0], 'variants': [0, 0], 'icon': [0, 0], 'status': [0, 0]}
+
+    def _count(self, kind: str, hit: bool):
+        with self._lock:
+            self._counters[kind][not hit] += 1
+
+    @staticmethod
+    def _download_path(url: str) -> str:
+        return f'{data_dir}avatars{sep}{hashlib.sha1(url.encode()).hexdigest()}'
+
+    def _source(self, url: typing.Optional[str]) -> typing.Union[str, bytes]:
+        """
+            Helper function that returns the downloaded profile picture of an url, downloading it if needed.
+        """
+        if not url:
+            return data_dir + 'default_user.png'
+        path = self._download_path(url)
+        try:
+            os.utime(path)  # the modification time orders the downloads by when they were last used
+            self._count('download', True)
+            return path
+        except FileNotFoundError:
+            pass
+        self._count('download', False)
+        os.makedirs(f'{data_dir}avatars', exist_ok=True)
+        content = get_image_fetcher().fetch(url, save=lambda data: write_atomic(path, data), timeout=15).result()
+        self._trim_downloads()
+        return content
+
+    def _remove_download(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as exc:  # most likely still open on windows, it is picked up again by the next trim
+            logger.warning(f'Could not delete {path}: ', exc_info=exc)
+
+    def _prune(self, url: typing.Optional[str]):
+        """
+            Helper function that deletes the download of an url, if no user's icons are made from it anymore.
+        """
+        if not url or url in self.urls.values() or any(used == url for used, _ in list(self._statuses.values())):
+            return
+        self._remove_download(self._download_path(url))
+
+    def _trim_downloads(self):
+        """
+            Helper function that deletes the least recently used downloads beyond MAX_DOWNLOADS.
+        """
+        try:
+            with os.scandir(f'{data_dir}avatars') as entries:
+                downloads = sorted((entry.stat().st_mtime, entry.path) for entry in entries if entry.is_file())
+        except OSError as exc:
+            logger.warning('Could not list the downloaded profile pictures: ', exc_info=exc)
+            return
+        for _, path in downloads[:-MAX_DOWNLOADS]:
+            self._remove_download(path)
+
+    def variants(self, url: typing.Optional[str]) -> typing.Dict[str, bytes]:
+        """
+            Returns every variant of the profile picture at url (None for the default one), see avatar_variants.
+        """
+        key = url or ''
+        with self._lock:
+            url_lock = self._url_locks.setdefault(key, threading.Lock())
+        with url_lock:  # concurrent widgets of the same user wait for one download instead of racing
+            with self._lock:
+                variants = self._variants.get(key)
+                if variants is not None:
+                    self._variants.move_to_end(key)
+            if variants is not None:
+                self._count('variants', True)
+                return variants
+            self._count('variants', False)
+            worker = self.worker or get_image_worker()
+            variants = worker.run('avatar_variants', self._source(url), grayscale_offline=bool(url))
+            with self._lock:
+                self._variants[key] = variants
+                while len(self._variants) > MAX_VARIANT_SETS:
+                    evicted, _ = self._variants.popitem(last=False)
+                    self._url_locks.pop(evicted, None)
+            return variants
+
+    def icon(self, user_id: str, url: typing.Optional[str]) -> str:
+        """
+            Makes sure icon{user_id}.png is the 200 px round icon of url, and returns its path.
+
+            Parameters:
+                user_id (str): The id of the user.
+                url (str): The url of the user's profile picture, or None for the default one.
+        """
+        path = data_dir + f'icon{user_id}.png'
+        previous = self.urls.get(user_id, False)
+        if previous == url and os.path.exists(path):
+            self._count('icon', True)
+            return path
+        self._count('icon', False)
+        write_atomic(path, self.variants(url)['icon'])
+        self.urls[user_id] = url
+        if previous and previous != url:
+            self._prune(previous)  # the user changed their profile picture
+        return path
+
+    def status_icon(self, user_id: str, url: typing.Optional[str], status: str) -> str:
+        """
+            Makes sure statusicon{user_id}.png is the badge of url for status, and returns its path.
+
+            Parameters:
+                user_id (str): The id of the user.
+                url (str): The url of the user's profile picture, or None for the default one.
+                status (str): One of STATUSES.
+        """
+        if status not in STATUSES:
+            raise ValueError(f'Unknown status {status}')
+        path = data_dir + f'statusicon{user_id}.png'
+        previous = self._statuses.get(user_id)
+        if previous == (url, status) and os.path.exists(path):
+            self._count('status', True)
+            return path
+        self._count('status', False)
+        write_atomic(path, self.variants(url)[status])
+        self._statuses[user_id] = (url, status)
+        if previous and previous[0] != url:
+            self._prune(previous[0])
+        return path
+
+    def invalidate(self, user_id: str):
+        """
+            Forces the icons of a user to be rewritten the next time they are requested.
+        """
+        self.urls.pop(user_id, None)
+        self._statuses.pop(user_id, None)
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, float]]:
+        """
+            Returns the hits, misses and hit rate of the downloads, variant sets, icons and status icons so far.
+        """
+        with self._lock:
+            counters = {kind: tuple(counts) for kind, counts in self._counters.items()}
+        return {kind: {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses else 0}
+                for kind, (hits, misses) in counters.items()}
+
+    def summary(self) -> str:
+        return ', '.join(f'{kind}: {stat["hits"]} hits, {stat["misses"]} misses ({stat["hit_rate"]:.0%})'
+                         for kind, stat in self.stats().items())
+
+
+_avatar_cache: typing.Optional[AvatarCache] = None
+_avatar_cache_lock = threading.Lock()
+
+
+def get_avatar_cache() -> AvatarCache:
+    """
+        Helper function that returns the process-wide AvatarCache, creating it the first time it is requested.
+    """
+    global _avatar_cache
+    with _avatar_cache_lock:
+        if _avatar_cache is None:
+            _avatar_cache = AvatarCache(get_store('avatar_urls'))
+        return _avatar_cache
@@ -0,0 +1,95 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import threading
+import typing
+
+from .kvstore import KeyValueStore, get_store
+
+__all__ = ('ColorStore', 'get_color_store')
+
+Color = typing.Tuple[int, ...]
+Colors = typing.Tuple[Color, Color, Color]  # dominant, dark, text
+
+
+class ColorStore:
+    """
+        A class that represents the process-wide, thread-safe cache of album and profile colors, persisted with
+        write-behind by the underlying KeyValueStores. Every lookup is counted, so hit rates can be logged.
+
+        Parameters:
+            albums (KeyValueStore): The store of album id -> colors.
+            profiles (KeyValueStore): The store of user id -> colors.
+    """
+
+    def __init__(self, albums: KeyValueStore, profiles: KeyValueStore):
+        self.albums = albums
+        self.profiles = profiles
+        self._lock = threading.Lock()
+        self._counters = {'album': [0, 0], 'profile': [0, 0]}  # kind -> [hits, misses]
+
+    def _get(self, kind: str, store: KeyValueStore, key: str) -> typing.Optional[Colors]:
+        colors = store.get(key)
+        with self._lock:
+            self._counters[kind][colors is None] += 1
+        if colors is None:
+            return None
+        return tuple(tuple(color) for color in colors)  # noqa
+
+    def get_album(self, album_id: str) -> typing.Optional[Colors]:
+        return self._get('album', self.albums, album_id)
+
+    def get_profile(self, user_id: str) -> typing.Optional[Colors]:
+        return self._get('profile', self.profiles, user_id)
+
+    def put_album(self, album_id: str, colors):
+        self.albums[album_id] = [list(color) for color in colors]
+
+    def put_profile(self, user_id: str, colors):
+        self.profiles[user_id] = [list(color) for color in colors]
+
+    def discard_album(self, album_id: str):
+        self.albums.discard(album_id)
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, float]]:
+        """
+            Returns the hits, misses and hit rate of the album and profile lookups so far.
+        """
+        with self._lock:
+            counters = {kind: tuple(counts) for kind, counts in self._counters.items()}
+        return {kind: {'hits': hits, 'misses': misses, 'hit_rate': hits / (hits + misses) if hits + misses else 0}
+                for kind, (hits, misses) in counters.items()}
+
+    def summary(self) -> str:
+        return ', '.join(f'{kind} colors: {stat["hits"]} hits, {stat["misses"]} misses ({stat["hit_rate"]:.0%})'
+                         for kind, stat in self.stats().items())
+
+
+_color_store: typing.Optional[ColorStore] = None
+_color_store_lock = threading.Lock()
+
+
+def get_color_store() -> ColorStore:
+    """
+        Helper function that returns the process-wide ColorStore, creating it the first time it is requested.
+    """
+    global _color_store
+    with _color_store_lock:
+        if _color_store is None:
+            _color_store = ColorStore(get_store('album_colors'), get_store('profile_colors'))
+        return _color_store
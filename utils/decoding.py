@@ -0,0 +1,328 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import logging
+import typing
+
+from spotifyclient.trackparser import ParsedTrack, parse_track
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library is used when it isn't installed
+    orjson = None
+
+__all__ = ('PayloadError', 'loads', 'dumps', 'socketio_json', 'UserPayload', 'SongUpdate', 'ClusterUpdate',
+           'DealerMessage', 'decode_user', 'decode_user_update', 'decode_friend_list', 'decode_song_update',
+           'decode_dealer_message')
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class PayloadError(ValueError):
+    """
+        Raised when a payload doesn't match its schema, in strict mode (or when a required field is unusable).
+    """
+
+
+def loads(data: typing.Union[str, bytes]):
+    """
+        Decode json, using orjson if it is installed.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, **kwargs) -> str:
+    """
+        Encode json, using orjson if it is installed. orjson always produces compact output, so formatting keyword
+        arguments (separators, etc.) are only honoured by the standard library fallback.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except TypeError:
+            pass  # something orjson won't serialize (e.g. int keys in a dict), let the standard library try
+    return json.dumps(obj, **kwargs)
+
+
+class _SocketIOJson:
+    """
+        A stand-in for the json module that python-socketio can be given (Client(json=...)) to encode and decode
+        packets with.
+    """
+    loads = staticmethod(loads)
+    dumps = staticmethod(dumps)
+
+
+socketio_json = _SocketIOJson()
+
+
+def _field(payload: dict, key: str, types, strict: bool, required: bool = True, default=None):
+    """
+        Helper function that pulls a single field out of a payload and checks its type. Missing or mistyped required
+        fields always raise a PayloadError, optional fields only raise in strict mode and are otherwise defaulted.
+    """
+    value = payload.get(key, _MISSING)
+    if value is _MISSING:
+        if required:
+            raise PayloadError(f'Missing required field {key!r}')
+        return default
+    if not isinstance(value, types):
+        if required or strict:
+            raise PayloadError(f'Field {key!r} should be {types}, not {type(value).__name__}')
+        return default
+    return value
+
+
+def _mapping(payload, name: str) -> dict:
+    if not isinstance(payload, dict):
+        raise PayloadError(f'{name} should be an object, not {type(payload).__name__}')
+    return payload
+
+
+def _decode(decoder, payload, strict: bool, name: str):
+    """
+        Helper function that runs a decoder, logging and discarding the payload in lenient mode instead of raising.
+    """
+    try:
+        return decoder(payload, strict)
+    except (PayloadError, KeyError, IndexError, TypeError, ValueError) as exc:
+        if strict:
+            if isinstance(exc, PayloadError):
+                raise
+            raise PayloadError(f'Malformed {name} payload: {exc!r}') from exc
+        logger.warning(f'Discarding malformed {name} payload: ', exc_info=exc)
+        return None
+
+
+class UserPayload(typing.NamedTuple):
+    """
+        A typed record of a user, as sent in the Authorized, friend_list and user_update events.
+    """
+    id: str
+    status: str
+    display_name: typing.Optional[str]
+    images: list
+    last_track: typing.Optional[dict]
+    friend_code: typing.Optional[str] = None
+    profile_colors: typing.Optional[list] = None
+    profile_img_url: typing.Optional[str] = None
+    user_data: typing.Optional[dict] = None
+
+    @property
+    def avatar_url(self) -> typing.Optional[str]:
+        return self.images[-1]['url'] if self.images else None
+
+
+class SongUpdate(typing.NamedTuple):
+    """
+        A typed record of a song_update event. track is the payload to give the SpotifyClient as its song_data (None
+        if nothing is playing), and parsed is its already memoized ParsedTrack.
+    """
+    user_id: str
+    status: str
+    last_track: typing.Optional[dict]
+    user_data: dict
+    track: typing.Optional[dict]
+    parsed: typing.Optional[ParsedTrack]
+    album_colors: typing.Optional[list] = None
+    album_img_url: typing.Optional[str] = None
+
+    @property
+    def album_image_id(self) -> typing.Optional[str]:
+        url = self.parsed.albumimagelink if self.parsed else None
+        if url and '/image/' in url:
+            return url.split('/image/')[1]
+        return None
+
+
+class ClusterUpdate(typing.NamedTuple):
+    """
+        A typed record of the cluster of a dealer message, the state of the user's playback across devices.
+    """
+    player_state: dict
+    queue_revision: typing.Optional[str]
+    is_paused: bool
+    shuffling: bool
+    looping: str
+    position_ms: int
+    next_tracks: typing.Optional[list] = None
+    devices: typing.Optional[dict] = None
+    active_device_id: str = ''
+    volume: typing.Optional[int] = None
+    timestamp: int = 0
+    server_timestamp_ms: typing.Optional[int] = None
+
+
+class DealerMessage(typing.NamedTuple):
+    """
+        A typed record of a message from the Spotify dealer websocket.
+    """
+    raw: dict
+    connection_id: typing.Optional[str] = None
+    items_changed: bool = False
+    cluster: typing.Optional[ClusterUpdate] = None
+
+
+def _user(payload, strict: bool, status=None, images=None) -> UserPayload:
+    payload = _mapping(payload, 'user')
+    if status is None:
+        status = _field(payload, 'status', str, strict)
+    if images is None:
+        images = _field(payload, 'images', list, strict, required=False, default=[]) or []
+    return UserPayload(id=_field(payload, 'id', str, strict),
+                       status=status,
+                       display_name=_field(payload, 'display_name', str, strict, required=False),
+                       images=images,
+                       last_track=_field(payload, 'last_track', (dict, type(None)), strict, required=False),
+                       friend_code=_field(payload, 'friend_code', (str, int), strict, required=False),
+                       profile_colors=_field(payload, 'profile_colors', list, strict, required=False),
+                       profile_img_url=_field(payload, 'profile_img_url', str, strict, required=False),
+                       user_data=dict(payload, status=status, images=images))
+
+
+def _user_update(payload, strict: bool) -> UserPayload:
+    payload = _mapping(payload, 'user_update')
+    ex_data = _mapping(_field(payload, 'ex_data', dict, strict), 'ex_data')
+    status = _field(ex_data, 'status', str, strict)
+    images = _field(ex_data, 'images', list, strict, required=False)
+    if images is None:
+        images = _field(payload, 'images', list, strict, required=False, default=[]) or []
+    user = _user(ex_data, strict, status=status, images=images)
+    # the display name and avatar shown in the ui come from the top level of the payload
+    user_data = {key: value for key, value in payload.items() if key != 'ex_data'}
+    user_data.update(status=status, images=_field(payload, 'images', list, strict, required=False, default=images))
+    return user._replace(display_name=_field(payload, 'display_name', str, strict, required=False,
+                                             default=user.display_name),
+                         user_data=user_data)
+
+
+def _song_update(payload, strict: bool) -> SongUpdate:
+    payload = _mapping(payload, 'song_update')
+    ex_data = _mapping(_field(payload, 'ex_data', dict, strict), 'ex_data')
+    status = _field(ex_data, 'status', str, strict)
+    track = None if payload.get('none') else payload
+    parsed = parse_track(track) if track else None  # parsing now memoizes it for the SpotifyClient
+    return SongUpdate(user_id=_field(ex_data, 'id', str, strict),
+                      status=status,
+                      last_track=_field(ex_data, 'last_track', (dict, type(None)), strict, required=False),
+                      user_data=dict(ex_data, status=status),
+                      track=track,
+                      parsed=parsed,
+                      album_colors=_field(payload, 'album_colors', list, strict, required=False),
+                      album_img_url=_field(payload, 'album_img_url', str, strict, required=False))
+
+
+def _cluster(cluster, update_reason, strict: bool) -> ClusterUpdate:
+    cluster = _mapping(cluster, 'cluster')
+    player_state = _mapping(_field(cluster, 'player_state', dict, strict), 'player_state')
+    options = _mapping(_field(player_state, 'options', dict, strict), 'options')
+    if options['repeating_track']:
+        looping = 'track'
+    elif options['repeating_context']:
+        looping = 'context'
+    else:
+        looping = 'off'
+    devices = _field(cluster, 'devices', dict, strict, required=False)
+    active_device_id = _field(cluster, 'active_device_id', str, strict, required=False, default='')
+    if devices and active_device_id in devices:
+        volume = devices[active_device_id].get('volume', 0)
+    else:
+        active_device_id, volume = '', None
+    try:
+        timestamp = int(player_state['timestamp'])
+        server_timestamp_ms = int(cluster['server_timestamp_ms'])
+    except KeyError:
+        timestamp, server_timestamp_ms = 0, None
+    return ClusterUpdate(player_state=player_state,
+                         queue_revision=player_state['queue_revision'],
+                         is_paused=bool(player_state['is_paused']),
+                         shuffling=bool(options['shuffling_context']),
+                         looping=looping,
+                         position_ms=int(player_state['position_as_of_timestamp']),
+                         next_tracks=_field(player_state, 'next_tracks', list, strict, required=False),
+                         devices=devices if update_reason and 'DEVICE' in update_reason else None,
+                         active_device_id=active_device_id,
+                         volume=volume,
+                         timestamp=timestamp,
+                         server_timestamp_ms=server_timestamp_ms)
+
+
+def _dealer_message(message, strict: bool) -> DealerMessage:
+    message = _mapping(loads(message) if isinstance(message, (str, bytes)) else message, 'dealer message')
+    headers = message.get('headers') or {}
+    connection_id = headers.get('Spotify-Connection-Id') if isinstance(headers, dict) else None
+    payloads = message.get('payloads')
+    if not payloads or not isinstance(payloads[0], dict):
+        return DealerMessage(raw=message, connection_id=connection_id)
+    payload = payloads[0]
+    cluster = None
+    if payload.get('cluster'):
+        cluster = _cluster(payload['cluster'], payload.get('update_reason'), strict)
+    return DealerMessage(raw=message, connection_id=connection_id, items_changed='items' in payload, cluster=cluster)
+
+
+def decode_user(payload, strict: bool = False) -> typing.Optional[UserPayload]:
+    """
+        Decode the payload of the Authorized event.
+
+        Parameters:
+            payload (dict): The raw payload.
+            strict (bool) (optional): Raise a PayloadError for a malformed payload, instead of logging and returning
+            None.
+    """
+    return _decode(_user, payload, strict, 'user')
+
+
+def decode_user_update(payload, strict: bool = False) -> typing.Optional[UserPayload]:
+    """
+        Decode the payload of a user_update event, see decode_user.
+    """
+    return _decode(_user_update, payload, strict, 'user_update')
+
+
+def decode_friend_list(payload, strict: bool = False) -> typing.List[UserPayload]:
+    """
+        Decode the payload of the friend_list event. In lenient mode malformed friends are skipped, rather than
+        discarding the whole list.
+    """
+    if not isinstance(payload, list):
+        if strict:
+            raise PayloadError(f'friend_list should be an array, not {type(payload).__name__}')
+        logger.warning(f'Discarding malformed friend_list payload of type {type(payload).__name__}')
+        return []
+    friends = (_decode(_user, friend, strict, 'friend') for friend in payload)
+    return [friend for friend in friends if friend is not None]
+
+
+def decode_song_update(payload, strict: bool = False) -> typing.Optional[SongUpdate]:
+    """
+        Decode the payload of a song_update event, see decode_user.
+    """
+    return _decode(_song_update, payload, strict, 'song_update')
+
+
+def decode_dealer_message(message, strict: bool = False) -> typing.Optional[DealerMessage]:
+    """
+        Decode a message (either still encoded or already loaded) from the Spotify dealer websocket, see decode_user.
+    """
+    return _decode(_dealer_message, message, strict, 'dealer')
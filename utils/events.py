@@ -0,0 +1,173 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import queue
+import threading
+import time
+import typing
+
+__all__ = ('ChangeEvent', 'MainStatusChanged', 'FriendChanged', 'RequestChanged', 'OutboundRequestChanged',
+           'StopRequested', 'EVENT_TYPES', 'EventBus', 'ChangeCoalescer', 'wait_for_events')
+
+
+class ChangeEvent:
+    """
+        A class that represents a change to the client's state, published by the socket handlers to the update
+        threads.
+
+        Parameters:
+            ids (tuple) (optional): The ids of the friends / requests that were changed.
+            sequence (int) (optional): The sequence number that the change was stamped with.
+    """
+    __slots__ = ('ids', 'sequence')
+    kind = ''
+
+    def __init__(self, ids: tuple = (), sequence: typing.Optional[int] = None):
+        self.ids = ids
+        self.sequence = sequence
+
+    def __repr__(self):
+        return f'<{type(self).__name__} ids={self.ids} sequence={self.sequence}>'
+
+
+class MainStatusChanged(ChangeEvent):
+    """The status of the main user has changed."""
+    __slots__ = ()
+    kind = 'main'
+
+
+class FriendChanged(ChangeEvent):
+    """A friend's status has changed, or a friend has been added / removed."""
+    __slots__ = ()
+    kind = 'friends'
+
+
+class RequestChanged(ChangeEvent):
+    """An inbound friend request has been added / removed."""
+    __slots__ = ()
+    kind = 'requests'
+
+
+class OutboundRequestChanged(ChangeEvent):
+    """An outbound friend request has been added / removed."""
+    __slots__ = ()
+    kind = 'outbound_requests'
+
+
+class StopRequested(ChangeEvent):
+    """The update threads are being stopped, this wakes them up so they can see it."""
+    __slots__ = ()
+    kind = 'stop'
+
+
+EVENT_TYPES = {event.kind: event for event in (MainStatusChanged, FriendChanged, RequestChanged,
+                                                OutboundRequestChanged)}
+
+
+class EventBus:
+    """
+        A class that fans out ChangeEvents to every subscribed queue, so that threads can block until there is
+        something to do instead of polling.
+    """
+
+    def __init__(self):
+        self._subscribers: typing.List[typing.Tuple[tuple, queue.SimpleQueue]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, *event_types) -> queue.SimpleQueue:
+        """
+            Returns a queue that will recieve every published event that is an instance of one of event_types.
+        """
+        events = queue.SimpleQueue()
+        with self._lock:
+            self._subscribers.append((event_types, events))
+        return events
+
+    def unsubscribe(self, events: queue.SimpleQueue):
+        with self._lock:
+            self._subscribers = [sub for sub in self._subscribers if sub[1] is not events]
+
+    def publish(self, event: ChangeEvent):
+        with self._lock:
+            subscribers = self._subscribers.copy()
+        for event_types, events in subscribers:
+            if isinstance(event, event_types):
+                events.put(event)
+
+
+class ChangeCoalescer:
+    """
+        A class that debounces bursts of changes per id, an id only becomes due once it hasn't changed for window
+        seconds (or once it has been held back for max_delay seconds), so only the latest state of a burst is handled.
+
+        Parameters:
+            window (float): How long an id has to go without changes before it is due.
+            max_delay (float) (optional): The longest an id can be held back for, defaults to four times the window.
+    """
+
+    def __init__(self, window: float, max_delay: typing.Optional[float] = None):
+        self.window = window
+        self.max_delay = max_delay if max_delay is not None else window * 4
+        self._first_change: typing.Dict[str, float] = {}
+        self._due: typing.Dict[str, float] = {}
+
+    def add(self, ids):
+        now = time.monotonic()
+        for id_ in ids:
+            first_change = self._first_change.setdefault(id_, now)
+            self._due[id_] = min(now + self.window, first_change + self.max_delay)
+
+    def retry(self, id_, delay: float = 0.25):
+        now = time.monotonic()
+        self._first_change[id_] = now
+        self._due[id_] = now + delay
+
+    def done(self, id_):
+        self._first_change.pop(id_, None)
+        self._due.pop(id_, None)
+
+    def due(self) -> typing.List[str]:
+        now = time.monotonic()
+        return [id_ for id_, due in self._due.items() if due <= now]
+
+    def timeout(self) -> typing.Optional[float]:
+        """
+            Helper function that returns how long to wait for until the next id is due, None if nothing is pending.
+        """
+        if not self._due:
+            return None
+        return max(min(self._due.values()) - time.monotonic(), 0)
+
+    def __len__(self):
+        return len(self._due)
+
+
+def wait_for_events(events: queue.SimpleQueue, timeout: typing.Optional[float] = None) -> typing.List[ChangeEvent]:
+    """
+        Helper function that blocks until at least one event arrives (or the timeout expires, if there is one), then
+        drains the queue.
+    """
+    try:
+        recieved = [events.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+    while True:
+        try:
+            recieved.append(events.get_nowait())
+        except queue.Empty:
+            return recieved
@@ -0,0 +1,123 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import threading
+import typing
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from .httpclient import HttpClient, get_http_client
+
+__all__ = ('ImageFetcher', 'get_image_fetcher', 'shutdown_image_fetcher')
+
+logger = logging.getLogger(__name__)
+
+
+class ImageFetcher:
+    """
+        A class that represents the downloader of avatars and album art. Concurrent fetches of the same url share a
+        single download (single-flight): the first caller's save callback writes the image, and every caller gets the
+        same future, resolved once the image is saved. Downloads run on a small thread pool, with at most per_host of
+        them to any one host at a time.
+
+        Parameters:
+            client (HttpClient) (optional): The client to download with, by default the process-wide one.
+            workers (int) (optional): How many downloads can run at once in total.
+            per_host (int) (optional): How many downloads can run at once per host.
+    """
+
+    def __init__(self, client: typing.Optional[HttpClient] = None, workers: int = 8, per_host: int = 4):
+        self.client = client
+        self.per_host = per_host
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ImageFetcher')
+        self._lock = threading.Lock()
+        self._in_flight: typing.Dict[str, Future] = {}
+        self._hosts: typing.Dict[str, threading.BoundedSemaphore] = {}
+        self.fetches = 0
+        self.coalesced = 0
+
+    def _download(self, url: str, save: typing.Optional[typing.Callable[[bytes], None]], timeout: float) -> bytes:
+        with self._lock:
+            host = self._hosts.setdefault(urlsplit(url).netloc, threading.BoundedSemaphore(self.per_host))
+        with host:
+            resp = (self.client or get_http_client()).get(url, timeout=timeout)
+        resp.raise_for_status()  # an error page mustn't be saved as an image
+        if save is not None:
+            save(resp.content)
+        return resp.content
+
+    def _done(self, url: str, future: Future):
+        with self._lock:
+            if self._in_flight.get(url) is future:
+                del self._in_flight[url]
+
+    def fetch(self, url: str, save: typing.Optional[typing.Callable[[bytes], None]] = None,
+              timeout: float = 5) -> Future:
+        """
+            Downloads an image, or joins the download of it that is already running, and returns a future of its
+            content. The future raises requests.RequestException if the download failed.
+
+            Parameters:
+                url (str): The url of the image.
+                save (Callable) (optional): A function that writes the content somewhere, run once per download.
+                    Every caller fetching the same url should save it to the same place.
+                timeout (float) (optional): The read timeout of the download, in seconds.
+        """
+        with self._lock:
+            future = self._in_flight.get(url)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            self.fetches += 1
+            future = self._in_flight[url] = self._executor.submit(self._download, url, save, timeout)
+        future.add_done_callback(lambda done: self._done(url, done))
+        return future
+
+    def summary(self) -> str:
+        with self._lock:
+            return f'{self.fetches} downloads, {self.coalesced} coalesced into a running one'
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_image_fetcher: typing.Optional[ImageFetcher] = None
+_image_fetcher_lock = threading.Lock()
+
+
+def get_image_fetcher() -> ImageFetcher:
+    """
+        Helper function that returns the process-wide ImageFetcher, creating it the first time it is requested.
+    """
+    global _image_fetcher
+    with _image_fetcher_lock:
+        if _image_fetcher is None:
+            _image_fetcher = ImageFetcher()
+        return _image_fetcher
+
+
+def shutdown_image_fetcher():
+    """
+        Helper function that stops the process-wide ImageFetcher, if it was ever created.
+    """
+    global _image_fetcher
+    with _image_fetcher_lock:
+        fetcher, _image_fetcher = _image_fetcher, None
+    if fetcher is not None:
+        fetcher.shutdown()
@@ -0,0 +1,189 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import threading
+import time
+import typing
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+__all__ = ('HttpClient', 'get_http_client', 'close_http_client')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (5, 15)  # (connect, read) in seconds, for calls that don't pass their own
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRY_AFTER = 10  # seconds, a longer Retry-After is returned to the caller instead of waited on
+
+
+class HttpClient:
+    """
+        A class that represents the HTTP client shared by every SpotAlong server, Spotify CDN and Web API request
+        made outside of SpotifyPlayer. Each host gets its own session with a pool of keep-alive connections, so a
+        song change reuses the connections (and TLS sessions) of the previous one instead of opening new ones.
+        Idempotent requests are retried with exponential backoff on connection errors and on 429 / 5xx statuses,
+        other requests only when the connection couldn't be established at all.
+
+        Parameters:
+            retries (int) (optional): How many times a failed request is retried.
+            backoff (float) (optional): The delay before the first retry, doubled on every retry after it.
+            pool_size (int) (optional): How many connections are kept open per host.
+    """
+
+    def __init__(self, retries: int = 2, backoff: float = 0.5, pool_size: int = 8):
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._sessions: typing.Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+        self._counters: typing.Dict[str, typing.List[int]] = {}  # host -> [requests, retries, failures]
+
+    def session(self, url: str) -> requests.Session:
+        """
+            Returns the session of the host of url, creating it the first time the host is requested.
+        """
+        parts = urlsplit(url)
+        host = f'{parts.scheme}://{parts.netloc}'
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._counters[host] = [0, 0, 0]
+            return session
+
+    def _count(self, url: str, index: int):
+        parts = urlsplit(url)
+        with self._lock:
+            self._counters[f'{parts.scheme}://{parts.netloc}'][index] += 1
+
+    def _delay(self, attempt: int, resp: typing.Optional[requests.Response] = None) -> typing.Optional[float]:
+        """
+            Helper function that returns how long to wait before retrying, or None if the response asks for too long.
+        """
+        if resp is not None and resp.headers.get('Retry-After', '').isdigit():
+            delay = int(resp.headers['Retry-After'])
+            return delay if delay <= MAX_RETRY_AFTER else None
+        return self.backoff * 2 ** attempt
+
+    def request(self, method: str, url: str, retry: bool = True, **kwargs) -> requests.Response:
+        """
+            Sends a request through the pool of its host, see requests.request for the keyword arguments.
+
+            Parameters:
+                method (str): The HTTP method, in any case.
+                url (str): The url to send the request to.
+                retry (bool) (optional): Whether the request may be retried, False for requests that mustn't be sent
+                    twice, like redeeming a login code.
+        """
+        method = method.upper()
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+        session = self.session(url)
+        retries = self.retries if retry else 0
+        for attempt in range(retries + 1):
+            self._count(url, 0)
+            try:
+                resp = session.request(method, url, **kwargs)
+            except requests.ConnectionError as exc:
+                # a request that never reached the server can always be sent again
+                retryable = method in IDEMPOTENT_METHODS or isinstance(exc, requests.ConnectTimeout)
+                if attempt == retries or not retryable:
+                    self._count(url, 2)
+                    raise
+                delay = self._delay(attempt)
+                logger.warning(f'{method} {url} failed, retrying in {delay}s: {exc}')
+            else:
+                if resp.status_code not in RETRY_STATUSES or method not in IDEMPOTENT_METHODS or attempt == retries:
+                    return resp
+                delay = self._delay(attempt, resp)
+                if delay is None:
+                    return resp
+                logger.warning(f'{method} {url} returned {resp.status_code}, retrying in {delay}s')
+            self._count(url, 1)
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, float]]:
+        """
+            Returns the requests, retries, failures, opened connections and connection reuse rate of every host.
+        """
+        with self._lock:
+            sessions = dict(self._sessions)
+            counters = {host: tuple(counts) for host, counts in self._counters.items()}
+        stats = {}
+        for host, session in sessions.items():
+            connections = 0
+            pools = session.get_adapter(host).poolmanager.pools
+            for key in pools.keys():
+                try:
+                    connections += pools[key].num_connections
+                except KeyError:  # dropped in the meantime
+                    pass
+            sent, retries, failures = counters[host]
+            stats[host] = {'requests': sent, 'retries': retries, 'failures': failures, 'connections': connections,
+                           'reuse_rate': 1 - connections / sent if sent else 0}
+        return stats
+
+    def summary(self) -> str:
+        return ', '.join(f'{host}: {stat["requests"]} requests over {stat["connections"]} connections '
+                         f'({stat["reuse_rate"]:.0%} reused), {stat["retries"]} retries, {stat["failures"]} failures'
+                         for host, stat in self.stats().items())
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+_http_client: typing.Optional[HttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """
+        Helper function that returns the process-wide HttpClient, creating it the first time it is requested.
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient()
+        return _http_client
+
+
+def close_http_client():
+    """
+        Helper function that closes the connections of the process-wide HttpClient, if it was ever created.
+    """
+    global _http_client
+    with _http_client_lock:
+        client, _http_client = _http_client, None
+    if client is not None:
+        client.close()
@@ -0,0 +1,115 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import typing
+
+import numpy as np
+from PIL import Image
+from platformdirs import user_data_dir
+
+__all__ = ('PLAYBACK_ICONS', 'LISTENING_ICONS', 'tint_icon', 'tinted_icon_dir')
+
+sep = os.path.sep
+data_dir = user_data_dir('SpotAlong', 'CriticalElement') + sep
+logger = logging.getLogger(__name__)
+
+PLAYBACK_ICONS = (f'24x24{sep}cil-media-play', f'24x24{sep}cil-media-pause', f'20x20{sep}cil-media-step-forward',
+                  f'20x20{sep}cil-media-step-backward', f'16x16{sep}cil-shuffle', f'16x16{sep}cil-shuffle-on',
+                  f'16x16{sep}cil-loop', f'16x16{sep}cil-loop-on', f'16x16{sep}cil-loop-1', f'20x20{sep}cil-heart',
+                  f'20x20{sep}cil-heart-filled', f'16x16{sep}cil-screen-smartphone', f'16x16{sep}cil-volume-high',
+                  f'16x16{sep}cil-volume-low', f'16x16{sep}cil-volume-off')
+LISTENING_ICONS = (f'20x20{sep}cil-media-play', f'20x20{sep}cil-loop-circular', f'20x20{sep}cil-media-stop',
+                   f'20x20{sep}cil-media-pause')
+
+MAX_TINTED_SETS = 64  # least recently used tinted icon sets beyond this are deleted from disk
+
+_ready: typing.Set[tuple] = set()
+_lock = threading.Lock()
+
+
+def tint_icon(img: Image.Image, color) -> Image.Image:
+    """
+        Helper function that paints every pixel of an icon that isn't fully transparent with color, keeping its alpha.
+    """
+    data = np.array(img.convert('RGBA'))
+    data[data[..., 3] > 0, :3] = color[:3]
+    return Image.fromarray(data, 'RGBA')
+
+
+def _save(img: Image.Image, path: str):
+    """
+        Helper function that writes an image atomically, so a widget can never load a half written icon.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    img.save(f'{path}.tmp.png')
+    os.replace(f'{path}.tmp.png', path)
+
+
+def _prune(root: str, keep: str):
+    try:
+        sets = sorted((entry for entry in os.scandir(root) if entry.is_dir() and entry.path != keep),
+                      key=lambda entry: entry.stat().st_mtime)
+    except OSError:
+        return
+    for entry in sets[:max(len(sets) + 1 - MAX_TINTED_SETS, 0)]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+        _ready.difference_update({key for key in _ready if key[0] == entry.path})
+
+
+def tinted_icon_dir(icons: typing.Sequence[str], color, ratio: float = 1) -> str:
+    """
+        Returns the directory (in the form used by stylesheets, with a trailing slash) that holds a copy of icons
+        tinted with color, to be used in place of icons/. Each set is generated from the pristine icons once and cached
+        on disk, and a scaled variant of every icon ({icon}scaled.png) is added if the ratio isn't 1.
+
+        Parameters:
+            icons (Sequence[str]): The icons to tint, relative to icons/ and without the .png extension.
+            color (tuple): The rgb color to tint the icons with.
+            ratio (float) (optional): The ratio to scale the icons by, see get_ratio.
+    """
+    color = tuple(int(channel) for channel in color[:3])
+    root = f'{data_dir}icons{sep}tinted'
+    name = '-'.join(map(str, color)) + (f'@{ratio:.4g}' if ratio != 1 else '')
+    directory = f'{root}{sep}{name}'
+    key = (directory, tuple(icons))
+    with _lock:
+        if key not in _ready:
+            created = not os.path.isdir(directory)
+            for icon in icons:
+                target = f'{directory}{sep}{icon}.png'
+                if not os.path.exists(target):
+                    with Image.open(f'{data_dir}icons{sep}{icon}.png') as pristine:
+                        tinted = tint_icon(pristine, color)
+                    _save(tinted, target)
+                if ratio != 1 and not os.path.exists(f'{directory}{sep}{icon}scaled.png'):
+                    with Image.open(target) as tinted:
+                        scaled = tinted.resize((int(tinted.width * ratio), int(tinted.height * ratio)))
+                    _save(scaled, f'{directory}{sep}{icon}scaled.png')
+            _ready.add(key)
+            if created:
+                logger.info(f'Generated tinted icon set {name}')
+                _prune(root, directory)
+        try:
+            os.utime(directory)  # marks the set as recently used for pruning
+        except OSError:
+            pass
+    return directory.replace('\\', '/') + '/'
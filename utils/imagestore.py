@@ -0,0 +1,429 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import mmap
+import os
+import threading
+import typing
+from pathlib import Path
+
+from platformdirs import user_data_dir
+
+from .kvstore import KeyValueStore, get_store
+
+__all__ = ('ALBUM_PREFIXES', 'LooseImageStore', 'PackImageStore', 'get_album_store', 'set_album_pack',
+           'album_pack_enabled', 'write_atomic')
+
+data_dir = user_data_dir('SpotAlong', 'CriticalElement') + os.path.sep
+logger = logging.getLogger(__name__)
+
+ALBUM_PREFIXES = ('partialalbum', 'album')  # the downloaded image, and the feathered one
+PINNED = ('None', )  # the placeholder of songs without album art, which is a default file and never packed
+FILE_KEY = '.file'  # the key of the index that holds the name of the current pack file, image names can't start with .
+COMPACT_RATIO = 0.5  # a pack is compacted when more than this share of it is deleted images
+COMPACT_MIN_SIZE = 8 * 1000000  # and they take up more than this many bytes
+
+
+def write_atomic(path: str, data: bytes):
+    """
+        Helper function that writes a file through a temporary file and a rename, so the file is never seen half
+        written. The temporary file is unique to the thread, so concurrent writers can't mix their contents.
+    """
+    temp = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+def album_image_id(name: str) -> typing.Optional[str]:
+    """
+        Helper function that returns the album id of an album image file name, or None if it isn't one.
+    """
+    if not name.endswith('.png'):
+        return None
+    for prefix in ALBUM_PREFIXES:
+        if name.startswith(prefix):
+            return name[len(prefix):-len('.png')]
+    return None
+
+
+class LooseImageStore:
+    """
+        A class that represents album images kept as one png file each in a directory, the way they always were.
+
+        Parameters:
+            directory (str) (optional): The directory the images are in, by default the data directory.
+    """
+
+    def __init__(self, directory: typing.Optional[str] = None):
+        self.directory = directory or data_dir
+
+    def path(self, name: str) -> str:
+        return self.directory + name
+
+    def __contains__(self, name: str):
+        return os.path.exists(self.directory + name)
+
+    def size(self, name: str) -> int:
+        """
+            Returns the size of an image in bytes, 0 if it doesn't exist.
+        """
+        try:
+            return os.stat(self.directory + name).st_size
+        except OSError:
+            return 0
+
+    def version(self, name: str) -> typing.Optional[int]:
+        """
+            Returns a value that changes every time an image is rewritten, None if it doesn't exist.
+        """
+        try:
+            return os.stat(self.directory + name).st_mtime_ns
+        except OSError:
+            return None
+
+    def modified(self, name: str) -> typing.Optional[float]:
+        try:
+            return os.stat(self.directory + name).st_mtime
+        except OSError:
+            return None
+
+    def read(self, name: str) -> bytes:
+        with open(self.directory + name, 'rb') as f:
+            return f.read()
+
+    def source(self, name: str) -> typing.Union[str, bytes]:
+        """
+            Returns what the image worker jobs should open the image from.
+        """
+        return self.directory + name
+
+    def write(self, name: str, data: bytes):
+        write_atomic(self.directory + name, data)
+
+    def remove(self, name: str):
+        try:
+            os.remove(self.directory + name)
+        except FileNotFoundError:
+            pass
+
+    def names(self) -> typing.List[str]:
+        """
+            Returns the names of every album image, besides the pinned ones.
+        """
+        return [file.name for file in Path(self.directory).glob('*album*.png')
+                if album_image_id(file.name) not in (None, *PINNED) and file.is_file()]
+
+    def clear(self):
+        for name in self.names():
+            self.remove(name)
+
+
+class PackImageStore:
+    """
+        A class that represents album images packed into a single memory-mapped file. Images are appended to the
+        pack, an index of name -> [offset, length] is persisted in a KeyValueStore, and deleted images are reclaimed
+        by compacting the pack into a new file once they take up most of it. Images that aren't packed yet are served
+        from the loose files, and moved into the pack in the background by migrate, so turning the pack on doesn't
+        have to wait for the whole cache to be copied.
+
+        Reads return a copy of the mapped bytes: handing out views of the mapping would keep it open, and a mapped
+        file can't be replaced by its compacted version on Windows.
+
+        Parameters:
+            index (KeyValueStore): The store of image name -> [offset, length], and of FILE_KEY -> the pack file.
+            loose (LooseImageStore) (optional): The loose images to fall back to, and to migrate into the pack.
+    """
+
+    def __init__(self, index: KeyValueStore, loose: typing.Optional[LooseImageStore] = None):
+        self.index = index
+        self.loose = loose or LooseImageStore()
+        self.directory = self.loose.directory
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._entries: typing.Dict[str, typing.Tuple[int, int]] = {}
+        self._map: typing.Optional[mmap.mmap] = None
+        self._file = self.index.get(FILE_KEY) or 'albums-0.pack'
+        self._handle = open(self.directory + self._file, 'ab+')
+        end = self._handle.seek(0, os.SEEK_END)
+        for name, entry in self.index.items():
+            if name == FILE_KEY:
+                continue
+            offset, length = entry
+            if offset + length > end:  # the pack was truncated after the index was written, most likely a crash
+                logger.warning(f'Dropping {name} from the album pack, it is past the end of {self._file}')
+                del self.index[name]
+                continue
+            self._entries[name] = (offset, length)
+        self.index[FILE_KEY] = self._file
+        self._remove_stale_packs()
+        logger.info(f'Album pack: {len(self._entries)} images, {self.live_size / 1000000:.1f} MB '
+                    f'({self.dead_size / 1000000:.1f} MB reclaimable)')
+
+    def _remove_stale_packs(self):
+        """
+            Helper function that deletes the packs left behind by compaction, which are only unused after the index
+            pointing to the new pack was committed.
+        """
+        for file in Path(self.directory).glob('albums-*.pack'):
+            if file.name != self._file:
+                try:
+                    file.unlink()
+                except OSError:
+                    pass  # still mapped, it is picked up on the next start
+
+    @property
+    def live_size(self) -> int:
+        with self._lock:
+            return sum(length for _, length in self._entries.values())
+
+    @property
+    def dead_size(self) -> int:
+        with self._lock:
+            return os.fstat(self._handle.fileno()).st_size - self.live_size
+
+    def handles(self, name: str) -> bool:
+        """
+            Returns whether the image belongs in the pack, which is every album image besides the pinned ones.
+        """
+        return album_image_id(name) not in (None, *PINNED)
+
+    def _slice(self, offset: int, length: int) -> bytes:
+        if self._map is None or offset + length > len(self._map):  # appended to since it was mapped
+            if self._map is not None:
+                self._map.close()
+            self._handle.flush()
+            self._map = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[offset:offset + length]
+
+    def __contains__(self, name: str):
+        if not self.handles(name):
+            return name in self.loose
+        with self._lock:
+            if name in self._entries:
+                return True
+        return name in self.loose
+
+    def size(self, name: str) -> int:
+        with self._lock:
+            entry = self._entries.get(name)
+        return entry[1] if entry else self.loose.size(name)
+
+    def version(self, name: str) -> typing.Optional[typing.Tuple[str, int]]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry:
+                return self._file, entry[0]  # a rewritten image is appended at a new offset
+        version = self.loose.version(name)
+        return ('', version) if version is not None else None
+
+    def modified(self, name: str) -> typing.Optional[float]:
+        """
+            Returns the modification time of a loose image, packed images don't have one.
+        """
+        with self._lock:
+            if name in self._entries:
+                return None
+        return self.loose.modified(name)
+
+    def read(self, name: str) -> bytes:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry:
+                return self._slice(*entry)
+        return self.loose.read(name)
+
+    def source(self, name: str) -> typing.Union[str, bytes]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry:
+                return self._slice(*entry)
+        return self.loose.source(name)
+
+    def write(self, name: str, data: bytes):
+        if not self.handles(name):
+            self.loose.write(name, data)
+            return
+        with self._lock:
+            offset = self._handle.seek(0, os.SEEK_END)
+            self._handle.write(data)
+            self._handle.flush()
+            self._entries[name] = (offset, len(data))
+            self.index[name] = [offset, len(data)]  # only after the image is in the pack
+        self.loose.remove(name)
+
+    def remove(self, name: str):
+        with self._lock:
+            if self._entries.pop(name, None):
+                del self.index[name]
+        self.loose.remove(name)
+        dead = self.dead_size
+        if dead > COMPACT_MIN_SIZE and dead > (self.live_size + dead) * COMPACT_RATIO:
+            self.compact()
+
+    def names(self) -> typing.List[str]:
+        with self._lock:
+            packed = list(self._entries)
+        return packed + [name for name in self.loose.names() if name not in self._entries]
+
+    def clear(self):
+        with self._lock:
+            for name in list(self._entries):
+                del self.index[name]
+            self._entries.clear()
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._handle.truncate(0)
+        self.loose.clear()
+
+    def compact(self):
+        """
+            Copies the packed images into a new pack file without the deleted ones, and switches to it. The copy is
+            made without holding the lock, so images can still be read and written meanwhile, and the ones written
+            since are carried over once it is done.
+        """
+        if not self._compact_lock.acquire(blocking=False):
+            return  # already being compacted
+        try:
+            with self._lock:
+                entries = dict(self._entries)
+                generation = int(self._file[len('albums-'):-len('.pack')]) + 1
+            file = f'albums-{generation}.pack'
+            compacted: typing.Dict[str, typing.Tuple[int, int]] = {}
+            with open(self.directory + file, 'wb') as new:
+                for name, (offset, length) in entries.items():
+                    with self._lock:
+                        if self._entries.get(name) != (offset, length):
+                            continue  # rewritten or deleted since, handled below
+                        data = self._slice(offset, length)
+                    compacted[name] = (new.tell(), length)
+                    new.write(data)
+                with self._lock:
+                    for name in list(compacted):
+                        if self._entries.get(name) != entries[name]:
+                            del compacted[name]
+                    for name, entry in self._entries.items():
+                        if name not in compacted:
+                            compacted[name] = (new.tell(), entry[1])
+                            new.write(self._slice(*entry))
+                    new.flush()
+                    os.fsync(new.fileno())
+                    before = os.fstat(self._handle.fileno()).st_size
+                    if self._map is not None:
+                        self._map.close()
+                        self._map = None
+                    self._handle.close()
+                    self._handle = open(self.directory + file, 'ab+')
+                    self._file = file
+                    self._entries = compacted
+                    for name, (offset, length) in compacted.items():
+                        self.index[name] = [offset, length]
+                    self.index[FILE_KEY] = file
+                    self.index.flush()  # the old pack can only go once nothing points to it
+                    after = new.tell()
+            self._remove_stale_packs()
+            logger.info(f'Compacted the album pack from {before / 1000000:.1f} MB to {after / 1000000:.1f} MB')
+        finally:
+            self._compact_lock.release()
+
+    def migrate(self):
+        """
+            Moves the loose album images into the pack.
+        """
+        with self._lock:
+            known = set(self._entries)
+        names = [name for name in self.loose.names() if name not in known]
+        for name in names:
+            try:
+                data = self.loose.read(name)
+                with self._lock:
+                    if name in self._entries:  # packed by a download in the meantime, which is newer
+                        continue
+                self.write(name, data)
+            except FileNotFoundError:
+                pass  # moved into the pack, or evicted, in the meantime
+            except OSError as exc:
+                logger.warning(f'Could not pack {name}: ', exc_info=exc)
+        if names:
+            logger.info(f'Moved {len(names)} album images into the album pack')
+
+    def export(self):
+        """
+            Moves the packed images back into loose files, and deletes the pack.
+        """
+        with self._lock:
+            names = list(self._entries)
+        for name in names:
+            self.loose.write(name, self.read(name))
+        with self._lock:
+            self.index.clear()
+            self._entries.clear()
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._handle.close()
+        os.remove(self.directory + self._file)
+        logger.info(f'Moved {len(names)} album images out of the album pack')
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._handle.close()
+
+
+_album_store: typing.Optional[typing.Union[LooseImageStore, PackImageStore]] = None
+_album_store_lock = threading.Lock()
+_album_pack = False
+
+
+def set_album_pack(enabled: bool):
+    """
+        Helper function that chooses whether album images are packed, this has to be called before the album store is
+        first requested (the pack_album_images setting of config.json).
+    """
+    global _album_pack
+    _album_pack = enabled
+
+
+def album_pack_enabled() -> bool:
+    return _album_pack
+
+
+def get_album_store() -> typing.Union[LooseImageStore, PackImageStore]:
+    """
+        Helper function that returns the process-wide album image store, opening it the first time it is requested.
+        Loose images are moved into the pack in the background when it is turned on, and a pack is unpacked when it is
+        turned off.
+    """
+    global _album_store
+    with _album_store_lock:
+        if _album_store is None:
+            loose = LooseImageStore()
+            index = get_store('album_pack')
+            if _album_pack:
+                _album_store = PackImageStore(index, loose)
+                threading.Thread(target=_album_store.migrate, daemon=True, name='AlbumPackMigration').start()
+            else:
+                if len(index):
+                    PackImageStore(index, loose).export()
+                _album_store = loose
+        return _album_store
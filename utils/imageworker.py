@@ -0,0 +1,354 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import functools
+import io
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import typing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image, ImageOps, ImageStat
+
+from .assets import get_assets
+from .palette import PaletteBackend, get_palette_backend, set_palette_backend
+
+__all__ = ('JOBS', 'STATUSES', 'ImageWorker', 'get_image_worker', 'set_image_worker', 'shutdown_image_worker')
+
+logger = logging.getLogger(__name__)
+
+Source = typing.Union[str, bytes]  # a path to an image, or the encoded image itself
+
+
+def _open(source: Source) -> Image.Image:
+    return Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def album_colors(source: Source):
+    """
+        Job that picks the dominant, dark and text colors of an album image, see extract_color.
+    """
+    with _open(source) as srcimage:
+        colors = get_palette_backend().get_palette(srcimage, 8, 5)
+        try:
+            r, g, b = ImageStat.Stat(srcimage).rms
+        except ValueError:
+            r, g, b = 127, 127, 127
+    old_colors = colors.copy()
+    brightness = math.sqrt(0.299 * r ** 2 + 0.587 * g ** 2 + 0.114 * b ** 2)
+    dominant_color = colors[0]
+    colors = colors[1:]
+    nextavg = np.mean(colors[0])
+    if nextavg < 20 or nextavg > 220:
+        text_color = colors[0]
+    else:
+        color_vividness = [max(color) - min(color) for color in colors]
+        mult_fact = 1.6
+        for i in range(len(color_vividness)):
+            color_vividness[i] *= mult_fact
+            color_vividness[i] *= mult_fact
+            mult_fact -= 0.2
+        text_color = colors[color_vividness.index(max(color_vividness))]
+    if brightness < 107 or (brightness < 121 and np.mean(dominant_color) > 140):
+        if np.mean(dominant_color) - np.mean(text_color) > 20 or np.mean(dominant_color) > 140:
+            if np.mean(text_color) < 50:
+                dominant_color, text_color = text_color, dominant_color
+            else:
+                averages = [np.mean(c) for c in colors]
+                index = averages.index(min(averages))
+                dominant_color = colors[index]
+    if brightness > 169:
+        if np.mean(text_color) - np.mean(dominant_color) > 20:
+            if np.mean(text_color) > 220:
+                dominant_color, text_color = text_color, dominant_color
+            else:
+                averages = [np.mean(c) for c in colors]
+                index = averages.index(max(averages))
+                dominant_color = colors[index]
+    dark_color = tuple([max(0, c - 30) for c in dominant_color])
+    all_averages = [np.mean(c) for c in old_colors]
+
+    def check_closeness(dominant, text):
+        # returns True if the difference in rgb values is less than or equal to 20 for at least two color channels
+        if sum([int(abs(dominant[col] - text[col]) <= 20) for col in range(3)]) >= 2:
+            # checks that the other color channel is similar by 75
+            return max([abs(dominant[col] - text[col]) for col in range(3)]) < 75
+        return False
+
+    if check_closeness(dominant_color, text_color):
+        text_color = old_colors[all_averages.index(max(all_averages))]
+    if check_closeness(dominant_color, text_color):
+        text_color = old_colors[all_averages.index(min(all_averages))]
+    if check_closeness(dominant_color, text_color):
+        text_color = (255, 255, 255)
+    if check_closeness(dominant_color, text_color):
+        text_color = (0, 0, 0)
+    return dominant_color, dark_color, text_color
+
+
+def dominant_color(source: Source, quality: int = 1):
+    """
+        Job that returns the dominant color of an image, used for the profile colors of users without album art.
+    """
+    return get_palette_backend().get_color(source, quality=quality)
+
+
+@functools.lru_cache(maxsize=16)
+def _feather_mask(width: int, height: int, radius: int) -> np.ndarray:
+    """
+        Helper function that returns the alpha of every pixel of a feathered image of the given size, with 256 for
+        the pixels that keep their own alpha. The ramps are computed exactly like the original per-pixel loop did:
+        the right ramp wins over the left one where they overlap, and everything else is combined with min.
+    """
+    step = 255 / radius
+    unset = 256
+    xs = np.arange(width)
+    horizontal = np.full(width, unset, dtype=np.int64)
+    horizontal[xs < radius] = (step * xs[xs < radius]).astype(np.int64)
+    right = width - radius < xs
+    horizontal[right] = (step * (width - xs[right])).astype(np.int64)
+    ys = np.arange(height)
+    vertical = np.full(height, unset, dtype=np.int64)
+    vertical[ys < radius] = (step * ys[ys < radius]).astype(np.int64)
+    bottom = height - radius < ys
+    vertical[bottom] = np.minimum(vertical[bottom], (step * (height - ys[bottom])).astype(np.int64))
+    mask = np.minimum(horizontal[np.newaxis, :], vertical[:, np.newaxis])
+    mask.flags.writeable = False
+    return mask
+
+
+def _feather(im: Image.Image, radius: int) -> Image.Image:
+    """
+        Helper function that fades the edges of an image to transparent, in one array operation.
+    """
+    data = np.array(im.convert('RGBA'))
+    mask = _feather_mask(data.shape[1], data.shape[0], radius)
+    data[..., 3] = np.where(mask == 256, data[..., 3], mask)
+    return Image.fromarray(data, 'RGBA')
+
+
+def feather(source: Source, radius: int = 35) -> bytes:
+    """
+        Job that fades the edges of an album image to transparent, returning the png.
+    """
+    with _open(source) as im:
+        return _png(_feather(im, radius))
+
+
+STATUSES = ('listening', 'online', 'offline')
+
+
+def _profile_picture(source: Source) -> Image.Image:
+    """
+        Helper function that opens a profile picture as RGBA, the default one is taken from the asset registry.
+    """
+    assets = get_assets()
+    if source == assets.path('default_user'):
+        return assets.get('default_user')
+    with _open(source) as im:
+        return im.convert('RGBA')
+
+
+def _round(im: Image.Image, mask: Image.Image) -> Image.Image:
+    output = ImageOps.fit(im, mask.size, centering=(0.5, 0.5))
+    output.putalpha(mask)
+    return output
+
+
+def _badge(output: Image.Image, mask: Image.Image, status: str) -> Image.Image:
+    """
+        Helper function that pastes a 120 px round profile picture onto the background of a status.
+    """
+    back = get_assets().get(status)
+    back.paste(output, (15, 15), mask)
+
+    back = back.resize((50, 50))
+
+    padding = Image.new('RGBA', (80, 70), (0, 0, 0, 0))
+    padding.paste(back, (6, 10))
+    return padding
+
+
+def avatar(source: Source, size: int = 200) -> bytes:
+    """
+        Job that crops a profile picture into a circle of the given size, returning the png.
+    """
+    mask = get_assets().get('mask', size)
+    return _png(_round(_profile_picture(source), mask))
+
+
+def status_icon(source: Source, status: str, grayscale: bool = False) -> bytes:
+    """
+        Job that composites a profile picture onto the background of a status (listening, online or offline), as
+        shown in the friends list, returning the png.
+    """
+    mask = get_assets().get('mask', 120)
+    im = _profile_picture(source)
+    if grayscale:
+        im = ImageOps.grayscale(im)
+    return _png(_badge(_round(im, mask), mask, status))
+
+
+def avatar_variants(source: Source, grayscale_offline: bool = True) -> typing.Dict[str, bytes]:
+    """
+        Job that produces every variant of a profile picture in one pass, returning a dict of pngs: the 200 px round
+        icon ('icon') and the badge of each status (see STATUSES).
+
+        Parameters:
+            source (str | bytes): The path of the profile picture, or the encoded profile picture.
+            grayscale_offline (bool) (optional): Whether the offline badge is grayscale, the default profile picture
+            isn't.
+    """
+    assets = get_assets()
+    im = _profile_picture(source)
+    variants = {'icon': _png(_round(im, assets.get('mask', 200)))}
+    small_mask = assets.get('mask', 120)
+    small = _round(im, small_mask)
+    small_gray = _round(ImageOps.grayscale(im), small_mask) if grayscale_offline else small
+    for status in STATUSES:
+        variants[status] = _png(_badge(small_gray if status == 'offline' else small, small_mask, status))
+    return variants
+
+
+JOBS: typing.Dict[str, typing.Callable] = {'album_colors': album_colors, 'dominant_color': dominant_color,
+                                           'feather': feather, 'avatar': avatar, 'status_icon': status_icon,
+                                           'avatar_variants': avatar_variants}
+
+
+def _run(job: str, source: Source, params: dict):
+    return JOBS[job](source, **params)
+
+
+def _init_worker(backend: PaletteBackend):
+    set_palette_backend(backend)
+    get_assets().preload()
+
+
+class ImageWorker:
+    """
+        A class that runs the image jobs (see JOBS) in a small pool of processes, so that Pillow and NumPy don't hold
+        the GIL while the socket.io and GUI threads need it. Each job takes an image path or the encoded image, and
+        returns colors or the processed png. The processes are only started by the first job.
+
+        Parameters:
+            processes (int) (optional): The amount of worker processes, 0 runs every job in the calling thread
+            instead, which is useful for debugging.
+    """
+
+    def __init__(self, processes: int = max(1, min(2, (os.cpu_count() or 1) - 1))):
+        self.processes = processes
+        self._executor: typing.Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> typing.Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._executor is None and self.processes:
+                # forking a process that runs Qt and socket.io threads isn't safe, so the workers are always spawned
+                self._executor = ProcessPoolExecutor(self.processes, multiprocessing.get_context('spawn'),
+                                                     initializer=_init_worker, initargs=(get_palette_backend(),))
+                logger.info(f'Started the image worker pool with {self.processes} processes')
+            return self._executor
+
+    def _fall_back(self, exc: BaseException):
+        logger.error('The image worker pool failed, running image jobs in-thread from now on: ', exc_info=exc)
+        with self._lock:
+            executor, self._executor, self.processes = self._executor, None, 0
+        if executor:
+            executor.shutdown(wait=False)
+
+    def submit(self, job: str, source: Source, **params) -> Future:
+        """
+            Queues a job and returns the future of its result.
+
+            Parameters:
+                job (str): The name of the job, see JOBS.
+                source (str | bytes): The path of the image, or the encoded image.
+                **params: The other arguments of the job.
+        """
+        if job not in JOBS:
+            raise KeyError(f'Unknown image job {job}')
+        executor = self._get_executor()
+        if executor:
+            try:
+                return executor.submit(_run, job, source, params)
+            except (BrokenProcessPool, RuntimeError, OSError) as exc:
+                self._fall_back(exc)
+        future = Future()
+        try:
+            future.set_result(_run(job, source, params))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def run(self, job: str, source: Source, **params):
+        """
+            Runs a job and waits for its result, in the pool if possible. The arguments are the same as submit.
+        """
+        try:
+            return self.submit(job, source, **params).result()
+        except BrokenProcessPool as exc:  # a worker died while running this job, so it is retried here
+            self._fall_back(exc)
+            return _run(job, source, params)
+
+    def shutdown(self):
+        """
+            Stops the worker processes, any later job runs in-thread.
+        """
+        with self._lock:
+            executor, self._executor, self.processes = self._executor, None, 0
+        if executor:
+            executor.shutdown(wait=False)
+
+
+_image_worker: typing.Optional[ImageWorker] = None
+_image_worker_lock = threading.Lock()
+
+
+def get_image_worker() -> ImageWorker:
+    """
+        Helper function that returns the process-wide ImageWorker, creating it the first time it is requested.
+    """
+    global _image_worker
+    with _image_worker_lock:
+        if _image_worker is None:
+            _image_worker = ImageWorker()
+        return _image_worker
+
+
+def set_image_worker(worker: ImageWorker):
+    global _image_worker
+    with _image_worker_lock:
+        _image_worker = worker
+
+
+def shutdown_image_worker():
+    with _image_worker_lock:
+        worker = _image_worker
+    if worker:
+        worker.shutdown()
@@ -0,0 +1,243 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import typing
+from collections.abc import MutableMapping
+
+from platformdirs import user_data_dir
+
+__all__ = ('KeyValueStore', 'get_store', 'flush_stores', 'close_stores')
+
+data_dir = user_data_dir('SpotAlong', 'CriticalElement') + os.path.sep
+logger = logging.getLogger(__name__)
+
+DATABASE = 'cache.db'
+# store name -> the json file it replaces (if any), which is migrated into the store the first time it is opened
+STORES = {'album_colors': 'color_cache.json', 'profile_colors': 'profile_cache.json', 'avatar_urls': None,
+          'album_index': None, 'album_pack': None}
+
+_DELETED = object()
+
+
+class KeyValueStore(MutableMapping):
+    """
+        A class that represents a persistent dict of json values, backed by a table in an SQLite database. Reads are
+        served from an in-memory index, writes are applied to the index immediately and persisted in batches by a
+        background thread (write-behind), each batch in a single transaction so a crash can't leave a torn file.
+
+        Parameters:
+            path (str): The path of the SQLite database.
+            table (str): The name of the table to store the values in.
+            legacy_json (str) (optional): The path of a json file to import the first time this table is opened.
+            flush_interval (float) (optional): How long writes are batched for before they are committed.
+    """
+
+    def __init__(self, path: str, table: str, legacy_json: typing.Optional[str] = None, flush_interval: float = 1):
+        self.path = path
+        self.table = table
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._data: typing.Dict[str, typing.Any] = {}
+        self._dirty: typing.Dict[str, typing.Any] = {}
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self._flusher: typing.Optional[threading.Thread] = None
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(f'CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)')
+        if legacy_json:
+            self._migrate(legacy_json)
+        for key, value in self._db.execute(f'SELECT key, value FROM {table}'):
+            try:
+                self._data[key] = json.loads(value)
+            except ValueError:
+                logger.warning(f'Skipping corrupted value for {key} in {table}')
+
+    def _migrate(self, legacy_json: str):
+        """
+            Helper function that imports a legacy json cache into the table, exactly once.
+        """
+        name = f'{self.table}:{os.path.basename(legacy_json)}'
+        if self._db.execute('SELECT 1 FROM migrations WHERE name = ?', (name,)).fetchone():
+            return
+        try:
+            with open(legacy_json, 'r') as f:
+                legacy = json.load(f)
+        except (FileNotFoundError, OSError, PermissionError, ValueError) as exc:
+            logger.warning(f'Could not read {legacy_json} for migration, starting with an empty {self.table}: ',
+                           exc_info=exc)
+            legacy = {}
+        with self._db:
+            if isinstance(legacy, dict):
+                self._db.executemany(f'INSERT OR IGNORE INTO {self.table} (key, value) VALUES (?, ?)',
+                                     ((str(key), json.dumps(value)) for key, value in legacy.items()))
+            self._db.execute('INSERT INTO migrations (name) VALUES (?)', (name,))
+        logger.info(f'Migrated {len(legacy)} entries from {legacy_json} into {self.table}')
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data.copy())
+
+    def __len__(self):
+        return len(self._data)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._dirty[key] = value
+        self._schedule_flush()
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+            self._dirty[key] = _DELETED
+        self._schedule_flush()
+
+    def pop(self, key, *default):
+        """
+            Removes a key and returns its value, atomically with respect to concurrent writes.
+        """
+        with self._lock:
+            if key not in self._data:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            value = self._data.pop(key)
+            self._dirty[key] = _DELETED
+        self._schedule_flush()
+        return value
+
+    def discard(self, *keys):
+        """
+            Removes every key that exists, in one batch of the write-behind.
+        """
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, _DELETED) is not _DELETED:
+                    self._dirty[key] = _DELETED
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flusher is None and not self._closed:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, daemon=True,
+                                                     name=f'KeyValueStore-{self.table}')
+                    self._flusher.start()
+        self._wakeup.set()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait()
+            if self._closed:
+                return
+            # let the writes of a burst pile up into one transaction, every write of it sets _wakeup again
+            self._stop.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """
+            Commit every pending write in a single transaction.
+        """
+        with self._lock:
+            if self._closed:  # kept in _dirty, there's no database left to write them to
+                return
+            dirty, self._dirty = self._dirty, {}
+            if not dirty:
+                return
+            deleted, rows = [], []
+            for key, value in list(dirty.items()):
+                if value is _DELETED:
+                    deleted.append((key,))
+                    continue
+                try:
+                    rows.append((key, json.dumps(value)))
+                except (TypeError, ValueError) as exc:
+                    # retrying can't help, so it is only kept in memory
+                    logger.error(f'Not persisting {key} in {self.table}, its value can\'t be serialized: ',
+                                 exc_info=exc)
+                    del dirty[key]
+            try:
+                with self._db:
+                    self._db.executemany(f'DELETE FROM {self.table} WHERE key = ?', deleted)
+                    self._db.executemany(f'INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)', rows)
+            except sqlite3.Error as exc:
+                logger.error(f'An unexpected error occured while flushing {self.table}: ', exc_info=exc)
+                for key, value in dirty.items():
+                    self._dirty.setdefault(key, value)  # keep them around for the next attempt
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._closed = True
+            self._stop.set()
+            self._wakeup.set()
+            self._db.close()
+
+
+_stores: typing.Dict[str, KeyValueStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(name: str) -> KeyValueStore:
+    """
+        Helper function that returns the process-wide store with the given name (one of STORES), opening it (and
+        migrating its legacy json file) the first time it is requested.
+    """
+    with _stores_lock:
+        if name not in _stores:
+            legacy_json = data_dir + STORES[name] if STORES[name] else None
+            _stores[name] = KeyValueStore(data_dir + DATABASE, name, legacy_json=legacy_json)
+        return _stores[name]
+
+
+def flush_stores():
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+
+def close_stores():
+    """
+        Helper function that commits and closes every open store, this has to be called before os._exit.
+    """
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
+
+
+atexit.register(close_stores)
@@ -26,6 +26,7 @@ import requests
 from platformdirs import user_data_dir
 
 from utils.constants import *
+from utils.httpclient import get_http_client
 from utils.utils import convert_from_utc_timestamp
 
 
@@ -69,7 +70,7 @@ def login():
             return refresh_response
     eligible_url = BASE_URL + '/login/eligible'
     try:
-        resp = requests.get(eligible_url, headers={'authorization': access_token}, timeout=15)
+        resp = get_http_client().get(eligible_url, headers={'authorization': access_token}, timeout=15)
     except (requests.RequestException, requests.ConnectionError) as e:
         logger.error('Could not connect to the server', exc_info=e)
         return False
@@ -89,8 +90,8 @@ def refresh(access_token, refresh_token):
     refresh_url = BASE_URL + '/login/refresh'
     logger.info('Refreshing token...')
     try:
-        refresh_resp = requests.post(refresh_url, headers={'authorization': access_token},
-                                     data={'refresh_token': refresh_token}, timeout=15)
+        refresh_resp = get_http_client().post(refresh_url, headers={'authorization': access_token},
+                                              data={'refresh_token': refresh_token}, timeout=15)
     except (requests.exceptions.ConnectionError, requests.exceptions.RequestException) as e:
         logger.error('Could not connect to the server', exc_info=e)
         return False
@@ -118,7 +119,7 @@ def create_user(emitter):
         return login_info
     login_url = BASE_URL + '/login'
     try:
-        login_response = requests.get(login_url)
+        login_response = get_http_client().get(login_url)
     except (requests.RequestException, requests.ConnectionError) as e:
         logger.error('Could not connect to the server', exc_info=e)
         emitter.append(['Failed', 'Failed'])  # ?
@@ -138,7 +139,7 @@ def redeem_code(code):
     """
     redeem_url = BASE_URL + '/login/redeem_code'
     try:
-        redeem_response = requests.get(redeem_url, headers={'code': code})
+        redeem_response = get_http_client().get(redeem_url, headers={'code': code}, retry=False)  # single use
     except (requests.RequestException, requests.ConnectionError) as e:
         logger.error('Could not connect to the server', exc_info=e)
         return 'Failed'
@@ -0,0 +1,290 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import io
+import logging
+import math
+import typing
+from abc import ABC, abstractmethod
+
+import numpy as np
+from PIL import Image
+
+try:
+    from colorthief import ColorThief
+except ImportError:  # colorthief is optional, it is only needed for the colorthief backend
+    ColorThief = None
+
+__all__ = ('PaletteBackend', 'NumpyPalette', 'ColorThiefPalette', 'BACKENDS', 'get_palette_backend',
+           'set_palette_backend')
+
+logger = logging.getLogger(__name__)
+
+Color = typing.Tuple[int, int, int]
+ImageSource = typing.Union[str, bytes, Image.Image, typing.BinaryIO]
+
+SIGBITS = 5
+RSHIFT = 8 - SIGBITS
+MAX_ITERATION = 1000
+FRACT_BY_POPULATIONS = 0.75
+
+
+class PaletteBackend(ABC):
+    """
+        The interface of a palette backend, both methods follow the semantics of ColorThief's methods of the same name.
+    """
+    name = ''
+
+    @abstractmethod
+    def get_palette(self, image: ImageSource, color_count: int = 10, quality: int = 10) -> typing.List[Color]:
+        ...
+
+    def get_color(self, image: ImageSource, quality: int = 10) -> Color:
+        return self.get_palette(image, 5, quality)[0]
+
+
+class _VBox:
+    """
+        A box in the quantized color space, see MMCQ in colorthief. The count, volume and average are computed with
+        NumPy over the 3d histogram instead of triple loops, but otherwise in exactly the same way (including the
+        integer arithmetic of the averages), so the quantization is identical.
+    """
+    __slots__ = ('r1', 'r2', 'g1', 'g2', 'b1', 'b2', 'histo', '_count', '_volume')
+
+    def __init__(self, r1, r2, g1, g2, b1, b2, histo):
+        self.r1, self.r2, self.g1, self.g2, self.b1, self.b2 = r1, r2, g1, g2, b1, b2
+        self.histo = histo
+        self._count = None
+        self._volume = None
+
+    @property
+    def box(self) -> np.ndarray:
+        return self.histo[self.r1:self.r2 + 1, self.g1:self.g2 + 1, self.b1:self.b2 + 1]
+
+    @property
+    def count(self) -> int:
+        if self._count is None:
+            self._count = int(self.box.sum())
+        return self._count
+
+    @property
+    def volume(self) -> int:
+        if self._volume is None:
+            self._volume = (self.r2 - self.r1 + 1) * (self.g2 - self.g1 + 1) * (self.b2 - self.b1 + 1)
+        return self._volume
+
+    def copy(self) -> '_VBox':
+        return _VBox(self.r1, self.r2, self.g1, self.g2, self.b1, self.b2, self.histo)
+
+    def avg(self) -> Color:
+        mult = 1 << RSHIFT
+        box = self.box
+        ntot = int(box.sum())
+        if not ntot:
+            return (int(mult * (self.r1 + self.r2 + 1) / 2), int(mult * (self.g1 + self.g2 + 1) / 2),
+                    int(mult * (self.b1 + self.b2 + 1) / 2))
+        average = []
+        for axis, start in ((0, self.r1), (1, self.g1), (2, self.b1)):
+            others = tuple(other for other in range(3) if other != axis)
+            # (i + 0.5) * mult == i * mult + mult / 2, an exact integer, so the sum doesn't depend on summation order
+            weights = np.arange(start, start + box.shape[axis], dtype=np.int64) * mult + mult // 2
+            average.append(int(int((box.sum(axis=others) * weights).sum()) / ntot))
+        return average[0], average[1], average[2]
+
+
+def _median_cut_apply(vbox: _VBox):
+    if not vbox.count:
+        return None, None
+    widths = (vbox.r2 - vbox.r1 + 1, vbox.g2 - vbox.g1 + 1, vbox.b2 - vbox.b1 + 1)
+    if vbox.count == 1:
+        return vbox.copy(), None
+    axis = widths.index(max(widths))  # ties go to r, then g, like colorthief
+    dim1, dim2 = (('r1', 'r2'), ('g1', 'g2'), ('b1', 'b2'))[axis]
+    dim1_val, dim2_val = getattr(vbox, dim1), getattr(vbox, dim2)
+    sums = vbox.box.sum(axis=tuple(other for other in range(3) if other != axis))
+    partials = np.cumsum(sums)
+    total = int(partials[-1])
+    partialsum = {dim1_val + offset: int(value) for offset, value in enumerate(partials)}
+    lookaheadsum = {i: total - d for i, d in partialsum.items()}
+    for i in range(dim1_val, dim2_val + 1):
+        if partialsum[i] > (total / 2):
+            vbox1 = vbox.copy()
+            vbox2 = vbox.copy()
+            left = i - dim1_val
+            right = dim2_val - i
+            if left <= right:
+                d2 = min([dim2_val - 1, int(i + right / 2)])
+            else:
+                d2 = max([dim1_val, int(i - 1 - left / 2)])
+            # avoid 0-count boxes
+            while not partialsum.get(d2, False):
+                d2 += 1
+            count2 = lookaheadsum.get(d2)
+            while not count2 and partialsum.get(d2 - 1, False):
+                d2 -= 1
+                count2 = lookaheadsum.get(d2)
+            setattr(vbox1, dim2, d2)
+            setattr(vbox2, dim1, d2 + 1)
+            return vbox1, vbox2
+    return None, None
+
+
+class _PQueue:
+    """
+        The lazily sorted queue of colorthief (a stable sort by key, popping the largest), so ties break the same way.
+    """
+
+    def __init__(self, sort_key):
+        self.sort_key = sort_key
+        self.contents = []
+        self._sorted = False
+
+    def push(self, vbox):
+        self.contents.append(vbox)
+        self._sorted = False
+
+    def pop(self):
+        if not self._sorted:
+            self.contents.sort(key=self.sort_key)
+            self._sorted = True
+        return self.contents.pop()
+
+    def size(self):
+        return len(self.contents)
+
+
+def _iterate(queue: _PQueue, target: float):
+    n_color = 1
+    n_iter = 0
+    while n_iter < MAX_ITERATION:
+        vbox = queue.pop()
+        if not vbox.count:  # just put it back
+            queue.push(vbox)
+            n_iter += 1
+            continue
+        vbox1, vbox2 = _median_cut_apply(vbox)
+        if not vbox1:
+            raise ValueError("vbox1 not defined; shouldn't happen!")
+        queue.push(vbox1)
+        if vbox2:
+            queue.push(vbox2)
+            n_color += 1
+        if n_color >= target:
+            return
+        n_iter += 1
+
+
+def _quantize(pixels: np.ndarray, max_color: int) -> typing.List[Color]:
+    """
+        Helper function that runs the modified median cut quantization over an (n, 3) array of rgb pixels.
+    """
+    if not len(pixels):
+        raise ValueError('Empty pixels when quantize.')
+    if max_color < 2 or max_color > 256:
+        raise ValueError('Wrong number of max colors when quantize.')
+    shifted = pixels >> RSHIFT
+    side = 1 << SIGBITS
+    histo = np.bincount((shifted[:, 0].astype(np.int64) << (2 * SIGBITS)) + (shifted[:, 1].astype(np.int64) << SIGBITS)
+                        + shifted[:, 2], minlength=side ** 3).reshape(side, side, side)
+    lows, highs = shifted.min(axis=0), shifted.max(axis=0)
+    queue = _PQueue(lambda box: box.count)
+    queue.push(_VBox(int(lows[0]), int(highs[0]), int(lows[1]), int(highs[1]), int(lows[2]), int(highs[2]), histo))
+    _iterate(queue, FRACT_BY_POPULATIONS * max_color)
+    queue2 = _PQueue(lambda box: box.count * box.volume)
+    while queue.size():
+        queue2.push(queue.pop())
+    _iterate(queue2, max_color - queue2.size())
+    palette = []
+    while queue2.size():
+        palette.append(queue2.pop().avg())
+    return palette
+
+
+def _open(image: ImageSource) -> Image.Image:
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, bytes):
+        image = io.BytesIO(image)
+    return Image.open(image)
+
+
+class NumpyPalette(PaletteBackend):
+    """
+        A palette backend that runs ColorThief's modified median cut over a NumPy histogram. With the default settings
+        the pixels are sampled exactly like ColorThief does (every quality-th pixel), so the palettes are identical.
+
+        Parameters:
+            max_samples (int) (optional): If given, images with more sampled pixels than this are sampled more sparsely
+            (a bigger quality), trading accuracy for speed on very large images. This can change the dominant color
+            noticeably, see benchmarks/bench_palette.py.
+    """
+    name = 'numpy'
+
+    def __init__(self, max_samples: typing.Optional[int] = None):
+        self.max_samples = max_samples
+
+    def get_palette(self, image: ImageSource, color_count: int = 10, quality: int = 10) -> typing.List[Color]:
+        if isinstance(image, Image.Image):
+            pixels = np.asarray(image.convert('RGBA')).reshape(-1, 4)
+        else:
+            with _open(image) as opened:
+                pixels = np.asarray(opened.convert('RGBA')).reshape(-1, 4)
+        if self.max_samples and len(pixels) / quality > self.max_samples:
+            quality = math.ceil(len(pixels) / self.max_samples)
+        pixels = pixels[::quality]
+        # mostly opaque and not white
+        valid = (pixels[:, 3] >= 125) & ~((pixels[:, 0] > 250) & (pixels[:, 1] > 250) & (pixels[:, 2] > 250))
+        return _quantize(pixels[valid, :3], color_count)
+
+
+class ColorThiefPalette(PaletteBackend):
+    """
+        A palette backend that defers to the colorthief package, mostly useful as a reference.
+    """
+    name = 'colorthief'
+
+    def get_palette(self, image: ImageSource, color_count: int = 10, quality: int = 10) -> typing.List[Color]:
+        if ColorThief is None:
+            raise RuntimeError('The colorthief palette backend requires the colorthief package')
+        if isinstance(image, Image.Image):
+            thief = ColorThief.__new__(ColorThief)
+            thief.image = image
+        else:
+            thief = ColorThief(io.BytesIO(image) if isinstance(image, bytes) else image)
+        return thief.get_palette(color_count, quality)
+
+
+BACKENDS: typing.Dict[str, typing.Callable[[], PaletteBackend]] = {'numpy': NumpyPalette,
+                                                                    'colorthief': ColorThiefPalette}
+_backend: PaletteBackend = NumpyPalette()
+
+
+def get_palette_backend() -> PaletteBackend:
+    return _backend
+
+
+def set_palette_backend(backend: typing.Union[str, PaletteBackend]):
+    """
+        Helper function that changes the palette backend used for every color extraction, by name (see BACKENDS) or
+        by instance.
+    """
+    global _backend
+    if isinstance(backend, str):
+        backend = BACKENDS[backend]()
+    logger.info(f'Using the {backend.name} palette backend')
+    _backend = backend
@@ -0,0 +1,167 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import logging
+import os
+import threading
+import typing
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtGui
+
+from .imagestore import PackImageStore, get_album_store
+
+__all__ = ('PixmapCache', 'get_pixmap_cache')
+
+logger = logging.getLogger(__name__)
+
+# the decoded images may take up this share of the album cache limit, within MIN_LIMIT and MAX_LIMIT (in MB)
+ALBUM_CACHE_SHARE = 0.25
+MIN_LIMIT, MAX_LIMIT = 16, 512
+Size = typing.Optional[typing.Tuple[int, int]]
+
+
+class PixmapCache:
+    """
+        A class that represents a bounded, least recently used cache of decoded images (album art and avatars), so
+        widgets that are rebuilt on every change don't decode the same pngs again. The images are kept as QImages,
+        which unlike QPixmaps can be decoded and dropped from any thread: the partials preload them in their
+        threads, and the widgets turn them into pixmaps on the GUI thread. An entry is reloaded when its file is
+        rewritten. Album images are read from the album pack when it is turned on.
+
+        Parameters:
+            limit (int) (optional): The maximum size of the decoded images, in bytes.
+    """
+
+    def __init__(self, limit: int = MIN_LIMIT * 1000000):
+        self.limit = limit
+        # (path, size) -> (the version of the file it was decoded from, the image)
+        self._entries: typing.OrderedDict[typing.Tuple[str, Size], tuple] = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def set_limit(self, limit: int):
+        """
+            Changes the maximum size of the decoded images, in bytes, evicting images if needed.
+        """
+        with self._lock:
+            self.limit = limit
+            self._evict()
+
+    def set_album_cache_limit(self, album_cache_limit: int):
+        """
+            Sizes the cache after the album cache limit setting (in MB), see ALBUM_CACHE_SHARE.
+        """
+        limit = min(max(album_cache_limit * ALBUM_CACHE_SHARE, MIN_LIMIT), MAX_LIMIT)
+        self.set_limit(int(limit * 1000000))
+
+    def _evict(self):
+        while self._total > self.limit and self._entries:
+            _, (_, image) = self._entries.popitem(last=False)
+            self._total -= image.sizeInBytes()
+
+    def image(self, path: str, size: Size = None) -> QtGui.QImage:
+        """
+            Returns the decoded image at path, decoding it if it isn't cached or its file changed. A null QImage is
+            returned (and not cached) if the file doesn't exist or can't be decoded.
+
+            Parameters:
+                path (str): The path of the image.
+                size (tuple) (optional): The size to scale the image to, None for its original size.
+        """
+        key = (path, size)
+        directory, name = os.path.split(path)
+        images = get_album_store()
+        packed = isinstance(images, PackImageStore) and images.handles(name) and \
+            os.path.join(directory, '') == images.directory
+        if packed:
+            version = images.version(name)
+        else:
+            try:
+                version = os.stat(path).st_mtime_ns
+            except OSError:
+                version = None
+        if version is None:
+            return QtGui.QImage()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        try:
+            image = QtGui.QImage.fromData(images.read(name)) if packed else QtGui.QImage(path)
+        except OSError:  # evicted in the meantime
+            return QtGui.QImage()
+        if image.isNull():
+            return image
+        if size:
+            image = image.scaled(*size, transformMode=QtCore.Qt.SmoothTransformation)
+        image = image.convertToFormat(QtGui.QImage.Format_ARGB32_Premultiplied)  # the format pixmaps are made from
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._total -= previous[1].sizeInBytes()
+            self._entries[key] = (version, image)
+            self._total += image.sizeInBytes()
+            self._evict()
+        return image
+
+    def preload(self, path: str, size: Size = None):
+        """
+            Decodes an image ahead of time, this is meant to be called from the partials' threads.
+        """
+        self.image(path, size)
+
+    def pixmap(self, path: str, size: Size = None) -> QtGui.QPixmap:
+        """
+            Returns the image at path as a pixmap, this has to be called from the GUI thread.
+        """
+        return QtGui.QPixmap.fromImage(self.image(path, size))
+
+    def clear(self):
+        """
+            Drops every decoded image, for example after the album images were deleted.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
+
+    def summary(self) -> str:
+        with self._lock:
+            hits, misses, total, count = self.hits, self.misses, self._total, len(self._entries)
+        rate = hits / (hits + misses) if hits + misses else 0
+        return f'{count} images ({total / 1000000:.1f} MB), {hits} hits, {misses} misses ({rate:.0%})'
+
+
+_pixmap_cache: typing.Optional[PixmapCache] = None
+_pixmap_cache_lock = threading.Lock()
+
+
+def get_pixmap_cache() -> PixmapCache:
+    """
+        Helper function that returns the process-wide PixmapCache, creating it the first time it is requested.
+    """
+    global _pixmap_cache
+    with _pixmap_cache_lock:
+        if _pixmap_cache is None:
+            _pixmap_cache = PixmapCache()
+        return _pixmap_cache
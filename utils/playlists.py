@@ -0,0 +1,128 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import typing
+from collections import OrderedDict
+from concurrent.futures import Future
+
+if typing.TYPE_CHECKING:
+    from spotifyclient.spotifyplayer import SpotifyPlayer
+
+__all__ = ('PlaylistCache', 'get_playlist_cache')
+
+logger = logging.getLogger(__name__)
+
+FIELDS = 'name,public'  # all the widgets need, instead of the whole playlist and its first page of tracks
+MAX_ENTRIES = 512
+
+
+class PlaylistCache:
+    """
+        A class that represents a cache of the names of the playlists friends are listening from, with a time to
+        live. Playlists the Web API answers with an error for (deleted or private ones) are cached too, for a shorter
+        time, and concurrent lookups of the same playlist (the history and the advanced status of one song change)
+        share a single request.
+
+        Parameters:
+            ttl (float) (optional): How long a playlist's name is cached for, in seconds.
+            negative_ttl (float) (optional): How long an error response is cached for, in seconds.
+    """
+
+    def __init__(self, ttl: float = 600, negative_ttl: float = 120):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: typing.OrderedDict[str, typing.Tuple[float, typing.Optional[str]]] = OrderedDict()
+        self._in_flight: typing.Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def _fetch(self, spotifyplayer: SpotifyPlayer, playlist_id: str) -> typing.Tuple[float, typing.Optional[str]]:
+        """
+            Helper function that looks a playlist up, and returns when the result expires along with the name.
+        """
+        resp = spotifyplayer.create_api_request(f'/playlists/{playlist_id}?fields={FIELDS}').json()
+        if 'error' in resp:
+            logger.debug(f'Playlist {playlist_id} could not be looked up: {resp["error"]}')
+            return time.time() + self.negative_ttl, None
+        # only playlists that are featured on the user's profile are public, the others are hidden
+        return time.time() + self.ttl, resp['name'] if resp['public'] else None
+
+    def public_name(self, spotifyplayer: SpotifyPlayer, playlist_id: str) -> typing.Optional[str]:
+        """
+            Returns the name of a playlist, or None if it is private or couldn't be looked up. Request errors are
+            raised, and not cached.
+
+            Parameters:
+                spotifyplayer (SpotifyPlayer): The player to make the Web API request with.
+                playlist_id (str): The id of the playlist.
+        """
+        with self._lock:
+            entry = self._entries.get(playlist_id)
+            if entry and entry[0] > time.time():
+                self._entries.move_to_end(playlist_id)
+                self._counters['hits'] += 1
+                return entry[1]
+            future = self._in_flight.get(playlist_id)
+            owner = future is None
+            if owner:
+                self._counters['misses'] += 1
+                future = self._in_flight[playlist_id] = Future()
+            else:
+                self._counters['coalesced'] += 1
+        if not owner:
+            return future.result()
+        try:
+            expires, name = self._fetch(spotifyplayer, playlist_id)
+        except Exception as exc:
+            with self._lock:
+                del self._in_flight[playlist_id]
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            self._entries[playlist_id] = (expires, name)
+            self._entries.move_to_end(playlist_id)
+            while len(self._entries) > MAX_ENTRIES:
+                self._entries.popitem(last=False)
+            del self._in_flight[playlist_id]
+        future.set_result(name)
+        return name
+
+    def summary(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+        return ', '.join(f'{count} {kind}' for kind, count in counters.items())
+
+
+_playlist_cache: typing.Optional[PlaylistCache] = None
+_playlist_cache_lock = threading.Lock()
+
+
+def get_playlist_cache() -> PlaylistCache:
+    """
+        Helper function that returns the process-wide PlaylistCache, creating it the first time it is requested.
+    """
+    global _playlist_cache
+    with _playlist_cache_lock:
+        if _playlist_cache is None:
+            _playlist_cache = PlaylistCache()
+        return _playlist_cache
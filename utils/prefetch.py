@@ -0,0 +1,155 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+from platformdirs import user_data_dir
+
+from .icons import PLAYBACK_ICONS, tinted_icon_dir
+from .pixmaps import get_pixmap_cache
+from .uiutils import get_ratio
+from .utils import download_album, extract_color, feather_image
+
+if typing.TYPE_CHECKING:
+    from spotifyclient.spotifyplayer import SpotifyPlayer
+
+__all__ = ('QueuePrefetcher', )
+
+data_dir = user_data_dir('SpotAlong', 'CriticalElement') + os.path.sep
+logger = logging.getLogger(__name__)
+
+MAX_REMEMBERED = 256  # track ids whose album is remembered as resolved / prefetched
+MAX_IDS_PER_REQUEST = 50  # the limit of the Web API's /tracks
+
+
+class QueuePrefetcher:
+    """
+        A class that represents the background warming of the album images and colors of the next tracks in the
+        queue, so the playback controller and the main status widget find everything cached when the song changes:
+        the album image is downloaded and feathered, its colors extracted, the feathered image decoded into the pixmap
+        cache and the playback icons tinted with its text color. Whether the tracks are saved is looked up too. The
+        queue is only read when a dealer update schedules a run, and runs that pile up while one is in progress are
+        merged into the next one.
+
+        Parameters:
+            spotifyplayer (SpotifyPlayer): The player whose queue is prefetched.
+            depth (int) (optional): How many of the upcoming tracks are prefetched.
+    """
+
+    def __init__(self, spotifyplayer: SpotifyPlayer, depth: int = 3):
+        self.spotifyplayer = spotifyplayer
+        self.depth = depth
+        self._albums: typing.OrderedDict[str, typing.Optional[str]] = OrderedDict()  # track id -> album image url
+        self._prefetched: typing.OrderedDict[str, None] = OrderedDict()  # album image urls
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: typing.Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.prefetched = 0
+
+    def schedule(self):
+        """
+            Asks for the queue to be prefetched, this returns immediately.
+        """
+        if self._stopped:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True, name='QueuePrefetcher')
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def _loop(self):
+        while not self._stopped:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stopped:
+                return
+            try:
+                self.prefetch()
+            except Exception as exc:
+                logger.warning('An error occured while prefetching the queue, continuing normally: ', exc_info=exc)
+
+    def upcoming(self) -> typing.List[str]:
+        """
+            Returns the ids of the next depth tracks in the queue, skipping episodes and delimiters.
+        """
+        ids = []
+        for track in list(self.spotifyplayer.queue or ()):
+            uri = track.get('uri', '')
+            if uri.startswith('spotify:track:') and uri.split(':')[2] not in ids:
+                ids.append(uri.split(':')[2])
+                if len(ids) == self.depth:
+                    break
+        return ids
+
+    @staticmethod
+    def _remember(cache: OrderedDict, key: str, value=None):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > MAX_REMEMBERED:
+            cache.popitem(last=False)
+
+    def _resolve(self, track_ids: typing.List[str]) -> typing.Dict[str, typing.Optional[str]]:
+        """
+            Helper function that returns the album image url of every track, in the form SpotifySong.albumimagelink
+            has, looking up the ones it doesn't know yet in a single Web API request.
+        """
+        unknown = [track_id for track_id in track_ids if track_id not in self._albums]
+        for start in range(0, len(unknown), MAX_IDS_PER_REQUEST):
+            batch = unknown[start:start + MAX_IDS_PER_REQUEST]
+            resp = self.spotifyplayer.create_api_request(f'/tracks?ids={",".join(batch)}')
+            if resp is None or not resp.ok:
+                logger.debug(f'Could not resolve the albums of the queue: {getattr(resp, "status_code", None)}')
+                continue
+            for track_id, track in zip(batch, resp.json().get('tracks', ())):
+                images = ((track or {}).get('album') or {}).get('images') or ()
+                self._remember(self._albums, track_id, images[0]['url'] if images else None)
+        return {track_id: self._albums.get(track_id) for track_id in track_ids}
+
+    def prefetch(self):
+        """
+            Warms the caches for every upcoming track whose album wasn't prefetched yet.
+        """
+        upcoming = self.upcoming()
+        self.spotifyplayer.saved_tracks.prefetch(upcoming)  # one request for the hearts of every upcoming track
+        for track_id, url in self._resolve(upcoming).items():
+            if self._stopped:
+                return
+            if not url or url in self._prefetched or '/image/' not in url:
+                continue
+            start = time.perf_counter()
+            download_album(url)
+            _, _, text_color = extract_color(url)
+            feather_image(url)
+            get_pixmap_cache().preload(data_dir + f'album{url.split("/image/")[1]}.png')
+            tinted_icon_dir(PLAYBACK_ICONS, text_color, get_ratio())
+            self._remember(self._prefetched, url)
+            self.prefetched += 1
+            logger.debug(f'Prefetched the album of {track_id} in {time.perf_counter() - start:.3f}s')
@@ -0,0 +1,65 @@
+"""
+Copyright (C) 2020-Present CriticalElement
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program at LICENSE.txt at the root of the source tree.
+    If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import json
+import logging
+import os
+import typing
+import zlib
+
+__all__ = ('write_snapshot', 'read_snapshot', 'remove_snapshot')
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SARS\x01'  # SpotAlong roster snapshot, format version 1
+
+
+def write_snapshot(path: str, payload: dict):
+    """
+        Atomically write payload to path as compressed json, prefixed with a magic header.
+    """
+    data = MAGIC + zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    with open(f'{path}.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(f'{path}.tmp', path)
+
+
+def read_snapshot(path: str) -> typing.Optional[dict]:
+    """
+        Read a snapshot written by write_snapshot, returning None if it doesn't exist or can't be read.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except (FileNotFoundError, OSError, PermissionError):
+        return None
+    if not data.startswith(MAGIC):
+        logger.warning(f'Ignoring snapshot {path} with an unknown format')
+        return None
+    try:
+        return json.loads(zlib.decompress(data[len(MAGIC):]).decode('utf-8'))
+    except (zlib.error, ValueError) as exc:
+        logger.warning(f'Ignoring corrupted snapshot {path}: ', exc_info=exc)
+        return None
+
+
+def remove_snapshot(path: str):
+    try:
+        os.remove(path)
+    except (FileNotFoundError, OSError, PermissionError):
+        pass